@@ -1,11 +1,46 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import os
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from openai import OpenAI
+from pcbgen.cache import DiskCache, canonical_digest, default_cache_dir
+from pcbgen.trace import timed
+
+log = logging.getLogger(__name__)
+
+LAYOUT_MODEL = os.getenv("PCBGEN_LAYOUT_MODEL", "gpt-5.2")
+
+# Bump when the prompt or schema changes so stale cached plans are ignored.
+LAYOUT_PROMPT_VERSION = 1
+
+LAYOUT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "header_xy": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+        "caps_origin_xy": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+        "pullups_origin_xy": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+        "labels_left_x": {"type": "integer"},
+        "labels_right_x": {"type": "integer"},
+        "row0_y": {"type": "integer"},
+        "row_dy": {"type": "integer"},
+    },
+    "required": [
+        "header_xy",
+        "caps_origin_xy",
+        "pullups_origin_xy",
+        "labels_left_x",
+        "labels_right_x",
+        "row0_y",
+        "row_dy",
+    ],
+}
 
 
 @dataclass
@@ -31,37 +66,25 @@ def _default_plan() -> LayoutPlan:
     )
 
 
-def plan_layout(board_type: str, spec: Dict[str, Any], hint: str = "") -> LayoutPlan:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return _default_plan()
-
-    client = OpenAI()
-
-    schema = {
-        "type": "object",
-        "additionalProperties": False,
-        "properties": {
-            "header_xy": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
-            "caps_origin_xy": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
-            "pullups_origin_xy": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
-            "labels_left_x": {"type": "integer"},
-            "labels_right_x": {"type": "integer"},
-            "row0_y": {"type": "integer"},
-            "row_dy": {"type": "integer"},
-        },
-        "required": [
-            "header_xy",
-            "caps_origin_xy",
-            "pullups_origin_xy",
-            "labels_left_x",
-            "labels_right_x",
-            "row0_y",
-            "row_dy",
-        ],
-    }
-
-    prompt = f"""
+def _plan_from_json(data: Dict[str, Any]) -> LayoutPlan:
+    return LayoutPlan(
+        header_xy=(int(data["header_xy"][0]), int(data["header_xy"][1])),
+        caps_origin_xy=(int(data["caps_origin_xy"][0]), int(data["caps_origin_xy"][1])),
+        pullups_origin_xy=(int(data["pullups_origin_xy"][0]), int(data["pullups_origin_xy"][1])),
+        labels_left_x=int(data["labels_left_x"]),
+        labels_right_x=int(data["labels_right_x"]),
+        row0_y=int(data["row0_y"]),
+        row_dy=int(data["row_dy"]),
+    )
+
+
+def _public_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    # run flags (_use_ai, _hint, ...) are not part of the design
+    return {k: v for k, v in spec.items() if not str(k).startswith("_")}
+
+
+def _layout_prompt(board_type: str, spec: Dict[str, Any], hint: str) -> str:
+    return f"""
 Plan a neat schematic layout for board type "{board_type}".
 
 Constraints:
@@ -73,28 +96,265 @@ Constraints:
 Hint (optional): {hint}
 
 Spec:
-{json.dumps(spec, indent=2)}
+{json.dumps(_public_spec(spec), indent=2)}
 
 Return ONLY JSON matching this schema:
-{json.dumps(schema)}
+{json.dumps(LAYOUT_SCHEMA)}
 """
 
+
+# ---------------------------------------------------------------------------
+# On-disk plan cache
+# ---------------------------------------------------------------------------
+
+def layout_cache_dir() -> Path:
+    env = os.getenv("PCBGEN_LAYOUT_CACHE_DIR")
+    return Path(env).expanduser() if env else default_cache_dir() / "layout"
+
+
+def layout_cache() -> DiskCache:
+    # Plans are a few hundred bytes, so cap by entry count rather than size.
+    return DiskCache(
+        layout_cache_dir(),
+        max_bytes=None,
+        max_entries=int(os.getenv("PCBGEN_LAYOUT_CACHE_MAX", "5000")),
+        ttl_seconds=float(os.getenv("PCBGEN_LAYOUT_CACHE_TTL", str(30 * 24 * 3600))),
+    )
+
+
+def clear_layout_cache() -> None:
+    layout_cache().clear()
+
+
+def layout_cache_key(board_type: str, spec: Dict[str, Any], hint: str = "") -> str:
+    return canonical_digest(
+        {
+            "v": LAYOUT_PROMPT_VERSION,
+            "model": LAYOUT_MODEL,
+            "board_type": board_type,
+            "spec": _public_spec(spec),
+            "hint": hint,
+        }
+    )
+
+
+def _cached_plan(cache: DiskCache, key: str) -> Optional[LayoutPlan]:
+    blob = cache.get(key)
+    if blob is None:
+        return None
     try:
-        resp = client.responses.create(
-            model="gpt-5.2",
-            input=prompt,
-            text={"format": {"type": "json_schema", "name": "layout_plan", "schema": schema}},
-        )
-        data = json.loads(resp.output_text)
-
-        return LayoutPlan(
-            header_xy=(int(data["header_xy"][0]), int(data["header_xy"][1])),
-            caps_origin_xy=(int(data["caps_origin_xy"][0]), int(data["caps_origin_xy"][1])),
-            pullups_origin_xy=(int(data["pullups_origin_xy"][0]), int(data["pullups_origin_xy"][1])),
-            labels_left_x=int(data["labels_left_x"]),
-            labels_right_x=int(data["labels_right_x"]),
-            row0_y=int(data["row0_y"]),
-            row_dy=int(data["row_dy"]),
+        return _plan_from_json(json.loads(blob))
+    except (ValueError, KeyError, TypeError, IndexError):
+        cache.delete(key)
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Model call
+# ---------------------------------------------------------------------------
+
+@dataclass
+class PlanResult:
+    plan: LayoutPlan
+    source: str  # "model", "cache" or "fallback"
+    latency_s: float
+    attempts: int = 0
+    error: str = ""
+
+
+def _default_deadline() -> float:
+    return float(os.getenv("PCBGEN_LAYOUT_DEADLINE", "30"))
+
+
+def _async_client(timeout_s: float) -> Any:
+    # imported here so runs without --ai never pay for the OpenAI SDK
+    from openai import AsyncOpenAI
+
+    # Retries are ours (bounded by the deadline), not the SDK's.
+    # OPENAI_BASE_URL points this at a local stand-in for tests.
+    return AsyncOpenAI(timeout=timeout_s, max_retries=0)
+
+
+async def _request_plan(client: Any, board_type: str, spec: Dict[str, Any], hint: str) -> LayoutPlan:
+    resp = await client.responses.create(
+        model=LAYOUT_MODEL,
+        input=_layout_prompt(board_type, spec, hint),
+        text={"format": {"type": "json_schema", "name": "layout_plan", "schema": LAYOUT_SCHEMA}},
+    )
+    return _plan_from_json(json.loads(resp.output_text))
+
+
+async def _request_with_retries(
+    board_type: str,
+    spec: Dict[str, Any],
+    hint: str,
+    client: Any,
+    deadline: float,
+    retries: int,
+    backoff_s: float,
+    semaphore: Optional[asyncio.Semaphore],
+) -> Tuple[Optional[LayoutPlan], int, str]:
+    loop = asyncio.get_running_loop()
+    attempts = 0
+    error = ""
+    while attempts <= retries:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            error = error or "deadline exceeded"
+            break
+        attempts += 1
+        try:
+            if semaphore is None:
+                plan = await asyncio.wait_for(_request_plan(client, board_type, spec, hint), remaining)
+            else:
+                async with semaphore:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        error = "deadline exceeded waiting for a model slot"
+                        break
+                    plan = await asyncio.wait_for(_request_plan(client, board_type, spec, hint), remaining)
+            return plan, attempts, ""
+        except asyncio.TimeoutError:
+            error = "deadline exceeded"
+            break
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        # exponential backoff with jitter, never past the deadline
+        delay = min(backoff_s * (2 ** (attempts - 1)) * (0.5 + random.random()), deadline - loop.time())
+        if delay > 0 and attempts <= retries:
+            await asyncio.sleep(delay)
+    return None, attempts, error
+
+
+async def plan_layout_async(
+    board_type: str,
+    spec: Dict[str, Any],
+    hint: str = "",
+    *,
+    use_cache: Optional[bool] = None,
+    client: Any = None,
+    deadline_s: Optional[float] = None,
+    retries: int = 2,
+    backoff_s: float = 0.5,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> PlanResult:
+    """
+    Plan one layout within deadline_s seconds (default $PCBGEN_LAYOUT_DEADLINE or 30;
+    cache wait, retries and backoff included).
+    Failed or late requests degrade to _default_plan() with source="fallback" and the
+    reason in .error. Model answers are cached on disk by (board_type, spec, hint), and
+    concurrent callers with the same key (coroutines, threads or batch processes) wait
+    for a single request. use_cache=None follows the spec's "_layout_cache" flag.
+    """
+    if deadline_s is None:
+        deadline_s = _default_deadline()
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+    deadline = t0 + deadline_s
+
+    def _result(plan: Optional[LayoutPlan], source: str, attempts: int = 0, error: str = "") -> PlanResult:
+        if plan is None:
+            plan, source = _default_plan(), "fallback"
+            log.warning("AI layout for %s fell back to the default plan: %s", board_type, error or "no model answer")
+        return PlanResult(plan, source, loop.time() - t0, attempts, error)
+
+    async def _fetch() -> PlanResult:
+        if client is not None:
+            plan, attempts, error = await _request_with_retries(
+                board_type, spec, hint, client, deadline, retries, backoff_s, semaphore
+            )
+            return _result(plan, "model", attempts, error)
+        if not os.getenv("OPENAI_API_KEY"):
+            return _result(None, "fallback", 0, "OPENAI_API_KEY not set")
+        async with _async_client(deadline_s) as own_client:
+            plan, attempts, error = await _request_with_retries(
+                board_type, spec, hint, own_client, deadline, retries, backoff_s, semaphore
+            )
+        return _result(plan, "model", attempts, error)
+
+    if use_cache is None:
+        use_cache = bool(spec.get("_layout_cache", True))
+    if not use_cache:
+        return await _fetch()
+
+    cache = layout_cache()
+    key = layout_cache_key(board_type, spec, hint)
+    plan = _cached_plan(cache, key)
+    if plan is not None:
+        return _result(plan, "cache")
+
+    # Single flight: poll the key's lock instead of blocking the event loop on it.
+    while True:
+        handle = cache.try_lock(key)
+        if handle is not None:
+            break
+        if loop.time() >= deadline:
+            return _result(None, "fallback", 0, "deadline exceeded waiting for a concurrent request")
+        await asyncio.sleep(0.05)
+        plan = _cached_plan(cache, key)
+        if plan is not None:
+            return _result(plan, "cache")
+    try:
+        # whoever held the lock may have just fetched this plan
+        plan = _cached_plan(cache, key)
+        if plan is not None:
+            return _result(plan, "cache")
+        res = await _fetch()
+        if res.source == "model":
+            # fallbacks are not cached, so the next run tries the model again
+            cache.put(key, json.dumps(asdict(res.plan)).encode("utf-8"))
+        return res
+    finally:
+        cache.unlock(handle)
+
+
+async def plan_layouts(
+    requests: Iterable[Tuple[str, Dict[str, Any], str]],
+    concurrency: int = 4,
+    **kwargs: Any,
+) -> List[PlanResult]:
+    """Plan many (board_type, spec, hint) requests at once, at most `concurrency` model calls in flight."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _gather() -> List[PlanResult]:
+        return list(
+            await asyncio.gather(
+                *(plan_layout_async(bt, spec, hint, semaphore=semaphore, **kwargs) for bt, spec, hint in requests)
+            )
         )
-    except Exception:
-        return _default_plan()
+
+    if kwargs.get("client") is not None or not os.getenv("OPENAI_API_KEY"):
+        return await _gather()
+    # one shared connection pool for the whole fan-out
+    async with _async_client(kwargs.get("deadline_s") or _default_deadline()) as client:
+        kwargs["client"] = client
+        return await _gather()
+
+
+@timed("layout.plan")
+def plan_layout_result(board_type: str, spec: Dict[str, Any], hint: str = "", **kwargs: Any) -> PlanResult:
+    """
+    Blocking wrapper around plan_layout_async. Called from inside a running event loop
+    (a notebook, an async server embedding pcbgen), it runs the request on a worker
+    thread with its own loop, since asyncio.run can't nest; async callers that can
+    await should use plan_layout_async directly.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(plan_layout_async(board_type, spec, hint, **kwargs))
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pcbgen-layout") as pool:
+        return pool.submit(lambda: asyncio.run(plan_layout_async(board_type, spec, hint, **kwargs))).result()
+
+
+def plan_layout(
+    board_type: str,
+    spec: Dict[str, Any],
+    hint: str = "",
+    use_cache: Optional[bool] = None,
+    client: Any = None,
+) -> LayoutPlan:
+    """Blocking, plan-only form of plan_layout_async (degradations are logged as warnings)."""
+    return plan_layout_result(board_type, spec, hint, use_cache=use_cache, client=client).plan
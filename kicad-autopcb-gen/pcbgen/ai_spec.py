@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import json
 import re
-from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Tuple
 
+from pcbgen.trace import timed
 
-# Keep schema around for your own sanity (we won’t send it anywhere now)
+
+# Enforced by pcbgen.schema before any template runs (see REQUIRED_KEYS there
+# for what a hand-written spec may leave out).
 SPEC_SCHEMA: Dict[str, Any] = {
     "type": "object",
     "additionalProperties": False,
@@ -26,7 +32,7 @@ SPEC_SCHEMA: Dict[str, Any] = {
             "type": "object",
             "additionalProperties": False,
             "properties": {
-                "header_pins": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 6},
+                "header_pins": {"type": "array", "items": {"type": "string"}, "minItems": 2, "maxItems": 6},
                 "pullups_ohms": {"type": "integer"},
                 "add_pullups": {"type": "boolean"},
             },
@@ -102,52 +108,107 @@ SPEC_SCHEMA: Dict[str, Any] = {
 }
 
 
-def _slug_name(text: str) -> str:
-    t = re.sub(r"[^a-zA-Z0-9]+", "_", text.strip())
-    t = re.sub(r"_+", "_", t).strip("_")
+_SLUG_RUNS = re.compile(r"[^a-zA-Z0-9]+")
+
+
+def slug_name(text: str) -> str:
+    """A project name from free text: word characters only, at most 32 (also names batch output folders)."""
+    # "_" is itself a separator, so one substitution leaves no "__" behind.
+    # Only 32 characters survive: slug a prefix first and fall back to the
+    # whole text when the prefix is too short to decide.
+    text = text.strip()
+    t = _SLUG_RUNS.sub("_", text[:96]).lstrip("_")
+    if len(t) <= 32 and len(text) > 96:
+        t = _SLUG_RUNS.sub("_", text).lstrip("_")
+    t = t.rstrip("_")
     return (t[:32] if t else "GeneratedBoard")
 
 
-def _find_voltage(text: str) -> str:
+# ---------------------------------------------------------------------------
+# Lexer: one pass over the lower-cased prompt, shared by every extractor below.
+#
+# A number token starts at every digit run that begins a word, so "0.5v" yields
+# both "0.5 v" and "5 v" (the fraction digits are the next token), exactly like the
+# per-rule regexes this replaces; the lookahead records what follows the number
+# (fraction, whitespace, the next word, "-pin") without consuming it.
+# ---------------------------------------------------------------------------
+
+# "[^\w]" rather than "\b" so the scan can skip ahead to candidate characters;
+# lex_prompt pads the text with a space so a leading number still matches.
+_NUMBER = re.compile(r"[^\w](\d+)(?=(\.\d+)?(\s*)(\w*)(-\s*pin\b)?)")
+
+# Board keywords are plain substrings ("sensors", "devboards" count too).
+_KEYWORDS = (
+    "buck", "converter", "regulator",
+    "esp32", "devboard", "dev board",
+    "i2c", "sda", "scl", "imu", "sensor",
+    "pullup", "pull-up",
+)
+
+_IN_WORD = re.compile(r"\bin\b")
+_OUT_WORD = re.compile(r"\bout\b")
+
+
+class _Num(NamedTuple):
+    digits: str
+    number: str  # digits plus fraction ("3.3")
+    spaced: bool  # whitespace between the number and `unit`
+    unit: str  # the word right after the number ("v", "k", "u", "pin", "x15", ...)
+    dash_pin: bool  # followed by "-pin" / "- pin"
+    in_frac: bool  # the fraction digits of the previous token
+    end: int  # end of number + whitespace + unit
+
+
+class PromptTokens(NamedTuple):
+    text: str  # the lower-cased prompt, with the leading pad space
+    numbers: List[_Num]
+    keywords: FrozenSet[str]
+
+
+def lex_prompt(tl: str) -> PromptTokens:
+    tl = " " + tl
+    numbers: List[_Num] = []
+    in_frac = False
+    for m in _NUMBER.finditer(tl):
+        digits, frac, ws, unit, dash_pin = m.groups()
+        numbers.append(_Num(digits, digits + frac if frac else digits, bool(ws), unit, dash_pin is not None, in_frac, m.end(4)))
+        in_frac = frac is not None
+    return PromptTokens(tl, numbers, frozenset(k for k in _KEYWORDS if k in tl))
+
+
+_RAIL_FOR_VOLTS = {"1.8": "+1V8", "2.5": "+2V5", "3.0": "+3V0", "3.3": "+3V3", "5": "+5V", "12": "+12V"}
+
+
+def _find_voltage(tok: PromptTokens) -> str:
     # Look for 3.3V / 5V etc.
-    m = re.search(r"\b(1\.8|2\.5|3\.0|3\.3|5|12)\s*v\b", text)
-    if m:
-        v = m.group(1)
-        if v == "5":
-            return "+5V"
-        if v == "12":
-            return "+12V"
-        if v == "3.3":
-            return "+3V3"
-        if v == "3.0":
-            return "+3V0"
-        if v == "2.5":
-            return "+2V5"
-        if v == "1.8":
-            return "+1V8"
+    for n in tok.numbers:
+        if n.unit == "v" and n.number in _RAIL_FOR_VOLTS:
+            return _RAIL_FOR_VOLTS[n.number]
     return "+3V3"
 
 
-def _parse_pullup_ohms(text: str) -> Tuple[bool, int]:
+def _parse_pullup_ohms(tok: PromptTokens) -> Tuple[bool, int]:
     # Detect pullups and value like 4.7k / 10k / 4700
-    if "pullup" not in text and "pull-up" not in text:
+    if "pullup" not in tok.keywords and "pull-up" not in tok.keywords:
         return (False, 4700)
 
-    m = re.search(r"\b(\d+(\.\d+)?)\s*(k|kohm|kΩ)\b", text)
-    if m:
-        val = float(m.group(1))
-        return (True, int(round(val * 1000)))
+    for n in tok.numbers:
+        if n.unit in ("k", "kohm", "kΩ"):
+            return (True, int(round(float(n.number) * 1000)))
 
-    m2 = re.search(r"\b(\d{3,6})\s*(ohm|Ω)?\b", text)
-    if m2:
-        ohms = int(m2.group(1))
-        # sanity bounds for pullups
-        if 200 <= ohms <= 200000:
-            return (True, ohms)
+    # first bare 3-6 digit number (or "4700ohm"); only that one counts
+    for n in tok.numbers:
+        if 3 <= len(n.digits) <= 6 and (n.number != n.digits or n.spaced or n.unit in ("", "ohm", "Ω")):
+            ohms = int(n.digits)
+            # sanity bounds for pullups
+            if 200 <= ohms <= 200000:
+                return (True, ohms)
+            break
 
     return (True, 4700)
 
 
+@lru_cache(maxsize=1024)
 def _cap_footprint_for(value: str) -> str:
     # very rough mapping; you can improve later
     v = value.lower().replace(" ", "")
@@ -161,32 +222,24 @@ def _cap_footprint_for(value: str) -> str:
     return "Capacitor_SMD:C_0603_1608Metric"
 
 
-def _parse_decoupling(text: str) -> List[str]:
+def _parse_decoupling(tok: PromptTokens) -> List[str]:
     # look for "100n + 1u", "100n and 10u", etc.
     # return list of strings like ["100n","1u"]
     vals: List[str] = []
-
-    # common pattern: 100n + 1u
-    m = re.findall(r"\b(\d+(\.\d+)?)\s*(n|u)\b", text)
-    for g in m:
-        num = g[0]
-        unit = g[2]
-        vals.append(f"{num}{unit}")
+    taken = False
+    for n in tok.numbers:
+        # the fraction of a value just taken ("1.5u" -> "5u") is not a value of its own
+        taken = n.unit in ("n", "u") and not (n.in_frac and taken)
+        if taken:
+            vals.append(n.number + n.unit)
 
     # If user didn't specify any, choose sane defaults
     if not vals:
         return ["100n", "1u"]
 
-    # Keep only reasonable decoupling-like caps
-    filtered: List[str] = []
-    for v in vals:
-        if v.endswith("n"):
-            filtered.append(v)
-        elif v.endswith("u"):
-            filtered.append(v)
     # de-dup preserving order
     out: List[str] = []
-    for v in filtered:
+    for v in vals:
         if v not in out:
             out.append(v)
 
@@ -197,26 +250,23 @@ def _parse_decoupling(text: str) -> List[str]:
     return out[:4]
 
 
-def _choose_board_type(text: str) -> str:
-    t = text.lower()
-    if "buck" in t or "converter" in t or "regulator" in t:
+def _choose_board_type(tok: PromptTokens) -> str:
+    kw = tok.keywords
+    if kw & {"buck", "converter", "regulator"}:
         return "buck_module"
-    if "esp32" in t or "devboard" in t or "dev board" in t:
+    if kw & {"esp32", "devboard", "dev board"}:
         return "esp32_devboard"
-    if "i2c" in t or "sda" in t or "scl" in t or "imu" in t or "sensor" in t:
-        return "i2c_breakout"
-    # default
+    # i2c / sda / scl / imu / sensor, and the default
     return "i2c_breakout"
 
 
-def _parse_header_pins(text: str, board_type: str) -> int:
-    t = text.lower()
+def _parse_header_pins(tok: PromptTokens, board_type: str) -> int:
     # Try "4-pin", "6 pin", etc.
-    m = re.search(r"\b(\d+)\s*-\s*pin\b|\b(\d+)\s*pin\b", t)
-    if m:
-        n = int(m.group(1) or m.group(2))
-        if 2 <= n <= 20:
-            return n
+    for n in tok.numbers:
+        if n.number == n.digits and (n.unit == "pin" or (n.unit == "" and n.dash_pin)):
+            if 2 <= int(n.digits) <= 20:
+                return int(n.digits)
+            break
 
     # For I2C, default 4 pins
     if board_type == "i2c_breakout":
@@ -224,6 +274,24 @@ def _parse_header_pins(text: str, board_type: str) -> int:
     return 15
 
 
+def _parse_header_length(tok: PromptTokens) -> int:
+    # "1x19" / "1x15"
+    for n in tok.numbers:
+        if n.number == "1" and not n.spaced and n.unit[:1] == "x" and 2 <= len(n.unit) <= 3 and n.unit[1:].isdecimal():
+            return int(n.unit[1:])
+    return 15
+
+
+def _stage_cap(tok: PromptTokens, word: Pattern[str]) -> Optional[str]:
+    # first "<n>u" followed later on the same line by the word "in" (or "out")
+    for n in tok.numbers:
+        if n.unit == "u":
+            eol = tok.text.find("\n", n.end)
+            if word.search(tok.text, n.end, len(tok.text) if eol < 0 else eol):
+                return n.number
+    return None
+
+
 def _make_base_spec(name: str, board_type: str, vcc_net: str) -> Dict[str, Any]:
     # Because schema is strict, we must fill everything even if unused.
     base: Dict[str, Any] = {
@@ -250,6 +318,7 @@ def _make_base_spec(name: str, board_type: str, vcc_net: str) -> Dict[str, Any]:
     return base
 
 
+@timed("spec.prompt")
 def spec_from_prompt(prompt: str) -> Dict[str, Any]:
     """
     OFFLINE: Convert natural language prompt -> spec dict for generator.
@@ -257,20 +326,21 @@ def spec_from_prompt(prompt: str) -> Dict[str, Any]:
     """
     text = prompt.strip()
     tl = text.lower()
+    tok = lex_prompt(tl)
 
-    board_type = _choose_board_type(text)
-    vcc_net = _find_voltage(tl)
-    name = _slug_name(text)
+    board_type = _choose_board_type(tok)
+    vcc_net = _find_voltage(tok)
+    name = slug_name(text)
 
     spec = _make_base_spec(name=name, board_type=board_type, vcc_net=vcc_net)
 
     # Decoupling caps
-    cap_vals = _parse_decoupling(tl)
+    cap_vals = _parse_decoupling(tok)
     spec["decoupling"] = [{"value": v, "footprint": _cap_footprint_for(v)} for v in cap_vals]
 
     # I2C breakout specifics
     if board_type == "i2c_breakout":
-        hpins = _parse_header_pins(tl, board_type)
+        hpins = _parse_header_pins(tok, board_type)
         # If user asked for 6-pin, we’ll add extra pins after SCL
         if hpins == 4:
             header_pins = ["VCC", "GND", "SDA", "SCL"]
@@ -279,7 +349,7 @@ def spec_from_prompt(prompt: str) -> Dict[str, Any]:
         else:
             header_pins = ["VCC", "GND", "SDA", "SCL", "INT", "ADDR"][:hpins]
 
-        add_pullups, pull_ohms = _parse_pullup_ohms(tl)
+        add_pullups, pull_ohms = _parse_pullup_ohms(tok)
         spec["i2c"] = {
             "header_pins": header_pins,
             "pullups_ohms": int(pull_ohms),
@@ -300,8 +370,7 @@ def spec_from_prompt(prompt: str) -> Dict[str, Any]:
     # ESP32 devboard specifics
     if board_type == "esp32_devboard":
         # Try to detect header length like "1x19" or "1x15"
-        m = re.search(r"\b1x(\d{1,2})\b", tl)
-        pins = int(m.group(1)) if m else 15
+        pins = _parse_header_length(tok)
         if pins < 6:
             pins = 15
         fp = f"Connector_PinHeader_2.54mm:PinHeader_1x{pins}_P2.54mm_Vertical"
@@ -326,13 +395,62 @@ def spec_from_prompt(prompt: str) -> Dict[str, Any]:
         spec["power"]["gnd_net"] = "GND"
 
         # Try to detect in/out caps like "22u in, 47u out"
-        cin = re.search(r"\b(\d+(\.\d+)?)\s*u\b.*\bin\b", tl)
-        cout = re.search(r"\b(\d+(\.\d+)?)\s*u\b.*\bout\b", tl)
+        cin = _stage_cap(tok, _IN_WORD)
+        cout = _stage_cap(tok, _OUT_WORD)
         if cin:
-            spec["stage"]["in_cap"]["value"] = f"{cin.group(1)}u"
+            spec["stage"]["in_cap"]["value"] = f"{cin}u"
             spec["stage"]["in_cap"]["footprint"] = _cap_footprint_for(spec["stage"]["in_cap"]["value"])
         if cout:
-            spec["stage"]["out_cap"]["value"] = f"{cout.group(1)}u"
+            spec["stage"]["out_cap"]["value"] = f"{cout}u"
             spec["stage"]["out_cap"]["footprint"] = _cap_footprint_for(spec["stage"]["out_cap"]["value"])
 
     return spec
+
+
+# ---------------------------------------------------------------------------
+# Bulk parsing
+# ---------------------------------------------------------------------------
+
+def prompt_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Prompts from a one-prompt-per-line text stream; blank lines and # comments are skipped."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+@dataclass
+class ParseStats:
+    prompts: int = 0
+    memo_hits: int = 0
+
+
+def _spec_line(text: str) -> str:
+    return json.dumps(spec_from_prompt(text), ensure_ascii=False, separators=(",", ":"))
+
+
+def spec_lines_from_prompts(
+    prompts: Iterable[str],
+    memo_size: int = 4096,
+    stats: Optional[ParseStats] = None,
+) -> Iterator[str]:
+    """
+    Lazily turn prompts into compact one-line JSON specs, in input order.
+    Prompts that are equal once surrounding whitespace is stripped share one
+    parse through an LRU memo of memo_size entries, so memory stays bounded
+    however long the input is. (Case and inner spacing are significant: they
+    feed the board name and keywords like "dev board".)
+    """
+    memo = lru_cache(maxsize=memo_size)(_spec_line)
+    for prompt in prompts:
+        line = memo(prompt.strip())
+        if stats is not None:
+            stats.prompts += 1
+            stats.memo_hits = memo.cache_info().hits
+        yield line
+
+
+def specs_from_prompts(prompts: Iterable[str], memo_size: int = 4096) -> Iterator[Dict[str, Any]]:
+    """spec_from_prompt over an iterable, lazily and memoized; every spec yielded is a fresh dict."""
+    for line in spec_lines_from_prompts(prompts, memo_size):
+        yield json.loads(line)
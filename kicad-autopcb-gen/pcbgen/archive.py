@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import io
+import sys
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+
+ARCHIVE_FORMATS = ("zip", "tar", "tgz")
+
+
+def archive_format(target: str, fmt: Optional[str] = None) -> str:
+    """The format to write `target` in: `fmt` if given, else from the suffix ("-", stdout, is zip)."""
+    if fmt:
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {fmt} (expected one of {', '.join(ARCHIVE_FORMATS)})")
+        return fmt
+    name = str(target).lower()
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tgz"
+    if name.endswith(".tar"):
+        return "tar"
+    if name == "-" or name.endswith(".zip"):
+        return "zip"
+    raise ValueError(f"Can't tell the archive format of {target}; name it .zip/.tar/.tar.gz or pass the format")
+
+
+class _Forward:
+    # write-only view of a stream: zipfile then appends data descriptors instead of
+    # seeking back to patch every header, which would flush the buffer file by file
+    def __init__(self, fh: BinaryIO) -> None:
+        self.write = fh.write
+        self.flush = fh.flush
+
+
+class ProjectArchive:
+    """
+    Projects streamed into one .zip or .tar as they are added, each under its own folder,
+    so thousands of them cost one output file instead of a directory and five files each.
+    `target` is a path, "-" for stdout, or an open binary stream (left open). Neither
+    format needs to seek, so pipes work.
+    """
+
+    def __init__(self, target: Union[str, Path, BinaryIO], fmt: Optional[str] = None) -> None:
+        self.name = str(target) if isinstance(target, (str, Path)) else getattr(target, "name", "archive")
+        if isinstance(target, (str, Path)):
+            fmt = archive_format(str(target), fmt)
+            if str(target) == "-":
+                self._fh, self._owned = sys.stdout.buffer, False
+            else:
+                Path(target).parent.mkdir(parents=True, exist_ok=True)
+                self._fh, self._owned = open(target, "wb", buffering=1 << 20), True
+        else:
+            fmt = fmt or "zip"
+            self._fh, self._owned = target, False
+        self.format = fmt
+        self.projects = 0
+        self._mtime = time.time()
+        if fmt == "zip":
+            self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(_Forward(self._fh), "w", zipfile.ZIP_DEFLATED)
+            self._tar: Optional[tarfile.TarFile] = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(fileobj=self._fh, mode="w|gz" if fmt == "tgz" else "w|")
+
+    def add(self, folder: str, files: Dict[str, bytes]) -> None:
+        for name, data in sorted(files.items()):
+            arcname = f"{folder}/{name}"
+            if self._zip is not None:
+                info = zipfile.ZipInfo(arcname, time.localtime(self._mtime)[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                self._zip.writestr(info, data)
+            else:
+                info = tarfile.TarInfo(arcname)
+                info.size = len(data)
+                info.mtime = int(self._mtime)
+                info.mode = 0o644
+                self._tar.addfile(info, io.BytesIO(data))
+        self.projects += 1
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+        if self._owned:
+            self._fh.close()
+        else:
+            self._fh.flush()
+
+    def __enter__(self) -> "ProjectArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from pcbgen.archive import ProjectArchive
+from pcbgen.cache import DiskCache
+from pcbgen.design import DEFAULT_BACKEND
+from pcbgen.schema import SpecValidationError, check_spec
+from pcbgen.spec import load_spec_file, project_spec_from_dict
+from pcbgen.kicad_project import generate_project, project_files, template_design
+from pcbgen.trace import StageEvent, recording, stage
+from pcbgen.ai_spec import prompt_lines, slug_name, spec_from_prompt
+
+
+@dataclass
+class BatchJob:
+    kind: str  # "spec" (source is a YAML path) or "prompt" (source is the prompt text)
+    source: str
+    out_name: str = ""
+
+
+@dataclass
+class BatchOptions:
+    use_ai: bool = False
+    hint: str = ""
+    layout_cache: bool = True
+    use_cache: bool = True
+    cache_dir: Optional[str] = None
+    cache_max_bytes: Optional[int] = 512 * 1024 * 1024
+    backend: str = DEFAULT_BACKEND
+    route: bool = False
+    update: bool = False
+    archive: bool = False  # build each project in memory and hand its files back (run_batch's archive)
+    profile: bool = False  # record each job's stages (pcbgen.trace) into JobResult.trace
+    profile_memory: bool = False
+
+
+@dataclass
+class JobResult:
+    kind: str
+    source: str
+    out_dir: str
+    ok: bool
+    seconds: float
+    error: str = ""
+    status: str = ""  # generate_project result: built / unchanged / cache / updated
+    files: Optional[Dict[str, bytes]] = field(default=None, repr=False)  # archive mode, until written
+    trace: Optional[List[StageEvent]] = field(default=None, repr=False)  # with BatchOptions.profile
+
+
+def _is_glob(pattern: str) -> bool:
+    return any(ch in pattern for ch in "*?[")
+
+
+def _spec_paths(source: str) -> List[Path]:
+    p = Path(source).expanduser()
+    if p.is_dir():
+        return sorted(x for x in p.iterdir() if x.suffix in (".yaml", ".yml") and x.is_file())
+    if _is_glob(source):
+        return [Path(x) for x in sorted(glob.glob(os.path.expanduser(source), recursive=True))]
+    return [p]
+
+
+def _manifest_jobs(path: Path) -> List[BatchJob]:
+    # Manifest is a YAML list; each entry is a spec path (relative to the manifest)
+    # or a mapping with "spec" or "prompt" and an optional "out" folder name.
+    entries = yaml.safe_load(path.read_text(encoding="utf-8")) or []
+    if not isinstance(entries, list):
+        raise ValueError(f"Manifest {path} must be a YAML list.")
+
+    jobs: List[BatchJob] = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"spec": entry}
+        if not isinstance(entry, dict):
+            raise ValueError(f"Manifest {path}: bad entry {entry!r}")
+        out_name = str(entry.get("out", ""))
+        if "prompt" in entry:
+            jobs.append(BatchJob("prompt", str(entry["prompt"]), out_name))
+        elif "spec" in entry:
+            for sp in _spec_paths(str(path.parent / str(entry["spec"]))):
+                jobs.append(BatchJob("spec", str(sp), out_name))
+        else:
+            raise ValueError(f"Manifest {path}: entry needs 'spec' or 'prompt': {entry!r}")
+    return jobs
+
+
+def collect_jobs(
+    sources: Iterable[str] = (),
+    manifests: Iterable[str] = (),
+    prompt_files: Iterable[str] = (),
+) -> List[BatchJob]:
+    """
+    Expand spec directories/globs/files, YAML manifests and prompt files
+    (one prompt per line) into a flat job list with unique output folder names.
+    """
+    jobs: List[BatchJob] = []
+    for src in sources:
+        jobs.extend(BatchJob("spec", str(p)) for p in _spec_paths(src))
+    for m in manifests:
+        jobs.extend(_manifest_jobs(Path(m).expanduser()))
+    for pf in prompt_files:
+        with open(Path(pf).expanduser(), encoding="utf-8") as fh:
+            jobs.extend(BatchJob("prompt", line) for line in prompt_lines(fh))
+
+    # The first job with a name keeps it; later ones get the next free name_N. Every
+    # explicit or derived name is reserved up front, so a suffix never lands on one.
+    bases = [job.out_name or (Path(job.source).stem if job.kind == "spec" else slug_name(job.source)) for job in jobs]
+    taken = set(bases)
+    seen: Dict[str, int] = {}
+    for job, base in zip(jobs, bases):
+        n = seen.get(base, 0) + 1
+        name = base
+        if n > 1:
+            name = f"{base}_{n}"
+            while name in taken:
+                n += 1
+                name = f"{base}_{n}"
+            taken.add(name)
+        seen[base] = n
+        job.out_name = name
+    return jobs
+
+
+def load_job_data(job: BatchJob) -> Dict[str, Any]:
+    if job.kind == "spec":
+        return load_spec_file(Path(job.source))
+    return spec_from_prompt(job.source)
+
+
+def validate_jobs(
+    jobs: Iterable[BatchJob],
+    strict: bool = False,
+    fail_fast: bool = False,
+    on_result: Optional[Callable[[BatchJob, str], None]] = None,
+    footprints: bool = False,
+) -> List[Tuple[BatchJob, str]]:
+    """
+    Load and schema-check every job without generating anything; returns the
+    (job, error) pairs that failed. fail_fast stops at the first one.
+    on_result sees every job, with error "" when it is valid.
+    footprints also builds each design and checks its footprints against the
+    installed libraries (pcbgen.footprint_index).
+    """
+    bad: List[Tuple[BatchJob, str]] = []
+    for job in jobs:
+        try:
+            data = load_job_data(job)
+            check_spec(data, strict=strict)
+            error = ""
+            if footprints:
+                from pcbgen.footprint_index import design_footprint_problems
+
+                problems = design_footprint_problems(template_design(project_spec_from_dict(data)))
+                if problems:
+                    error = "\n".join(problems)
+                    bad.append((job, error))
+        except Exception as e:
+            error = str(e) if isinstance(e, SpecValidationError) else f"{type(e).__name__}: {e}"
+            bad.append((job, error))
+        if on_result:
+            on_result(job, error)
+        if bad and fail_fast:
+            break
+    return bad
+
+
+def run_job(job: BatchJob, out_root: str, opts: BatchOptions) -> JobResult:
+    if not opts.profile:
+        return _run_job(job, out_root, opts)
+    # each job records its own stages; the batch's traces merge on one timeline afterwards
+    with recording(memory=opts.profile_memory) as rec:
+        with stage("job", source=job.source, out=job.out_name) as st:
+            res = _run_job(job, out_root, opts)
+            st.args["status"] = res.status if res.ok else "failed"
+    res.trace = rec.events
+    return res
+
+
+def _run_job(job: BatchJob, out_root: str, opts: BatchOptions) -> JobResult:
+    out_dir = Path(out_root) / job.out_name
+    t0 = time.perf_counter()
+    try:
+        data = load_job_data(job)
+        spec = project_spec_from_dict(data, use_ai=opts.use_ai, hint=opts.hint, layout_cache=opts.layout_cache)
+        cache = DiskCache(Path(opts.cache_dir), max_bytes=opts.cache_max_bytes) if opts.cache_dir else None
+        files = None
+        if opts.archive:
+            status, files = project_files(spec, cache if opts.use_cache else None, backend=opts.backend, route=opts.route)
+        else:
+            status = generate_project(
+                spec, out_dir, use_cache=opts.use_cache, cache=cache, backend=opts.backend, route=opts.route, update=opts.update
+            )
+    except Exception as e:
+        # one bad spec must not take the rest of the batch down
+        return JobResult(job.kind, job.source, str(out_dir), False, time.perf_counter() - t0, f"{type(e).__name__}: {e}")
+    return JobResult(job.kind, job.source, str(out_dir), True, time.perf_counter() - t0, status=status, files=files)
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    out_root: Path,
+    workers: Optional[int] = None,
+    opts: Optional[BatchOptions] = None,
+    on_result: Optional[Callable[[JobResult], None]] = None,
+    archive: Optional[ProjectArchive] = None,
+) -> List[JobResult]:
+    """
+    Run generate_project for every job on a process pool (workers=1 runs inline).
+    Results are returned in job order; on_result sees them as they finish.
+    With an archive, projects are built in memory instead and written into it (each
+    under its out_name folder) as they finish; out_root is then only used in names.
+    """
+    opts = opts or BatchOptions()
+    if archive is not None:
+        opts = replace(opts, archive=True)
+        out_root = Path(archive.name)
+    else:
+        out_root = Path(out_root).expanduser().resolve()
+        out_root.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    results: List[Optional[JobResult]] = [None] * len(jobs)
+
+    def _done(i: int, res: JobResult) -> None:
+        if archive is not None and res.files is not None:
+            archive.add(jobs[i].out_name, res.files)
+            res.files = None
+        results[i] = res
+        if on_result:
+            on_result(res)
+
+    if workers == 1 or len(jobs) <= 1:
+        for i, job in enumerate(jobs):
+            _done(i, run_job(job, str(out_root), opts))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = {pool.submit(run_job, job, str(out_root), opts): i for i, job in enumerate(jobs)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:  # worker died (e.g. BrokenProcessPool)
+                    job = jobs[i]
+                    res = JobResult(job.kind, job.source, str(out_root / job.out_name), False, 0.0, f"{type(e).__name__}: {e}")
+                _done(i, res)
+
+    return [r for r in results if r is not None]
+
+
+def results_to_json(results: List[JobResult], wall_seconds: float) -> Dict[str, Any]:
+    return {
+        "total": len(results),
+        "ok": sum(1 for r in results if r.ok),
+        "failed": sum(1 for r in results if not r.ok),
+        "wall_seconds": round(wall_seconds, 4),
+        "jobs": [{k: v for k, v in asdict(r).items() if k not in ("files", "trace")} for r in results],
+    }
@@ -0,0 +1,1859 @@
+"""
+Performance checks that can gate CI.
+
+  python -m pcbgen.bench startup [--budget-ms 250]
+  python -m pcbgen.bench prompts [--count 20000]
+  python -m pcbgen.bench writer [--count 200]
+  python -m pcbgen.bench symbols [--runs 5]
+  python -m pcbgen.bench footprints [--runs 5]
+  python -m pcbgen.bench place [--sizes 50,200,500,1000]
+  python -m pcbgen.bench netlist [--sizes 1000,5000,20000]
+  python -m pcbgen.bench route [--sizes 25,50,100,200] [--workers 4]
+  python -m pcbgen.bench check [--sizes 100,400,1600] [--routed-sizes 25,50]
+  python -m pcbgen.bench sexpr [--parts 5000] [FILE ...]
+  python -m pcbgen.bench update [--sizes 500,2000,8000]
+  python -m pcbgen.bench archive [--count 200] [--format zip]
+  python -m pcbgen.bench sweep [--max-ratio 0.5]
+  python -m pcbgen.bench trace [--count 40] [--workers 2]
+  python -m pcbgen.bench suite [--scales 1,10,100] [--out FILE] [--compare BASE]
+  python -m pcbgen.bench compare BASE NEW [--threshold 0.25] [--min-ms 2] [--allow-missing]
+  python -m pcbgen.bench watch [--edits 10] [--budget-ms 1000]
+
+startup: times a cold `pcbgen --spec` run in fresh interpreters (the run hits the
+output manifest, so it is pure startup + spec load), prints the slowest imports as
+reported by `python -X importtime`, and fails if the run exceeds the budget or
+pulls in a heavy module that only some runs need.
+
+prompts: parses a synthetic prompt corpus with `spec_from_prompt` and with the
+original per-rule regex parser (kept below as the reference), reports both
+throughputs and fails if any prompt yields a different spec.
+
+writer: builds schematics for the example specs and a synthetic set of every board
+type, saves each with both backends (kicad_sch_api and the streaming writer),
+reports the save throughput of each and fails unless the two files are the same
+S-expression once UUID values and number spelling are factored out. Both backends'
+schematics of the examples must also match the golden files in tests/golden, so a
+change to either writer, or a new kicad_sch_api, can't shift the output unnoticed;
+`--update-golden` rewrites them after a deliberate change.
+
+symbols: for each library the templates use, times a full parse of the .kicad_sym
+against opening the persistent symbol index and looking every symbol up, and fails
+if the index serves a different definition than a fresh parse.
+
+footprints: the same for the footprint libraries the templates use: parsing every
+.kicad_mod against opening the footprint index, and fails if the index's pads, pad
+shapes or courtyard differ from a fresh parse.
+
+place: places synthetic boards of each size (headers with passives hung on their
+signals, all on shared VCC/GND), reports placement time, half-perimeter wirelength
+against the legalised-but-unoptimised start, and board utilisation, and fails if
+courtyards overlap or a board takes longer than the budget.
+
+netlist: builds the netlist of synthetic boards with `build_netlist` and checks every
+pin against the net of the label hung on it (looked up directly, the way the
+templates attach them), reporting pins per second.
+
+route: places and routes synthetic boards of growing size, reporting nets, the share
+routed, routing time, tracks and vias; each board is routed serially and on
+`--workers` processes, and the bench fails if the two differ or completion drops
+below `--min-completion`.
+
+check: writes placed synthetic boards of each size and runs `pcbgen.drc.check_board`
+on them, reporting the time per part, which should stay roughly flat as boards
+grow; the smaller `--routed-sizes` boards are routed first. Fails on any clearance,
+courtyard or off-board violation (placement and routing must never produce one),
+on an unconnected net the router reported as routed, or if the time per part on
+the largest board is over 3x that on the smallest.
+
+sexpr: reads KiCad files (a synthetic schematic and board, out/TestBoard, and any
+FILE given) with a naive full parse (kept below as the reference) and with the
+lazy memory-mapped reader, reporting open time, the time to list every top-level
+item's head and uuid, and peak Python memory of each; fails if fully expanding the
+lazy tree gives anything but the naive parse.
+
+update: writes synthetic schematics, hand-edits one symbol in the file, changes
+another symbol's value in the design, and times `update_schematic` with the last
+generation's digests and without them against writing the whole file again. Fails
+unless the update with digests rewrites only the changed symbol, keeps the hand
+edit and otherwise leaves the file a fresh write of the new design would be, or if
+the one without digests rewrites anything but those two symbols.
+
+archive: generates a batch of synthetic prompt projects into folders and into one
+archive, reporting wall time, write syscalls (from /proc/self/io, where there is
+one) and files and directories created by each. Fails if any archived file differs
+from its folder copy or if the archive does not cut both the syscalls and the inodes.
+
+sweep: runs parameter sweeps over the example boards (pull-up and decoupling values,
+the VCC net, an ESP32 header length) with `run_sweep` and as one independent
+`generate_project` per variant, reporting both times and the placements the sweep
+needed. Fails if any variant's schematic differs from the independent one (item
+order aside) or its board differs at all, or if the sweep takes more than
+`--max-ratio` of the independent runs. The example schematics are small enough to
+be written whole, so each sweep is repeated with every schematic patched from the
+base, and that run is checked as well.
+
+trace: times a disabled stage mark (what every run pays for the profiling hooks) and
+runs a profiled batch of synthetic prompt jobs on `--workers` processes. Fails if a
+disabled mark costs over a microsecond, or if the merged Chrome trace is missing a
+job, has a stage outside its job, or shows only one process.
+
+suite: the baseline for everything above. Every example board at every `--scales`
+factor (decoupling lists repeated, ESP32 headers grown to 40 pins; the buck module
+has nothing to grow) is generated `--runs` times, keeping the best time of each
+profiling stage (pcbgen.trace), next to cold start in a fresh interpreter (a no-op
+run and a full build) and prompt parsing per board type. Prints how each stage
+scales and writes the results as JSON with `--out`.
+
+compare: checks a suite result against an earlier one (or `suite --compare BASE`
+does it in one go) and fails if any stage got more than `--threshold` slower by more
+than `--min-ms`, so timer noise on sub-millisecond stages doesn't fail CI. A stage or
+case the baseline has and the new result lacks fails too (a renamed or dropped stage
+would otherwise pass silently) unless `--allow-missing`. Each result holds the time of
+a fixed calibration loop, and new times are scaled by the ratio of the two first, so a
+slower or busier machine alone doesn't read as a regression.
+
+watch: runs a SpecWatcher on a copy of the I2C example and edits it, timing each save
+to the regenerated project against a cold `pcbgen --spec` run. Fails if an edit is
+missed, a comment-only save regenerates, a burst of saves regenerates more than
+once, or the median latency is over `--budget-ms`.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+# the examples' schematics as KiCad should see them (bench writer, tests/test_golden.py)
+GOLDEN_DIR = Path(__file__).resolve().parent.parent / "tests" / "golden"
+
+# Only the code paths that need these may import them.
+HEAVY_MODULES = ("openai", "kicad_sch_api", "numpy", "pcbgen.pcb_placer", "pcbgen.router", "pcbgen.drc", "pcbgen.sexpr", "pcbgen.templates_i2c", "pcbgen.templates_esp32dev", "pcbgen.templates_buck")
+
+
+def _run(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env)
+
+
+def import_profile(module: str = "pcbgen.cli") -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every import, from `python -X importtime`."""
+    proc = _run(["-X", "importtime", "-c", f"import {module}"])
+    rows: List[Tuple[str, int, int]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+
+def heavy_modules_loaded(module: str = "pcbgen.cli") -> List[str]:
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return _run(["-c", code]).stdout.split()
+
+
+def time_command(args: List[str], runs: int = 5, env: Optional[Dict[str, str]] = None) -> float:
+    """Best-of-N wall time in seconds for `python <args>` in a fresh interpreter."""
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = _run(args, env)
+        dt = time.perf_counter() - t0
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr}")
+        best = min(best, dt)
+    return best
+
+
+def startup_report(spec: Path, runs: int = 5) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        cmd = ["-m", "pcbgen.cli", "--spec", str(spec), "--out", tmp]
+        # First run builds the project (and needs the schematic stack); the timed
+        # runs then hit the manifest, which is what a no-op regeneration costs.
+        proc = _run(cmd)
+        if proc.returncode != 0:
+            raise RuntimeError(f"initial --spec run failed:\n{proc.stderr}")
+        spec_s = time_command(cmd, runs)
+    python_s = time_command(["-c", "pass"], runs)
+    return {
+        "python_s": python_s,
+        "spec_run_s": spec_s,
+        "overhead_s": spec_s - python_s,
+        "heavy_modules": heavy_modules_loaded(),
+        "top_imports": sorted(import_profile(), key=lambda r: r[2], reverse=True)[:10],
+    }
+
+
+def _startup_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench startup", description="Cold-start benchmark for `pcbgen --spec`.")
+    ap.add_argument("--spec", default=str(EXAMPLES_DIR / "i2c_breakout.yaml"))
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("PCBGEN_STARTUP_BUDGET_MS", "250")))
+    args = ap.parse_args(argv)
+
+    rep = startup_report(Path(args.spec), args.runs)
+    print(f"python -c pass      : {rep['python_s'] * 1000:7.1f} ms")
+    print(f"pcbgen --spec (noop): {rep['spec_run_s'] * 1000:7.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"pcbgen overhead     : {rep['overhead_s'] * 1000:7.1f} ms")
+    print("slowest imports (cumulative):")
+    for name, self_us, cum_us in rep["top_imports"]:
+        print(f"  {cum_us / 1000:7.1f} ms  {name}")
+
+    ok = True
+    if rep["heavy_modules"]:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(rep['heavy_modules'])}")
+        ok = False
+    if rep["spec_run_s"] * 1000 > args.budget_ms:
+        print("FAIL: startup over budget")
+        ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# prompts
+# ---------------------------------------------------------------------------
+
+# The prompts the docs use, plus one per board type.
+EXAMPLE_PROMPTS = (
+    "Make a 3.3V I2C breakout with 4-pin header, 4.7k pullups, 100n + 1u decoupling",
+    "ESP32 devboard, 1x19 headers, 3.3V rail with 100n and 10u caps",
+    "12V to 5V buck converter, 22u in, 47u out",
+    "Tiny IMU sensor board, 5 pin header, 10k pull-up resistors",
+    "3.3 V regulator module with 10u in and 22u out\nand 100n decoupling",
+)
+
+
+def _legacy_spec_from_prompt(prompt: str) -> Dict[str, Any]:
+    # spec_from_prompt as it was before the single-pass lexer: one regex scan per rule.
+    from pcbgen.ai_spec import _cap_footprint_for, _make_base_spec, slug_name
+
+    text = prompt.strip()
+    tl = text.lower()
+
+    t = text.lower()
+    if "buck" in t or "converter" in t or "regulator" in t:
+        board_type = "buck_module"
+    elif "esp32" in t or "devboard" in t or "dev board" in t:
+        board_type = "esp32_devboard"
+    else:
+        board_type = "i2c_breakout"
+
+    vcc_net = "+3V3"
+    m = re.search(r"\b(1\.8|2\.5|3\.0|3\.3|5|12)\s*v\b", tl)
+    if m:
+        vcc_net = {"5": "+5V", "12": "+12V", "3.3": "+3V3", "3.0": "+3V0", "2.5": "+2V5", "1.8": "+1V8"}[m.group(1)]
+
+    spec = _make_base_spec(name=slug_name(text), board_type=board_type, vcc_net=vcc_net)
+
+    vals = [f"{g[0]}{g[2]}" for g in re.findall(r"\b(\d+(\.\d+)?)\s*(n|u)\b", tl)]
+    if not vals:
+        cap_vals = ["100n", "1u"]
+    else:
+        cap_vals = []
+        for v in vals:
+            if v not in cap_vals:
+                cap_vals.append(v)
+        if not any(v.endswith("n") for v in cap_vals):
+            cap_vals.insert(0, "100n")
+        cap_vals = cap_vals[:4]
+    spec["decoupling"] = [{"value": v, "footprint": _cap_footprint_for(v)} for v in cap_vals]
+
+    if board_type == "i2c_breakout":
+        hpins = 4
+        m = re.search(r"\b(\d+)\s*-\s*pin\b|\b(\d+)\s*pin\b", tl)
+        if m and 2 <= int(m.group(1) or m.group(2)) <= 20:
+            hpins = int(m.group(1) or m.group(2))
+        if hpins == 4:
+            header_pins = ["VCC", "GND", "SDA", "SCL"]
+        elif hpins == 5:
+            header_pins = ["VCC", "GND", "SDA", "SCL", "INT"]
+        else:
+            header_pins = ["VCC", "GND", "SDA", "SCL", "INT", "ADDR"][:hpins]
+
+        add_pullups, pull_ohms = False, 4700
+        if "pullup" in tl or "pull-up" in tl:
+            add_pullups = True
+            m = re.search(r"\b(\d+(\.\d+)?)\s*(k|kohm|kΩ)\b", tl)
+            m2 = re.search(r"\b(\d{3,6})\s*(ohm|Ω)?\b", tl)
+            if m:
+                pull_ohms = int(round(float(m.group(1)) * 1000))
+            elif m2 and 200 <= int(m2.group(1)) <= 200000:
+                pull_ohms = int(m2.group(1))
+        spec["i2c"] = {"header_pins": header_pins, "pullups_ohms": pull_ohms, "add_pullups": add_pullups}
+        spec["connectors"]["header_footprint"] = (
+            f"Connector_PinHeader_2.54mm:PinHeader_1x{hpins:02d}_P2.54mm_Vertical"
+            if hpins in (4, 5, 6)
+            else "Connector_PinHeader_2.54mm:PinHeader_1x04_P2.54mm_Vertical"
+        )
+
+    if board_type == "esp32_devboard":
+        m = re.search(r"\b1x(\d{1,2})\b", tl)
+        pins = int(m.group(1)) if m else 15
+        if pins < 6:
+            pins = 15
+        fp = f"Connector_PinHeader_2.54mm:PinHeader_1x{pins}_P2.54mm_Vertical"
+        spec["headers"] = {"left": {"pins": pins, "footprint": fp}, "right": {"pins": pins, "footprint": fp}}
+        spec["i2c"]["add_pullups"] = False
+
+    if board_type == "buck_module":
+        vout = "+5V"
+        if "3.3" in tl:
+            vout = "+3V3"
+        if "12" in tl:
+            vout = "+12V"
+        spec["power"].update({"vin_net": "VIN", "vout_net": vout, "vcc_net": vout, "gnd_net": "GND"})
+        cin = re.search(r"\b(\d+(\.\d+)?)\s*u\b.*\bin\b", tl)
+        cout = re.search(r"\b(\d+(\.\d+)?)\s*u\b.*\bout\b", tl)
+        if cin:
+            spec["stage"]["in_cap"] = {"value": f"{cin.group(1)}u", "footprint": _cap_footprint_for(f"{cin.group(1)}u")}
+        if cout:
+            spec["stage"]["out_cap"] = {"value": f"{cout.group(1)}u", "footprint": _cap_footprint_for(f"{cout.group(1)}u")}
+
+    return spec
+
+
+_FRAGMENTS = (
+    "i2c breakout", "esp32 devboard", "dev board", "buck converter", "LDO regulator", "imu sensor",
+    "SDA/SCL", "pull-up", "pullups", "decoupling", "header", "caps", "rail", "in", "out", "-", ",", "+", "\n",
+)
+_FILLER = (
+    "hi team", "the customer wants", "please build", "a small board", "for the rover", "with", "and", "plus",
+    "ticket", "rev", "we need", "as discussed on the call", "keep it cheap", "same as last time but",
+    "mounting holes optional", "silkscreen logo", "thanks!", "asap", "no rush", "see attached notes",
+)
+_QUANTITIES = (
+    "{v}V", "{v} v", "{n}-pin", "{n} pin", "{n}pin", "1x{h}", "{r}k", "{r} kohm", "{o} ohm", "{o}",
+    "{c}n", "{c} u", "{c}u", "{c}.{d}u", "0.{d}v", "{n}.{d}-pin", "{o}.{d}", "{c}uF", "#{o}",
+)
+
+
+def synthetic_prompts(count: int, seed: int = 1) -> List[str]:
+    """Deterministic ticket-like prompts: prose, board keywords, units and the odd malformed number."""
+    rng = random.Random(seed)
+    out: List[str] = []
+    for _ in range(count):
+        parts: List[str] = []
+        for _ in range(rng.randint(6, 40)):
+            r = rng.random()
+            if r < 0.2:
+                parts.append(
+                    rng.choice(_QUANTITIES).format(
+                        v=rng.choice(("1.8", "2.5", "3.0", "3.3", "5", "12", "24", "0.8")),
+                        n=rng.randint(1, 24),
+                        h=rng.randint(3, 30),
+                        r=rng.choice(("4.7", "10", "2.2", "1")),
+                        o=rng.choice((100, 470, 4700, 10000, 1000000)),
+                        c=rng.choice((1, 10, 22, 47, 100, 220)),
+                        d=rng.randint(0, 9),
+                    )
+                )
+            elif r < 0.45:
+                parts.append(rng.choice(_FRAGMENTS))
+            else:
+                parts.append(rng.choice(_FILLER))
+        out.append(" ".join(parts))
+    return out
+
+
+def _time_parser(fn: Any, prompts: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in prompts:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def prompt_report(count: int = 20000, repeat: int = 3, seed: int = 1) -> Dict[str, Any]:
+    from pcbgen.ai_spec import spec_from_prompt
+
+    prompts = list(EXAMPLE_PROMPTS) + synthetic_prompts(count, seed)
+    mismatches = [p for p in prompts if spec_from_prompt(p) != _legacy_spec_from_prompt(p)]
+    legacy_s = _time_parser(_legacy_spec_from_prompt, prompts, repeat)
+    lexer_s = _time_parser(spec_from_prompt, prompts, repeat)
+    return {
+        "prompts": len(prompts),
+        "legacy_s": legacy_s,
+        "lexer_s": lexer_s,
+        "speedup": legacy_s / lexer_s if lexer_s else float("inf"),
+        "mismatches": mismatches,
+    }
+
+
+def _prompts_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench prompts", description="Prompt parser throughput and equivalence check.")
+    ap.add_argument("--count", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    rep = prompt_report(args.count, args.repeat, args.seed)
+    n = rep["prompts"]
+    print(f"prompts             : {n}")
+    print(f"per-rule regexes    : {rep['legacy_s'] * 1000:8.1f} ms  ({n / rep['legacy_s']:9.0f} prompts/s)")
+    print(f"single-pass lexer   : {rep['lexer_s'] * 1000:8.1f} ms  ({n / rep['lexer_s']:9.0f} prompts/s)")
+    print(f"speedup             : {rep['speedup']:8.2f}x")
+    if rep["mismatches"]:
+        print(f"FAIL: {len(rep['mismatches'])} prompts parse differently, e.g. {rep['mismatches'][0]!r}")
+        return 1
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# writer
+# ---------------------------------------------------------------------------
+
+_SEXPR_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[()]|[^\s()"]+')
+_UUID = re.compile(r"(/?)([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})")
+
+
+def sexpr_signature(text: str) -> List[str]:
+    """
+    Token stream of an S-expression file with layout, number spelling (0 vs 0.0000)
+    and UUID values factored out: each UUID becomes its first-appearance index, so
+    references between them (instance paths) still have to line up.
+    """
+    ids: Dict[str, int] = {}
+    out: List[str] = []
+    for tok in _SEXPR_TOKEN.findall(text):
+        if tok[0] == '"':
+            m = _UUID.fullmatch(tok[1:-1])
+            if m:
+                tok = f'"{m.group(1)}#{ids.setdefault(m.group(2), len(ids))}"'
+        elif tok not in "()":
+            try:
+                tok = repr(round(float(tok), 4) + 0.0)
+            except ValueError:
+                pass
+        out.append(tok)
+    return out
+
+
+def writer_designs(count: int, seed: int = 1) -> List[Any]:
+    """The example specs plus `count` synthetic specs, as backend-neutral SchematicDesigns."""
+    from pcbgen.ai_spec import spec_from_prompt
+    from pcbgen.kicad_project import template_design
+    from pcbgen.spec import load_spec_file, project_spec_from_dict
+
+    datas = [load_spec_file(p) for p in sorted(EXAMPLES_DIR.glob("*.yaml"))]
+    datas += [spec_from_prompt(p) for p in synthetic_prompts(count, seed)]
+    return [template_design(project_spec_from_dict(data)) for data in datas]
+
+
+def _golden_path(spec: Path) -> Path:
+    return GOLDEN_DIR / f"{spec.stem}.kicad_sch"
+
+
+def golden_mismatches(backends: Tuple[str, ...] = ("ksa", "stream"), update: bool = False) -> List[str]:
+    """
+    Each example's schematic from every backend against its checked-in golden file
+    (GOLDEN_DIR), compared as sexpr_signature. With update, the stream writer's output
+    becomes the new golden files; review their diff before committing them.
+    """
+    from pcbgen.design import save_design
+    from pcbgen.kicad_project import template_design
+    from pcbgen.spec import load_spec_file, project_spec_from_dict
+
+    mismatches: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        for spec in sorted(EXAMPLES_DIR.glob("*.yaml")):
+            design = template_design(project_spec_from_dict(load_spec_file(spec)))
+            golden = _golden_path(spec)
+            if update:
+                golden.parent.mkdir(parents=True, exist_ok=True)
+                save_design(design, golden, "stream")
+            if not golden.exists():
+                mismatches.append(f"{spec.name}: no golden file at {golden}")
+                continue
+            want = sexpr_signature(golden.read_text(encoding="utf-8"))
+            for backend in backends:
+                path = Path(tmp) / f"{spec.stem}-{backend}.kicad_sch"
+                save_design(design, path, backend)
+                if sexpr_signature(path.read_text(encoding="utf-8")) != want:
+                    mismatches.append(f"{spec.name}: the {backend} backend no longer writes {golden.name}")
+    return mismatches
+
+
+def writer_report(count: int = 200, seed: int = 1) -> Dict[str, Any]:
+    from pcbgen.design import save_with_ksa
+    from pcbgen.sch_writer import save_streaming
+
+    designs = writer_designs(count, seed)
+    seconds = {"ksa": 0.0, "stream": 0.0}
+    mismatches: List[str] = []
+    skipped = 0
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        for i, design in enumerate(designs):
+            texts: Dict[str, str] = {}
+            errors: Dict[str, str] = {}
+            for backend, save in (("ksa", save_with_ksa), ("stream", save_streaming)):
+                path = Path(tmp) / f"{i}-{backend}.kicad_sch"
+                t0 = time.perf_counter()
+                try:
+                    save(design, path)
+                except Exception as e:
+                    errors[backend] = f"{type(e).__name__}: {e}"
+                    continue
+                seconds[backend] += time.perf_counter() - t0
+                texts[backend] = path.read_text(encoding="utf-8")
+            if len(errors) == 2:
+                skipped += 1  # e.g. a symbol missing from the installed libraries
+            elif errors:
+                mismatches.append(f"{design.name}: only one backend failed ({errors})")
+            elif sexpr_signature(texts["ksa"]) != sexpr_signature(texts["stream"]):
+                mismatches.append(f"{design.name}: schematics differ")
+    written = len(designs) - skipped
+    return {
+        "schematics": written,
+        "skipped": skipped,
+        "ksa_s": seconds["ksa"],
+        "stream_s": seconds["stream"],
+        "speedup": seconds["ksa"] / seconds["stream"] if seconds["stream"] else float("inf"),
+        "mismatches": mismatches,
+        "golden": golden_mismatches() if written else [],
+    }
+
+
+def _writer_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench writer", description="Schematic backend throughput and equivalence check.")
+    ap.add_argument("--count", type=int, default=200, help="Synthetic specs on top of the examples")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--update-golden", action="store_true", help="Rewrite the golden schematics from the stream writer, then check")
+    args = ap.parse_args(argv)
+
+    if args.update_golden:
+        golden_mismatches(update=True)
+        print(f"golden schematics rewritten in {GOLDEN_DIR}")
+    rep = writer_report(args.count, args.seed)
+    n = rep["schematics"]
+    if not n:
+        print("FAIL: no schematic could be written (is KICAD_SYMBOL_DIR set?)")
+        return 1
+    print(f"schematics          : {n}" + (f"  ({rep['skipped']} skipped: symbols not installed)" if rep["skipped"] else ""))
+    print(f"kicad_sch_api       : {rep['ksa_s'] * 1000:8.1f} ms  ({n / rep['ksa_s']:7.0f} schematics/s)")
+    print(f"stream writer       : {rep['stream_s'] * 1000:8.1f} ms  ({n / rep['stream_s']:7.0f} schematics/s)")
+    print(f"speedup             : {rep['speedup']:8.2f}x")
+    if rep["mismatches"]:
+        print(f"FAIL: {len(rep['mismatches'])} schematics differ between backends, e.g. {rep['mismatches'][0]}")
+        return 1
+    for m in rep["golden"]:
+        print(f"  FAIL: {m}")
+    return 1 if rep["golden"] else 0
+
+
+# ---------------------------------------------------------------------------
+# symbols
+# ---------------------------------------------------------------------------
+
+# one symbol from each library the templates use
+SYMBOL_LIBS = ("Device:C", "Connector_Generic:Conn_01x04")
+
+
+def symbol_report(runs: int = 5) -> List[Dict[str, Any]]:
+    from pcbgen.symbol_index import SymbolIndex, ensure_index, find_library, open_index, render_symbol, top_level_symbols
+
+    rows = []
+    for lib_id in SYMBOL_LIBS:
+        lib, _, name = lib_id.partition(":")
+        source = find_library(lib, name)
+        t0 = time.perf_counter()
+        ensure_index(source)  # builds it if this is the first run
+        ensure_s = time.perf_counter() - t0
+
+        parse_s = index_s = float("inf")
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            text = source.read_text(encoding="utf-8")
+            parsed = {n: render_symbol(lib, n, text[a:b]) for n, a, b in top_level_symbols(text)}
+            parse_s = min(parse_s, time.perf_counter() - t0)
+
+            # what a fresh process pays for its symbol: validity check, mmap, one lookup
+            t0 = time.perf_counter()
+            index = SymbolIndex(source, ensure_index(source))
+            index.get(name)
+            index_s = min(index_s, time.perf_counter() - t0)
+
+        # what every later lookup in that process pays, the library's stat included
+        open_index(str(source))
+        t0 = time.perf_counter()
+        served = {n: open_index(str(source)).get(n) for n in parsed}
+        lookup_s = (time.perf_counter() - t0) / max(len(parsed), 1)
+        rows.append(
+            {
+                "library": str(source),
+                "symbols": len(parsed),
+                "ensure_s": ensure_s,
+                "parse_s": parse_s,
+                "index_s": index_s,
+                "lookup_s": lookup_s,
+                "mismatches": [n for n in parsed if served[n] != parsed[n]],
+            }
+        )
+    return rows
+
+
+def _symbols_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench symbols", description="Symbol library parse vs persistent index.")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    try:
+        rows = symbol_report(args.runs)
+    except ValueError as e:
+        print(f"FAIL: {e}")
+        return 1
+    ok = True
+    for r in rows:
+        n = r["symbols"]
+        print(f"{r['library']}  ({n} symbols)")
+        print(f"  first ensure_index : {r['ensure_s'] * 1000:8.2f} ms")
+        print(f"  parse .kicad_sym   : {r['parse_s'] * 1000:8.2f} ms")
+        print(f"  index open + lookup: {r['index_s'] * 1000:8.2f} ms")
+        print(f"  warm lookup        : {r['lookup_s'] * 1e6:8.1f} us")
+        if r["mismatches"]:
+            print(f"  FAIL: index differs from a fresh parse for {', '.join(r['mismatches'][:5])}")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# footprints
+# ---------------------------------------------------------------------------
+
+FOOTPRINT_LIBS = ("Capacitor_SMD", "Resistor_SMD", "Connector_PinHeader_2.54mm")
+
+
+def footprint_report(runs: int = 5) -> List[Dict[str, Any]]:
+    from pcbgen.footprint_index import FootprintIndex, ensure_footprint_index, find_footprint_library, footprint_info, parse_footprint
+
+    rows = []
+    for lib in FOOTPRINT_LIBS:
+        pretty = find_footprint_library(lib)
+        if pretty is None:
+            raise ValueError(f"Footprint library {lib!r} not found; set KICAD_FOOTPRINT_DIR to your KiCad footprints folder.")
+        t0 = time.perf_counter()
+        ensure_footprint_index(pretty)
+        ensure_s = time.perf_counter() - t0
+
+        parse_s = index_s = float("inf")
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            parsed = {f.stem: parse_footprint(f.read_text(encoding="utf-8")) for f in pretty.glob("*.kicad_mod")}
+            parse_s = min(parse_s, time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            index = FootprintIndex(pretty, ensure_footprint_index(pretty))
+            index.get(next(iter(parsed), ""))
+            index_s = min(index_s, time.perf_counter() - t0)
+
+        # what every later lookup in that process pays, the freshness stats included
+        footprint_info(f"{lib}:{next(iter(parsed), '')}")
+        t0 = time.perf_counter()
+        served = {n: footprint_info(f"{lib}:{n}") for n in parsed}
+        lookup_s = (time.perf_counter() - t0) / max(len(parsed), 1)
+        rows.append(
+            {
+                "library": str(pretty),
+                "footprints": len(parsed),
+                "ensure_s": ensure_s,
+                "parse_s": parse_s,
+                "index_s": index_s,
+                "lookup_s": lookup_s,
+                "mismatches": [
+                    n for n in parsed if served[n] is None or (served[n].pads, served[n].courtyard, served[n].shapes) != parsed[n]
+                ],
+            }
+        )
+    return rows
+
+
+def _footprints_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench footprints", description="Footprint parse vs persistent index.")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    try:
+        rows = footprint_report(args.runs)
+    except ValueError as e:
+        print(f"FAIL: {e}")
+        return 1
+    ok = True
+    for r in rows:
+        print(f"{r['library']}  ({r['footprints']} footprints)")
+        print(f"  first ensure       : {r['ensure_s'] * 1000:8.2f} ms")
+        print(f"  parse .kicad_mod   : {r['parse_s'] * 1000:8.2f} ms")
+        print(f"  index open + lookup: {r['index_s'] * 1000:8.2f} ms")
+        print(f"  warm lookup        : {r['lookup_s'] * 1e6:8.1f} us")
+        if r["mismatches"]:
+            print(f"  FAIL: index differs from a fresh parse for {', '.join(r['mismatches'][:5])}")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# place
+# ---------------------------------------------------------------------------
+
+_PASSIVE_SIZES = ("0402_1005", "0603_1608", "0805_2012")
+
+
+def synthetic_board(parts: int, seed: int = 1) -> Any:
+    """
+    A SchematicDesign of about `parts` footprints: 1xN headers, each with an R or C on
+    every signal pin going to ground, the rail or a neighbouring signal.
+    """
+    from pcbgen.placer import Cell, Group, place
+    from pcbgen.symbols import conn_lib_id
+
+    rng = random.Random(seed)
+    groups = []
+    count = 0
+    signal = 0
+    while count < parts:
+        pins = rng.choice((4, 6, 8, 10))
+        local = [f"N{signal + k}" for k in range(pins - 2)]
+        signal += len(local)
+        nets = {"1": "VCC", "2": "GND", **{str(k + 3): net for k, net in enumerate(local)}}
+        cells = [
+            Cell(
+                f"J{len(groups) + 1}",
+                conn_lib_id(pins),
+                "HDR",
+                f"Connector_PinHeader_2.54mm:PinHeader_1x{pins:02d}_P2.54mm_Vertical",
+                nets,
+                stub=5.08,
+            )
+        ]
+        for net in local:
+            kind, lib = rng.choice((("R", "Resistor_SMD"), ("C", "Capacitor_SMD")))
+            other = rng.choice(("GND", "VCC", rng.choice(local)))
+            fp = f"{lib}:{kind}_{rng.choice(_PASSIVE_SIZES)}Metric"
+            cells.append(Cell(f"{kind}{count + len(cells)}", f"Device:{kind}", "10k", fp, {"1": net, "2": other}))
+        groups.append(Group(f"g{len(groups)}", cells))
+        count += len(cells)
+    return place(f"Synthetic{parts}", groups)
+
+
+def place_report(sizes: List[int], seed: int = 1) -> List[Dict[str, Any]]:
+    from pcbgen.pcb_placer import courtyard_overlaps, place_footprints
+
+    rows = []
+    for size in sizes:
+        design = synthetic_board(size, seed)
+        start = place_footprints(design, iters=0)
+        t0 = time.perf_counter()
+        layout = place_footprints(design)
+        place_s = time.perf_counter() - t0
+        x1, y1, x2, y2 = layout.outline
+        area = sum((c[2] - c[0]) * (c[3] - c[1]) for c in (fp.courtyard for fp in layout.footprints))
+        rows.append(
+            {
+                "parts": len(design.components),
+                "place_s": place_s,
+                "wirelength": layout.wirelength,
+                "start_wirelength": start.wirelength,
+                "board": (x2 - x1, y2 - y1),
+                "utilisation": area / ((x2 - x1) * (y2 - y1)),
+                "overlaps": courtyard_overlaps(layout),
+            }
+        )
+    return rows
+
+
+def _place_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench place", description="Footprint placement on synthetic boards.")
+    ap.add_argument("--sizes", default="50,200,500,1000", help="Comma-separated part counts")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--budget-s", type=float, default=5.0, help="Fail if one board takes longer than this")
+    args = ap.parse_args(argv)
+
+    rows = place_report([int(s) for s in args.sizes.split(",") if s.strip()], args.seed)
+    ok = True
+    print(f"{'parts':>6} {'time':>8} {'HPWL mm':>10} {'start':>10} {'board mm':>15} {'util':>5}")
+    for r in rows:
+        w, h = r["board"]
+        print(
+            f"{r['parts']:6d} {r['place_s']:7.2f}s {r['wirelength']:10.0f} {r['start_wirelength']:10.0f} "
+            f"{w:7.2f}x{h:<7.2f} {r['utilisation']:5.2f}"
+        )
+        if r["overlaps"]:
+            print(f"  FAIL: {len(r['overlaps'])} courtyard overlaps, e.g. {r['overlaps'][0]}")
+            ok = False
+        if r["place_s"] > args.budget_s:
+            print(f"  FAIL: over the {args.budget_s:.1f} s budget")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# netlist
+# ---------------------------------------------------------------------------
+
+
+def _label_nets(design: Any) -> Dict[Tuple[int, str], str]:
+    """Reference: each pin's net is the label on its end, or on the far end of its stub wire."""
+    from pcbgen.symbols import symbol_geometry
+
+    at = {lb.position: lb.text for lb in design.labels}
+    for w in design.wires:
+        if w.end in at:
+            at.setdefault(w.start, at[w.end])
+    out: Dict[Tuple[int, str], str] = {}
+    for i, c in enumerate(design.components):
+        for pin, (px, py) in symbol_geometry(c.lib_id).pins.items():
+            net = at.get((round(c.position[0] + px, 4), round(c.position[1] + py, 4)))
+            if net:
+                out[(i, pin)] = net
+    return out
+
+
+def netlist_report(sizes: List[int], seed: int = 1) -> List[Dict[str, Any]]:
+    from pcbgen.netlist import build_netlist
+
+    rows = []
+    for size in sizes:
+        design = synthetic_board(size, seed)
+        t0 = time.perf_counter()
+        netlist = build_netlist(design)
+        build_s = time.perf_counter() - t0
+        got = {m: netlist.names[i] for i in range(len(netlist)) for m in netlist.pins(i)}
+        want = _label_nets(design)
+        rows.append(
+            {
+                "parts": len(design.components),
+                "pins": len(netlist.members),
+                "nets": len(netlist),
+                "build_s": build_s,
+                "mismatches": sorted(k for k in set(got) | set(want) if got.get(k) != want.get(k)),
+                "merged": netlist.merged,
+            }
+        )
+    return rows
+
+
+def _netlist_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench netlist", description="Union-find netlist on synthetic boards.")
+    ap.add_argument("--sizes", default="1000,5000,20000", help="Comma-separated part counts")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    ok = True
+    print(f"{'parts':>6} {'pins':>7} {'nets':>6} {'time':>9} {'pins/s':>10}")
+    for r in netlist_report([int(s) for s in args.sizes.split(",") if s.strip()], args.seed):
+        print(f"{r['parts']:6d} {r['pins']:7d} {r['nets']:6d} {r['build_s'] * 1000:7.1f}ms {r['pins'] / r['build_s']:10.0f}")
+        if r["mismatches"]:
+            print(f"  FAIL: {len(r['mismatches'])} pins on the wrong net, e.g. {r['mismatches'][0]}")
+            ok = False
+        if r["merged"]:
+            print(f"  FAIL: labels shorted together: {r['merged'][0]}")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# route
+# ---------------------------------------------------------------------------
+
+
+def route_report(sizes: List[int], workers: int, seed: int = 1) -> List[Dict[str, Any]]:
+    from pcbgen.pcb_placer import place_footprints
+    from pcbgen.router import route_board
+
+    rows = []
+    for size in sizes:
+        layout = place_footprints(synthetic_board(size, seed))
+        serial = route_board(layout)
+        parallel = route_board(layout, workers=workers) if workers > 1 else serial
+        rows.append(
+            {
+                "parts": len(layout.footprints),
+                "nets": len(serial.routed) + len(serial.failed),
+                "completion": serial.completion,
+                "route_s": serial.seconds,
+                "parallel_s": parallel.seconds,
+                "segments": len(serial.segments),
+                "vias": len(serial.vias),
+                "length": sum(abs(s.end[0] - s.start[0]) + abs(s.end[1] - s.start[1]) for s in serial.segments),
+                "failed": serial.failed,
+                "same": (serial.segments, serial.vias, serial.failed) == (parallel.segments, parallel.vias, parallel.failed),
+            }
+        )
+    return rows
+
+
+def _route_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench route", description="Two-layer autorouting on synthetic boards.")
+    ap.add_argument("--sizes", default="25,50,100,200", help="Comma-separated part counts")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Processes for the parallel run")
+    ap.add_argument("--min-completion", type=float, default=0.9, help="Fail if a board routes a smaller share of its nets")
+    args = ap.parse_args(argv)
+
+    ok = True
+    print(f"{'parts':>6} {'nets':>5} {'routed':>7} {'time':>8} {'x' + str(args.workers):>8} {'tracks':>7} {'vias':>5} {'length mm':>10}")
+    for r in route_report([int(s) for s in args.sizes.split(",") if s.strip()], args.workers, args.seed):
+        print(
+            f"{r['parts']:6d} {r['nets']:5d} {r['completion']:7.1%} {r['route_s']:7.2f}s {r['parallel_s']:7.2f}s "
+            f"{r['segments']:7d} {r['vias']:5d} {r['length']:10.0f}"
+        )
+        if r["failed"]:
+            print(f"  unrouted: {', '.join(r['failed'][:8])}{' ...' if len(r['failed']) > 8 else ''}")
+        if not r["same"]:
+            print(f"  FAIL: routing on {args.workers} workers differs from the serial result")
+            ok = False
+        if r["completion"] < args.min_completion:
+            print(f"  FAIL: under {args.min_completion:.0%} of nets routed")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# check
+# ---------------------------------------------------------------------------
+
+
+def check_report(sizes: List[int], routed_sizes: List[int], seed: int = 1) -> List[Dict[str, Any]]:
+    from pcbgen.drc import check_board
+    from pcbgen.pcb_placer import place_footprints
+    from pcbgen.pcb_writer import write_board
+    from pcbgen.router import route_board
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size, route in [(s, False) for s in sizes] + [(s, True) for s in routed_sizes]:
+            layout = place_footprints(synthetic_board(size, seed))
+            routing = route_board(layout) if route else None
+            path = Path(tmp) / f"synth{size}.kicad_pcb"
+            with path.open("w", encoding="utf-8") as fh:
+                write_board(layout, fh, routing)
+            result = check_board(path)
+            unconnected = {v.net for v in result.violations if v.kind == "unconnected"}
+            rows.append(
+                {
+                    "parts": result.footprints,
+                    "routed": route,
+                    "pads": result.pads,
+                    "tracks": result.tracks,
+                    "check_s": result.seconds,
+                    "counts": result.counts(),
+                    "errors": [v.message for v in result.violations if v.kind not in ("unconnected", "missing_net")],
+                    "wrongly_routed": sorted(unconnected & set(routing.routed)) if routing else [],
+                }
+            )
+    return rows
+
+
+def _check_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench check", description="Design-rule check scaling on synthetic boards.")
+    ap.add_argument("--sizes", default="100,400,1600", help="Comma-separated part counts (placed only)")
+    ap.add_argument("--routed-sizes", default="25,50", help="Comma-separated part counts that are also routed")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    routed = [int(s) for s in args.routed_sizes.split(",") if s.strip()]
+    rows = check_report(sizes, routed, args.seed)
+    ok = True
+    print(f"{'parts':>6} {'routed':>6} {'pads':>6} {'tracks':>6} {'time':>9} {'us/part':>8}  violations")
+    for r in rows:
+        print(
+            f"{r['parts']:6d} {'yes' if r['routed'] else 'no':>6} {r['pads']:6d} {r['tracks']:6d} {r['check_s'] * 1000:7.1f}ms "
+            f"{r['check_s'] / r['parts'] * 1e6:8.1f}  {r['counts'] or '-'}"
+        )
+        if r["errors"]:
+            print(f"  FAIL: {len(r['errors'])} violations, e.g. {r['errors'][0]}")
+            ok = False
+        if r["wrongly_routed"]:
+            print(f"  FAIL: routed nets left unconnected: {', '.join(r['wrongly_routed'][:5])}")
+            ok = False
+    placed = [r for r in rows if not r["routed"]]
+    if len(placed) > 1:
+        growth = (placed[-1]["check_s"] / placed[-1]["parts"]) / (placed[0]["check_s"] / placed[0]["parts"])
+        print(f"time per part, largest vs smallest board: {growth:.2f}x")
+        if growth > 3:
+            print("  FAIL: the check is not scaling linearly")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# sexpr
+# ---------------------------------------------------------------------------
+
+_NAIVE_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[()]|[^\s()"]+')
+
+
+def _naive_sexpr(text: str) -> list:
+    """Reference: tokenise everything and build the whole tree as nested lists."""
+    stack: List[list] = [[]]
+    for m in _NAIVE_TOKEN_RE.finditer(text):
+        tok = m.group()
+        if tok == "(":
+            stack.append([])
+        elif tok == ")":
+            done = stack.pop()
+            stack[-1].append(done)
+        elif tok[0] == '"':
+            body = tok[1:-1]
+            if "\\" in body:
+                body = re.sub(r"\\(.)", lambda e: {"n": "\n", "t": "\t", "r": "\r"}.get(e.group(1), e.group(1)), body)
+            stack[-1].append(body)
+        else:
+            stack[-1].append(tok)
+    return stack[0][0]
+
+
+def _naive_listing(path: Path) -> List[Tuple[str, Optional[str]]]:
+    tree = _naive_sexpr(path.read_text(encoding="utf-8"))
+    out = []
+    for item in tree[1:]:
+        if isinstance(item, list):
+            uid = next((x[1] for x in item[1:] if isinstance(x, list) and x[:1] == ["uuid"] and len(x) > 1), None)
+            out.append((item[0], uid))
+    return out
+
+
+def _lazy_listing(path: Path) -> List[Tuple[str, Optional[str]]]:
+    from pcbgen.sexpr import open_sexpr
+
+    with open_sexpr(path) as doc:
+        return [(node.head, node.get("uuid")) for node in doc.root.children()]
+
+
+def _peak_bytes(fn: Any, *args: Any) -> int:
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def sexpr_files(parts: int, tmp: Path, seed: int = 1) -> List[Path]:
+    from pcbgen.pcb_placer import place_footprints
+    from pcbgen.pcb_writer import write_board
+    from pcbgen.sch_writer import save_streaming
+
+    design = synthetic_board(parts, seed)
+    sch = tmp / f"synth{parts}.kicad_sch"
+    save_streaming(design, sch)
+    board_design = synthetic_board(min(parts, 1000), seed)
+    pcb = tmp / f"synth{len(board_design.components)}.kicad_pcb"
+    with pcb.open("w", encoding="utf-8") as fh:
+        write_board(place_footprints(board_design), fh)
+    test_board = EXAMPLES_DIR.parent / "out" / "TestBoard"
+    return [sch, pcb] + sorted(p for p in test_board.glob("*.kicad_*") if p.suffix in (".kicad_sch", ".kicad_pcb"))
+
+
+def sexpr_report(files: List[Path], repeat: int = 3) -> List[Dict[str, Any]]:
+    from pcbgen.sexpr import open_sexpr
+
+    def best(fn: Any, *args: Any) -> float:
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn(*args)
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    def lazy_open(path: Path) -> None:
+        open_sexpr(path).close()
+
+    rows = []
+    for path in files:
+        with open_sexpr(path) as doc:
+            same = doc.root.to_list() == _naive_sexpr(path.read_text(encoding="utf-8"))
+        rows.append(
+            {
+                "file": str(path),
+                "bytes": path.stat().st_size,
+                "naive_s": best(lambda p: _naive_sexpr(p.read_text(encoding="utf-8")), path),
+                "lazy_open_s": best(lazy_open, path),
+                "naive_list_s": best(_naive_listing, path),
+                "lazy_list_s": best(_lazy_listing, path),
+                "naive_peak": _peak_bytes(_naive_listing, path),
+                "lazy_peak": _peak_bytes(_lazy_listing, path),
+                "same": same and _naive_listing(path) == _lazy_listing(path),
+            }
+        )
+    return rows
+
+
+def _sexpr_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench sexpr", description="Lazy mmap S-expression reader against a full parse.")
+    ap.add_argument("files", nargs="*", help="More .kicad_sch/.kicad_pcb/.kicad_sym files to read")
+    ap.add_argument("--parts", type=int, default=5000, help="Parts in the synthetic schematic (the board is capped at 1000)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        files = sexpr_files(args.parts, Path(tmp), args.seed) + [Path(f) for f in args.files]
+        print(f"{'file':<44} {'MB':>6} {'parse':>8} {'open':>8} {'list':>8} {'lazy list':>9} {'peak MB':>8} {'lazy MB':>8}")
+        for r in sexpr_report(files):
+            print(
+                f"{Path(r['file']).name[-44:]:<44} {r['bytes'] / 1e6:6.2f} {r['naive_s'] * 1000:6.1f}ms {r['lazy_open_s'] * 1000:6.1f}ms "
+                f"{r['naive_list_s'] * 1000:6.1f}ms {r['lazy_list_s'] * 1000:7.1f}ms {r['naive_peak'] / 1e6:8.2f} {r['lazy_peak'] / 1e6:8.2f}"
+            )
+            if not r["same"]:
+                print("  FAIL: the lazy reader disagrees with the full parse")
+                ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# update
+# ---------------------------------------------------------------------------
+
+
+def _hand_edit(path: Path, ref: str) -> bytes:
+    # what moving a field in KiCad does: the symbol's Value text gets a new (at ...)
+    data = path.read_bytes()
+    at = data.index(f'(property "Reference" "{ref}"'.encode())
+    at = data.index(b'(property "Value"', at)
+    at = data.index(b"(at ", at)
+    end = data.index(b")", at)
+    edited = data[:at] + b"(at 1.27 2.54 0" + data[end:]
+    path.write_bytes(edited)
+    return edited[at : at + 15]
+
+
+def update_report(sizes: List[int], seed: int = 1, repeat: int = 3) -> List[Dict[str, Any]]:
+    import copy
+    import shutil
+
+    from pcbgen.sch_update import update_schematic
+    from pcbgen.sch_writer import save_streaming
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        base, path, fresh = Path(tmp) / "base.kicad_sch", Path(tmp) / "work.kicad_sch", Path(tmp) / "fresh.kicad_sch"
+        for parts in sizes:
+            design = synthetic_board(parts, seed)
+            changed = copy.deepcopy(design)
+            target = changed.components[len(changed.components) // 2]
+            target.value += "0"
+            edited = changed.components[1].ref
+
+            full = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                save_streaming(changed, fresh)
+                full.append(time.perf_counter() - t0)
+            save_streaming(design, base)
+            edit = _hand_edit(base, edited)
+            _hand_edit(fresh, edited)
+            want = fresh.read_bytes()
+
+            row: Dict[str, Any] = {"parts": parts, "bytes": len(want), "full_s": min(full)}
+            for mode, previous in (("digests", design.digests()), ("compare", None)):
+                times = []
+                for _ in range(repeat):
+                    shutil.copyfile(base, path)
+                    stats = update_schematic(changed, path, previous)
+                    times.append(stats.seconds)
+                got = path.read_bytes()
+                row[f"{mode}_s"] = min(times)
+                row[f"{mode}_touched"] = stats.touched
+                row[f"{mode}_same"] = got == want
+                row[f"{mode}_kept_edit"] = edit in got
+            rows.append(row)
+    return rows
+
+
+def _update_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench update", description="Incremental schematic update against a full rewrite.")
+    ap.add_argument("--sizes", default="500,2000,8000", help="Comma-separated part counts")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    ok = True
+    print(f"{'parts':>6} {'MB':>6} {'full write':>10} {'update':>9} {'touched':>7} {'no digests':>10} {'touched':>7}")
+    for r in update_report([int(x) for x in args.sizes.split(",")], args.seed):
+        print(
+            f"{r['parts']:>6} {r['bytes'] / 1e6:6.2f} {r['full_s'] * 1000:8.1f}ms {r['digests_s'] * 1000:7.1f}ms {r['digests_touched']:>7} "
+            f"{r['compare_s'] * 1000:8.1f}ms {r['compare_touched']:>7}"
+        )
+        if not r["digests_same"]:
+            print("  FAIL: the updated file differs from a fresh write of the new design")
+            ok = False
+        if r["digests_touched"] != 1 or not r["digests_kept_edit"]:
+            print(f"  FAIL: one value changed but {r['digests_touched']} elements were rewritten")
+            ok = False
+        # without digests the hand-edited symbol is put back as generated, and nothing else
+        if r["compare_touched"] != 2 or r["compare_kept_edit"]:
+            print(f"  FAIL: without digests {r['compare_touched']} elements were rewritten (expected 2)")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# archive
+# ---------------------------------------------------------------------------
+
+
+def _write_syscalls() -> Optional[int]:
+    try:
+        with open("/proc/self/io") as fh:
+            return next(int(line.split()[1]) for line in fh if line.startswith("syscw:"))
+    except (OSError, StopIteration):
+        return None
+
+
+def archive_report(count: int, fmt: str = "zip", seed: int = 1) -> Dict[str, Any]:
+    import io
+    import tarfile
+    import zipfile
+
+    from pcbgen.archive import ProjectArchive
+    from pcbgen.batch import BatchJob, BatchOptions, run_batch
+    from pcbgen.kicad_project import MANIFEST_NAME
+
+    jobs = [BatchJob("prompt", p, f"p{i:04d}") for i, p in enumerate(synthetic_prompts(count, seed))]
+    opts = BatchOptions(use_cache=False, backend="stream")
+    row: Dict[str, Any] = {"projects": count, "format": fmt}
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        folders = Path(tmp) / "folders"
+        target = Path(tmp) / f"all.{'tar.gz' if fmt == 'tgz' else fmt}"
+        for mode in ("folders", "archive"):
+            w0, t0 = _write_syscalls(), time.perf_counter()
+            if mode == "folders":
+                results = run_batch(jobs, folders, workers=1, opts=opts)
+            else:
+                with ProjectArchive(target, fmt) as archive:
+                    results = run_batch(jobs, folders, workers=1, opts=opts, archive=archive)
+            row[f"{mode}_s"] = time.perf_counter() - t0
+            w1 = _write_syscalls()
+            row[f"{mode}_writes"] = None if w0 is None or w1 is None else w1 - w0
+            row[f"{mode}_failed"] = sum(1 for r in results if not r.ok)
+        row["folders_inodes"] = sum(1 for _ in folders.rglob("*")) + 1
+        row["archive_inodes"] = 1
+        row["archive_bytes"] = target.stat().st_size
+
+        if fmt == "zip":
+            with zipfile.ZipFile(target) as zf:
+                packed = {n: zf.read(n) for n in zf.namelist()}
+        else:
+            with tarfile.open(target) as tf:
+                packed = {m.name: tf.extractfile(m).read() for m in tf.getmembers() if m.isfile()}
+        on_disk = {
+            f"{p.parent.name}/{p.name}": p.read_bytes() for p in folders.glob("*/*") if p.is_file() and p.name != MANIFEST_NAME
+        }
+        row["same"] = packed == on_disk
+    return row
+
+
+def _archive_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench archive", description="One archive against a folder per project.")
+    ap.add_argument("--count", type=int, default=200, help="Projects in the batch")
+    ap.add_argument("--format", choices=("zip", "tar", "tgz"), default="zip")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    r = archive_report(args.count, args.format, args.seed)
+    fmt_w = lambda n: "n/a" if n is None else str(n)  # noqa: E731
+    print(f"{'output':<8} {'wall':>9} {'writes':>8} {'inodes':>7}")
+    print(f"{'folders':<8} {r['folders_s'] * 1000:7.1f}ms {fmt_w(r['folders_writes']):>8} {r['folders_inodes']:>7}")
+    print(f"{r['format']:<8} {r['archive_s'] * 1000:7.1f}ms {fmt_w(r['archive_writes']):>8} {r['archive_inodes']:>7}  ({r['archive_bytes'] / 1e6:.2f} MB)")
+    ok = True
+    if r["folders_failed"] or r["archive_failed"]:
+        print(f"  FAIL: {r['folders_failed']} folder and {r['archive_failed']} archive jobs failed")
+        ok = False
+    if not r["same"]:
+        print("  FAIL: the archive's files differ from the project folders")
+        ok = False
+    if r["archive_inodes"] >= r["folders_inodes"] or (
+        r["archive_writes"] is not None and r["archive_writes"] >= r["folders_writes"]
+    ):
+        print("  FAIL: the archive did not cut write syscalls and inodes")
+        ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# sweep
+# ---------------------------------------------------------------------------
+
+SWEEP_AXES: Dict[str, Dict[str, List[Any]]] = {
+    "i2c_breakout.yaml": {
+        "i2c.pullups_ohms": [1000, 2200, 3300, 4700, 6800, 10000],
+        "power.vcc_net": ["+3V3", "+5V"],
+        "decoupling[0].value": ["100n", "220n", "470n"],
+    },
+    "esp32_devboard.yaml": {
+        "power.vcc_net": ["+3V3", "+5V"],
+        "headers.left.pins": [15, 20],
+        "decoupling[1].value": ["4u7", "10u", "22u", "47u"],
+    },
+}
+
+
+def _sch_items(data: bytes) -> List[str]:
+    # top-level items in order-free form (lib_symbols' own entries sorted too): a patch
+    # appends new elements and library symbols where a fresh write would put them in order
+    from pcbgen.sexpr import SexprDocument
+
+    with SexprDocument(data) as doc:
+        out = []
+        for node in doc.root.children():
+            if node.head == "lib_symbols":
+                out.append(repr(sorted(repr(s.to_list()) for s in node.children())))
+            else:
+                out.append(repr(node.to_list()))
+    return sorted(out)
+
+
+def sweep_report(backend: str = "stream") -> List[Dict[str, Any]]:
+    import json as _json
+
+    from pcbgen.kicad_project import generate_project
+    from pcbgen.spec import load_spec_file
+    from pcbgen.sweep import SWEEP_INDEX, run_sweep, sweep_variants
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        for example, axes in SWEEP_AXES.items():
+            data = dict(load_spec_file(EXAMPLES_DIR / example), sweep=axes)
+            swept, alone = Path(tmp) / f"{example}-sweep", Path(tmp) / f"{example}-alone"
+
+            t0 = time.perf_counter()
+            results = run_sweep(data, swept, workers=1, backend=backend)
+            sweep_s = time.perf_counter() - t0
+
+            _, variants = sweep_variants(data)
+            t0 = time.perf_counter()
+            for v in variants:
+                generate_project(v.spec, alone / v.folder, use_cache=False, backend=backend)
+            alone_s = time.perf_counter() - t0
+
+            patched = Path(tmp) / f"{example}-patched"
+            results += run_sweep(data, patched, workers=1, backend=backend, patch_min_elements=0)
+
+            same = all(r.ok for r in results)
+            for v in variants:
+                name = v.spec.name
+                b = alone / v.folder
+                for a in (swept / v.folder, patched / v.folder):
+                    same = same and _sch_items((a / f"{name}.kicad_sch").read_bytes()) == _sch_items((b / f"{name}.kicad_sch").read_bytes())
+                    same = same and (a / f"{name}.kicad_pcb").read_bytes() == (b / f"{name}.kicad_pcb").read_bytes()
+            index = _json.loads((swept / SWEEP_INDEX).read_text(encoding="utf-8"))
+            rows.append(
+                {
+                    "spec": example,
+                    "variants": len(variants),
+                    "placements": index["placements"],
+                    "sweep_s": sweep_s,
+                    "alone_s": alone_s,
+                    "same": same,
+                }
+            )
+    return rows
+
+
+def _sweep_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench sweep", description="Variant sweep against one run per variant.")
+    ap.add_argument("--max-ratio", type=float, default=0.5, help="Fail if the sweep takes more than this share of the independent runs")
+    args = ap.parse_args(argv)
+
+    ok = True
+    print(f"{'spec':<22} {'variants':>8} {'placed':>6} {'sweep':>9} {'one by one':>10} {'ratio':>6}")
+    for r in sweep_report():
+        ratio = r["sweep_s"] / r["alone_s"]
+        print(f"{r['spec']:<22} {r['variants']:>8} {r['placements']:>6} {r['sweep_s'] * 1000:7.1f}ms {r['alone_s'] * 1000:8.1f}ms {ratio:6.2f}")
+        if not r["same"]:
+            print("  FAIL: a swept variant differs from generating it on its own")
+            ok = False
+        if ratio > args.max_ratio:
+            print(f"  FAIL: the sweep took {ratio:.2f} of the independent runs (budget {args.max_ratio})")
+            ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# trace
+# ---------------------------------------------------------------------------
+
+
+def trace_report(count: int, workers: int, seed: int = 1) -> Dict[str, Any]:
+    import timeit
+
+    from pcbgen.batch import BatchJob, BatchOptions, run_batch
+    from pcbgen.trace import chrome_trace, stage
+
+    n = 200_000
+    mark_ns = min(timeit.repeat("with stage('x'): pass", globals={"stage": stage}, number=n, repeat=5)) / n * 1e9
+
+    jobs = [BatchJob("prompt", p, f"p{i:04d}") for i, p in enumerate(synthetic_prompts(count, seed))]
+    opts = BatchOptions(use_cache=False, backend="stream", profile=True)
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        t0 = time.perf_counter()
+        results = run_batch(jobs, Path(tmp), workers=workers, opts=opts)
+        wall = time.perf_counter() - t0
+    events = [e for r in results for e in (r.trace or ())]
+    trace = chrome_trace(events)["traceEvents"]
+
+    spans = [e for e in trace if e["ph"] == "X"]
+    job_spans = [e for e in spans if e["name"] == "job"]
+    nested = True
+    for e in spans:
+        if e["name"] != "job":
+            # every stage runs inside the job span of its own process
+            nested = nested and any(
+                j["pid"] == e["pid"] and j["ts"] <= e["ts"] and e["ts"] + e["dur"] <= j["ts"] + j["dur"] + 1 for j in job_spans
+            )
+    return {
+        "mark_ns": mark_ns,
+        "jobs": len(jobs),
+        "ok": sum(1 for r in results if r.ok),
+        "job_spans": len(job_spans),
+        "spans": len(spans),
+        "processes": len({e["pid"] for e in spans}),
+        "nested": nested,
+        "wall_s": wall,
+    }
+
+
+def _trace_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench trace", description="Profiling hook overhead and a merged batch trace.")
+    ap.add_argument("--count", type=int, default=40, help="Jobs in the profiled batch")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    r = trace_report(args.count, args.workers, args.seed)
+    print(f"disabled stage mark : {r['mark_ns']:8.1f} ns")
+    print(f"profiled batch      : {r['ok']}/{r['jobs']} jobs in {r['wall_s']:.2f} s, {r['spans']} spans from {r['processes']} processes")
+    ok = True
+    if r["mark_ns"] > 1000:
+        print("  FAIL: a disabled stage mark costs over 1 us")
+        ok = False
+    if r["ok"] != r["jobs"] or r["job_spans"] != r["jobs"]:
+        print(f"  FAIL: {r['job_spans']} job spans for {r['jobs']} jobs ({r['ok']} ok)")
+        ok = False
+    if not r["nested"]:
+        print("  FAIL: a stage lies outside its job's span")
+        ok = False
+    if args.workers > 1 and args.count > 1 and r["processes"] < 2:
+        print("  FAIL: the merged trace shows a single process")
+        ok = False
+    return 0 if ok else 1
+
+
+# ---------------------------------------------------------------------------
+# suite / compare
+# ---------------------------------------------------------------------------
+
+SUITE_VERSION = 1
+SUITE_SCALES = (1, 10, 100)
+_MAX_HEADER_PINS = 40  # the longest 1xN pin header in the stock footprint library
+
+
+def scaled_spec(path: Path, scale: int) -> Optional[Dict[str, Any]]:
+    """
+    An example spec grown `scale` times: its decoupling list repeated, ESP32 headers
+    lengthened (up to 40 pins). None when the board has nothing to grow (the buck module).
+    """
+    from pcbgen.spec import load_spec_file
+
+    data = load_spec_file(path)
+    if scale == 1:
+        return data
+    grown = False
+    if data.get("decoupling"):
+        data["decoupling"] = list(data["decoupling"]) * scale
+        grown = True
+    if data.get("type") == "esp32_devboard":
+        for side, header in (data.get("headers") or {}).items():
+            pins = min(_MAX_HEADER_PINS, int(header.get("pins", 15)) * scale)
+            data["headers"][side] = {"pins": pins, "footprint": f"Connector_PinHeader_2.54mm:PinHeader_1x{pins:02d}_P2.54mm_Vertical"}
+            grown = True
+    if not grown:
+        return None
+    data["name"] = f"{data['name']}x{scale}"
+    return data
+
+
+def _prompt_seconds(count: int, seed: int = 1) -> Dict[str, float]:
+    # mean parse time per prompt, by the board type the prompt came out as
+    from pcbgen.ai_spec import spec_from_prompt
+
+    totals: Dict[str, List[float]] = {}
+    for prompt in synthetic_prompts(count, seed):
+        t0 = time.perf_counter()
+        data = spec_from_prompt(prompt)
+        dt = time.perf_counter() - t0
+        totals.setdefault(data["type"], []).append(dt)
+    return {t: sum(v) / len(v) for t, v in totals.items()}
+
+
+def _calibration_seconds() -> float:
+    # a fixed pure-Python workload: how fast this machine is right now, so a comparison can
+    # tell a slower machine (or a busy one) from slower code
+    t0 = time.perf_counter()
+    acc: Dict[str, int] = {}
+    for i in range(200_000):
+        key = f"n{i % 997}"
+        acc[key] = acc.get(key, 0) + i
+    return time.perf_counter() - t0
+
+
+def _record_stages(spec: Any, out_dir: Path, backend: str) -> Dict[str, float]:
+    from pcbgen.kicad_project import generate_project
+    from pcbgen.trace import recording, summarize
+
+    # like timeit: collect first and keep the collector out of the timed run, or a gen-2
+    # pass over the last case's garbage lands in whichever stage triggers it
+    gc.collect()
+    gc.disable()
+    try:
+        with recording() as rec:
+            generate_project(spec, out_dir, use_cache=False, backend=backend)
+    finally:
+        gc.enable()
+    return {row["stage"]: row["total_s"] for row in summarize(rec.events)}
+
+
+def _cold_seconds(spec_path: Path, out_dir: Path, backend: str) -> Dict[str, float]:
+    # fresh interpreters: a full build, then a no-op run that hits the manifest it wrote
+    cmd = ["-m", "pcbgen.cli", "--spec", str(spec_path), "--out", str(out_dir), "--backend", backend]
+    return {"cold.build": time_command([*cmd, "--no-cache"], 1), "cold.noop": time_command(cmd, 1)}
+
+
+def suite_report(scales: List[int], runs: int = 5, backend: str = "stream", prompts: int = 2000) -> Dict[str, Any]:
+    """
+    Every example board at every scale: cold start (fresh interpreter, a no-op run and a
+    full build), prompt parsing, and each generation stage as the profiling hooks see it.
+    Each stage keeps its best of `runs`; the runs go round all the cases in turn, so a
+    burst of load on the machine costs one round rather than all of one case's runs.
+    """
+    import platform
+
+    from pcbgen.kicad_project import template_design
+    from pcbgen.spec import project_spec_from_dict
+
+    cases: Dict[str, Any] = {}
+    specs: Dict[str, Tuple[Path, Dict[str, Any], Any]] = {}
+    for path in sorted(EXAMPLES_DIR.glob("*.yaml")):
+        for scale in scales:
+            data = scaled_spec(path, scale)
+            if data is None:
+                continue
+            spec = project_spec_from_dict(dict(data))
+            key = f"{spec.type}@{scale}"
+            specs[key] = (path, data, spec)
+            cases[key] = {"type": spec.type, "scale": scale, "elements": len(template_design(spec).digests()), "stages": {}}
+
+    def _keep(key: str, seconds: Dict[str, float]) -> None:
+        best = cases[key]["stages"]
+        for stage, s in seconds.items():
+            best[stage] = min(best.get(stage, float("inf")), s)
+
+    calibration_s = float("inf")
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        for r in range(runs + 1):  # round 0 only warms imports and caches
+            prompt_s = _prompt_seconds(prompts)
+            for key, (path, data, spec) in specs.items():
+                calibration_s = min(calibration_s, _calibration_seconds())
+                t0 = time.perf_counter()
+                project_spec_from_dict(dict(data))
+                seconds = {"spec.model": time.perf_counter() - t0}
+                seconds.update(_record_stages(spec, Path(tmp) / f"{key}-{r}", backend))
+                if cases[key]["scale"] == 1:
+                    seconds.update(_cold_seconds(path, Path(tmp) / f"{key}-cold-{r}", backend))
+                    if spec.type in prompt_s:
+                        seconds["prompt.parse"] = prompt_s[spec.type]
+                if r:
+                    _keep(key, seconds)
+    return {
+        "version": SUITE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpu)",
+        "backend": backend,
+        "runs": runs,
+        "calibration_s": calibration_s,
+        "cases": cases,
+    }
+
+
+def machine_factor(base: Dict[str, Any], new: Dict[str, Any]) -> float:
+    """How much slower the machine ran `new` than `base`, from their calibration loops (1.0 if unknown)."""
+    b, n = base.get("calibration_s"), new.get("calibration_s")
+    return n / b if b and n else 1.0
+
+
+def compare_suites(
+    base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.25, min_ms: float = 2.0, normalize: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    One row per case and stage in either result. A stage has "regressed" when it is over
+    `threshold` slower and by at least `min_ms` (tiny stages are all noise), "improved"
+    the other way round; stages only one side has are "new" or "missing" (a missing
+    stage fails the compare unless allowed). With normalize, new times are first scaled
+    by machine_factor, so a busier or slower machine alone doesn't fail the comparison.
+    """
+    factor = machine_factor(base, new) if normalize else 1.0
+    rows: List[Dict[str, Any]] = []
+    base_cases, new_cases = base.get("cases", {}), new.get("cases", {})
+    for case in sorted(set(base_cases) | set(new_cases)):
+        b = base_cases.get(case, {}).get("stages", {})
+        n = new_cases.get(case, {}).get("stages", {})
+        for stage in sorted(set(b) | set(n)):
+            new_s = n[stage] / factor if stage in n else None
+            row = {"case": case, "stage": stage, "base_s": b.get(stage), "new_s": new_s, "ratio": None}
+            if row["base_s"] is None:
+                row["status"] = "new"
+            elif row["new_s"] is None:
+                row["status"] = "missing"
+            else:
+                delta_ms = (row["new_s"] - row["base_s"]) * 1000
+                row["ratio"] = row["new_s"] / row["base_s"] if row["base_s"] else float("inf")
+                if row["ratio"] > 1 + threshold and delta_ms >= min_ms:
+                    row["status"] = "regressed"
+                elif row["ratio"] < 1 / (1 + threshold) and -delta_ms >= min_ms:
+                    row["status"] = "improved"
+                else:
+                    row["status"] = "ok"
+            rows.append(row)
+    return rows
+
+
+def _load_suite(path: str) -> Dict[str, Any]:
+    import json
+
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Can't read benchmark results {path}: {e}")
+    if data.get("version") != SUITE_VERSION:
+        raise SystemExit(f"{path}: results version {data.get('version')}, expected {SUITE_VERSION}")
+    return data
+
+
+def _ms(seconds: Optional[float]) -> str:
+    return f"{seconds * 1000:10.2f}" if seconds is not None else f"{'-':>10}"
+
+
+def _print_compare(rows: List[Dict[str, Any]], factor: float, verbose: bool = False, allow_missing: bool = False) -> int:
+    regressed = [r for r in rows if r["status"] == "regressed"]
+    missing = [r for r in rows if r["status"] == "missing"]
+    if factor != 1.0:
+        print(f"machine ran {factor:.2f}x the baseline's calibration time; new times are scaled by 1/{factor:.2f}")
+    print(f"{'case':<22} {'stage':<20} {'base ms':>10} {'new ms':>10} {'ratio':>6}  status")
+    for r in rows:
+        if not verbose and r["status"] == "ok":
+            continue
+        ratio = f"{r['ratio']:6.2f}" if r["ratio"] is not None else f"{'':>6}"
+        print(f"{r['case']:<22} {r['stage']:<20} {_ms(r['base_s'])} {_ms(r['new_s'])} {ratio}  {r['status']}")
+    print(
+        f"{len(rows)} stages compared, {len(regressed)} regressed, {sum(1 for r in rows if r['status'] == 'improved')} improved, "
+        f"{len(missing)} missing"
+    )
+    for r in regressed:
+        print(f"  FAIL: {r['case']} {r['stage']} is {r['ratio']:.2f}x the baseline")
+    if not allow_missing:
+        for r in missing:
+            print(f"  FAIL: {r['case']} {r['stage']} is in the baseline but wasn't run (--allow-missing to accept)")
+    return 1 if regressed or (missing and not allow_missing) else 0
+
+
+def _suite_main(argv: List[str]) -> int:
+    import json
+
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench suite", description="Per-stage timings of every board type at growing scale.")
+    ap.add_argument("--scales", default=",".join(map(str, SUITE_SCALES)), help="Comma-separated scale factors")
+    ap.add_argument("--runs", type=int, default=5, help="Timed rounds over all cases (each stage keeps its best)")
+    ap.add_argument("--backend", default="stream")
+    ap.add_argument("--prompts", type=int, default=2000, help="Synthetic prompts to time parsing on")
+    ap.add_argument("--out", help="Write the results as JSON")
+    ap.add_argument("--compare", metavar="BASE", help="Fail if a stage regressed against these earlier results")
+    ap.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (default 0.25)")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="Ignore slowdowns smaller than this")
+    ap.add_argument("--no-normalize", dest="normalize", action="store_false", help="Compare raw times, not scaled by the calibration loop")
+    ap.add_argument("--allow-missing", action="store_true", help="Don't fail on baseline stages the new result lacks")
+    args = ap.parse_args(argv)
+
+    base = _load_suite(args.compare) if args.compare else None
+    rep = suite_report([int(s) for s in args.scales.split(",")], args.runs, args.backend, args.prompts)
+
+    by_type: Dict[str, List[Dict[str, Any]]] = {}
+    for case in rep["cases"].values():
+        by_type.setdefault(case["type"], []).append(case)
+    for board_type, cases in by_type.items():
+        print(f"{board_type}: " + ", ".join(f"x{c['scale']} = {c['elements']} elements" for c in cases))
+        stages = sorted({s for c in cases for s in c["stages"]})
+        print(f"  {'stage (ms)':<20}" + "".join(f"{'x' + str(c['scale']):>10}" for c in cases))
+        for stage in stages:
+            print(f"  {stage:<20}" + "".join(_ms(c["stages"].get(stage)) for c in cases))
+    if args.out:
+        Path(args.out).write_text(json.dumps(rep, indent=2), encoding="utf-8")
+        print(f"wrote {args.out}")
+    if base is None:
+        return 0
+    print(f"\nagainst {args.compare} ({base.get('created')}, {base.get('machine')}):")
+    factor = machine_factor(base, rep) if args.normalize else 1.0
+    return _print_compare(compare_suites(base, rep, args.threshold, args.min_ms, args.normalize), factor, allow_missing=args.allow_missing)
+
+
+def _compare_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench compare", description="Compare two `bench suite --out` results.")
+    ap.add_argument("base")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (default 0.25)")
+    ap.add_argument("--min-ms", type=float, default=2.0, help="Ignore slowdowns smaller than this")
+    ap.add_argument("--no-normalize", dest="normalize", action="store_false", help="Compare raw times, not scaled by the calibration loop")
+    ap.add_argument("--allow-missing", action="store_true", help="Don't fail on baseline stages the new result lacks")
+    ap.add_argument("-v", "--verbose", action="store_true", help="List unchanged stages too")
+    args = ap.parse_args(argv)
+    base, new = _load_suite(args.base), _load_suite(args.new)
+    factor = machine_factor(base, new) if args.normalize else 1.0
+    return _print_compare(compare_suites(base, new, args.threshold, args.min_ms, args.normalize), factor, args.verbose, args.allow_missing)
+
+
+# ---------------------------------------------------------------------------
+# watch
+# ---------------------------------------------------------------------------
+
+
+def watch_report(edits: int = 10, backend: str = "stream", update: bool = False) -> Dict[str, Any]:
+    import queue
+    import shutil
+    import statistics
+    import threading
+
+    from pcbgen.watch import SpecWatcher
+
+    src = EXAMPLES_DIR / "i2c_breakout.yaml"
+    text = src.read_text(encoding="utf-8")
+    events: "queue.Queue[Any]" = queue.Queue()
+
+    def _next(timeout: float = 10.0) -> Any:
+        try:
+            return events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    with tempfile.TemporaryDirectory(prefix="pcbgen-bench-") as tmp:
+        spec = Path(tmp) / src.name
+        shutil.copy(src, spec)
+        cold_s = time_command(["-m", "pcbgen.cli", "--spec", str(spec), "--out", str(Path(tmp) / "cold"), "--no-cache", "--backend", backend], 3)
+
+        watcher = SpecWatcher([spec], Path(tmp) / "out", backend=backend, update=update)
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, kwargs={"on_event": lambda ev: events.put((time.perf_counter(), ev)), "stop": stop})
+        thread.start()
+        try:
+            first = _next(30.0)
+            latencies: List[float] = []
+            statuses: List[str] = []
+            for i in range(edits):
+                spec.write_text(text.replace("4700", str(1000 + 100 * i)), encoding="utf-8")
+                saved = time.perf_counter()
+                got = _next()
+                statuses.append(got[1].status if got else "timeout")
+                if got:
+                    latencies.append(got[0] - saved)
+
+            # a save that only adds a comment is the same spec
+            spec.write_text(spec.read_text(encoding="utf-8") + "# note\n", encoding="utf-8")
+            got = _next()
+            comment = got[1].status if got else "timeout"
+
+            # an editor (or a script) writing several times in a row regenerates once
+            for i in range(5):
+                spec.write_text(text.replace("4700", str(3300 + i)), encoding="utf-8")
+                time.sleep(watcher.debounce / 5)
+            burst = [_next()]
+            time.sleep(watcher.debounce * 3)
+            while not events.empty():
+                burst.append(events.get())
+        finally:
+            stop.set()
+            thread.join()
+    return {
+        "cold_s": cold_s,
+        "first": first[1].status if first else "timeout",
+        "statuses": statuses,
+        "latency_median_s": statistics.median(latencies) if latencies else float("inf"),
+        "latency_max_s": max(latencies, default=float("inf")),
+        "comment": comment,
+        "burst": [b[1].status if b else "timeout" for b in burst],
+        "debounce_s": watcher.debounce,
+    }
+
+
+def _watch_main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pcbgen.bench watch", description="Save-to-regenerated latency of `pcbgen watch`.")
+    ap.add_argument("--edits", type=int, default=10)
+    ap.add_argument("--backend", default="stream")
+    ap.add_argument("--update", action="store_true", help="Patch the schematic in place, as with `pcbgen watch --update`")
+    ap.add_argument("--budget-ms", type=float, default=1000.0, help="Fail if the median save-to-done latency is over this")
+    args = ap.parse_args(argv)
+
+    r = watch_report(args.edits, args.backend, args.update)
+    print(f"cold pcbgen --spec      : {r['cold_s'] * 1000:7.1f} ms")
+    print(f"watch, save to done     : {r['latency_median_s'] * 1000:7.1f} ms median, {r['latency_max_s'] * 1000:.1f} ms max "
+          f"(debounce {r['debounce_s'] * 1000:.0f} ms)")
+    print(f"comment-only save       : {r['comment']}")
+    print(f"burst of 5 saves        : {', '.join(r['burst'])}")
+    ok = True
+    expected = "updated" if args.update else "built"
+    bad = [s for s in r["statuses"] if s != expected]
+    if r["first"] == "error" or r["first"] == "timeout" or bad:
+        print(f"  FAIL: edits were not regenerated ({r['first']}, then {', '.join(bad)})")
+        ok = False
+    if r["comment"] != "same":
+        print(f"  FAIL: a comment-only save came back {r['comment']}, not skipped")
+        ok = False
+    if r["burst"] != [expected]:
+        print(f"  FAIL: a burst of saves gave {len(r['burst'])} regenerations")
+        ok = False
+    if r["latency_median_s"] * 1000 > args.budget_ms:
+        print("  FAIL: latency over budget")
+        ok = False
+    return 0 if ok else 1
+
+
+_BENCHES = {
+    "startup": _startup_main,
+    "prompts": _prompts_main,
+    "writer": _writer_main,
+    "symbols": _symbols_main,
+    "footprints": _footprints_main,
+    "place": _place_main,
+    "netlist": _netlist_main,
+    "route": _route_main,
+    "check": _check_main,
+    "sexpr": _sexpr_main,
+    "update": _update_main,
+    "archive": _archive_main,
+    "sweep": _sweep_main,
+    "trace": _trace_main,
+    "suite": _suite_main,
+    "compare": _compare_main,
+    "watch": _watch_main,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in _BENCHES:
+        raise SystemExit(f"usage: python -m pcbgen.bench {{{','.join(_BENCHES)}}} [options]")
+    raise SystemExit(_BENCHES[argv[0]](argv[1:]))
+
+
+if __name__ == "__main__":
+    main()
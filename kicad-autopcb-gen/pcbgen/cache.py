@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+# running [bytes, entries] total of a DiskCache, kept by put() and reset by evict()
+USAGE_FILE = ".usage"
+# per-key lock files; evict() removes the idle ones
+LOCK_DIR = ".locks"
+
+
+def canonical_json(obj: Any) -> str:
+    # Stable text form: sorted keys, no whitespace, non-JSON values stringified.
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def canonical_digest(obj: Any) -> str:
+    return hashlib.sha256(canonical_json(obj).encode("utf-8")).hexdigest()
+
+
+def default_cache_dir() -> Path:
+    env = os.getenv("PCBGEN_CACHE_HOME")
+    if env:
+        return Path(env).expanduser()
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "pcbgen"
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    # temp file + rename: readers in other processes see the old file or the new one, never half
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class DiskCache:
+    """
+    Flat key -> bytes store under one directory (files sharded by key prefix).
+    Entries are evicted least-recently-used first once the total size or entry
+    count goes over budget; reads bump atime, mtime is the write time (for TTL).
+    Writes go through a temp file + rename, so concurrent processes are safe.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: Optional[int] = 512 * 1024 * 1024,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        self.root = Path(root).expanduser()
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            st = path.stat()
+            if self.ttl_seconds is not None and time.time() - st.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            data = path.read_bytes()
+            os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        write_atomic(self._path(key), data)
+        if self.max_bytes is None and self.max_entries is None:
+            return
+        # Every process and every short-lived instance adds to one running total in
+        # USAGE_FILE, so the cache is scanned only when a put takes it over budget.
+        with self._usage() as usage:
+            if usage is None:  # no total yet (new or pre-existing cache): count once
+                self.evict()
+                return
+            usage[0] += len(data)
+            usage[1] += 1
+            over_bytes = self.max_bytes is not None and usage[0] > self.max_bytes
+            over_count = self.max_entries is not None and usage[1] > self.max_entries
+        if over_bytes or over_count:
+            self.evict()
+
+    @contextmanager
+    def _usage(self) -> Iterator[Optional[List[int]]]:
+        # [bytes, entries] from USAGE_FILE under its lock, written back after the block.
+        # Overwriting a key counts it twice; the estimate only ever runs high, and the
+        # next eviction scan sets it back to the exact totals.
+        path = self.root / USAGE_FILE
+        with self.lock(USAGE_FILE):
+            try:
+                usage: Optional[List[int]] = [int(x) for x in path.read_text().split()][:2]
+                if len(usage) != 2:
+                    usage = None
+            except (OSError, ValueError):
+                usage = None
+            yield usage
+            if usage is not None:
+                write_atomic(path, f"{usage[0]} {usage[1]}".encode())
+
+    def _lock_file(self, key: str) -> Any:
+        # one file per key: unrelated keys never wait on each other
+        lock_dir = self.root / LOCK_DIR
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        return open(lock_dir / key, "a+b")
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        Exclusive cross-process lock for one key (its own file under LOCK_DIR),
+        so concurrent misses on the same key can be collapsed into one fill.
+        """
+        try:
+            import fcntl
+        except ImportError:  # no flock (Windows): callers just race
+            yield
+            return
+
+        with self._lock_file(key) as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_lock(self, key: str) -> Optional[Any]:
+        """Non-blocking lock(): a handle to pass to unlock(), or None if someone else holds it."""
+        try:
+            import fcntl
+        except ImportError:
+            return True
+
+        f = self._lock_file(key)
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        return f
+
+    def unlock(self, handle: Any) -> None:
+        if handle is True:
+            return
+        import fcntl
+
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        if self.root.exists():
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def evict(self) -> int:
+        """Drop expired entries, then oldest-accessed ones until under budget. Returns entries removed."""
+        if not self.root.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name.startswith("."):
+                continue
+            for e in os.scandir(shard.path):
+                if e.name.startswith(".tmp-"):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                if self.ttl_seconds is not None and now - st.st_mtime > self.ttl_seconds:
+                    Path(e.path).unlink(missing_ok=True)
+                    removed += 1
+                    continue
+                entries.append((st.st_atime, st.st_size, e.path))
+
+        total = sum(size for _, size, _ in entries)
+        left = len(entries)
+        entries.sort()
+        for _, size, path in entries:
+            over_bytes = self.max_bytes is not None and total > self.max_bytes
+            over_count = self.max_entries is not None and left > self.max_entries
+            if not (over_bytes or over_count):
+                break
+            Path(path).unlink(missing_ok=True)
+            total -= size
+            left -= 1
+            removed += 1
+        # puts racing the scan may be missed here; the total is corrected at the next scan
+        write_atomic(self.root / USAGE_FILE, f"{total} {left}".encode())
+        self._drop_idle_locks()
+        return removed
+
+    def _drop_idle_locks(self) -> None:
+        # Lock files nobody holds right now. A process that opened one just before it goes
+        # may end up locking the unlinked file while another locks a new one: at worst
+        # one duplicate fill, which the atomic writes make harmless.
+        try:
+            names = os.listdir(self.root / LOCK_DIR)
+        except OSError:
+            return
+        for name in names:
+            if name == USAGE_FILE:
+                continue
+            handle = self.try_lock(name)
+            if handle is None:
+                continue
+            try:
+                (self.root / LOCK_DIR / name).unlink(missing_ok=True)
+            finally:
+                self.unlock(handle)
@@ -1,53 +1,647 @@
 import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, List, Optional
 
-import yaml
-
-from pcbgen.spec import ProjectSpec
+from pcbgen.cache import DiskCache
+from pcbgen.spec import load_spec_file, project_spec_from_dict
 from pcbgen.kicad_project import generate_project
 from pcbgen.ai_spec import spec_from_prompt
 
 
-def main() -> None:
+def _add_cache_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--no-cache", action="store_true", help="Always regenerate, ignoring the output manifest and shared cache")
+    ap.add_argument(
+        "--cache-dir",
+        default=os.getenv("PCBGEN_CACHE_DIR"),
+        help="Shared content-addressed cache of generated projects (default: $PCBGEN_CACHE_DIR, off if unset)",
+    )
+    ap.add_argument("--cache-max-mb", type=int, default=512, help="Evict least-recently-used cache entries above this size")
+
+
+def _add_backend_arg(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--backend",
+        choices=("ksa", "stream"),
+        default=os.getenv("PCBGEN_BACKEND", "ksa"),
+        help="Schematic writer: kicad_sch_api object model (ksa) or direct S-expression stream "
+        "(default: $PCBGEN_BACKEND, else ksa)",
+    )
+
+
+def _add_route_arg(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--route", action="store_true", help="Autoroute the board's nets on F.Cu/B.Cu (tracks and vias)")
+
+
+def _add_update_arg(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--update",
+        action="store_true",
+        help="Patch an existing .kicad_sch in place (only changed symbols/wires/labels) and keep the existing board",
+    )
+
+
+def _add_archive_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--archive",
+        metavar="FILE",
+        help="Build in memory and write one .zip/.tar/.tar.gz instead of a project folder ('-': stdout)",
+    )
+    ap.add_argument("--archive-format", choices=("zip", "tar", "tgz"), help="Archive format (default: from FILE's suffix, zip for '-')")
+
+
+def _add_profile_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--profile", action="store_true", help="Time each stage of the run and print a summary table (to stderr)")
+    ap.add_argument("--trace", metavar="FILE", help="Write the stage timings as Chrome/Perfetto trace-event JSON (implies --profile)")
+    ap.add_argument(
+        "--profile-memory", action="store_true", help="Also record each stage's peak Python memory (tracemalloc; slows the run down)"
+    )
+
+
+def _profiling(args: argparse.Namespace) -> bool:
+    return bool(args.profile or args.trace or args.profile_memory)
+
+
+@contextmanager
+def _profiled(args: argparse.Namespace, jobs: Optional[list] = None) -> Iterator[None]:
+    # records the block's stages; batch results (`jobs`) bring their workers' stages along
+    if not _profiling(args):
+        yield
+        return
+    from pcbgen.trace import format_summary, recording, slowest, write_chrome_trace
+
+    with recording(memory=args.profile_memory) as rec:
+        yield
+    events = rec.events + [e for res in jobs or () for e in (res.trace or ())]
+    print(format_summary(events), file=sys.stderr)
+    stragglers = slowest(events, "job")
+    if len(stragglers) > 1:
+        print("slowest jobs:", file=sys.stderr)
+        for e in stragglers:
+            print(f"  {e.seconds * 1000:8.1f} ms  {str(e.args.get('source'))[:100]}", file=sys.stderr)
+    if args.trace:
+        write_chrome_trace(events, Path(args.trace))
+        print(f"Trace written to {args.trace}", file=sys.stderr)
+
+
+def _add_layout_cache_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--no-layout-cache", action="store_true", help="With --ai: always ask the model, don't read or write cached plans")
+    ap.add_argument("--clear-layout-cache", action="store_true", help="Delete all cached AI layout plans first")
+
+
+def _batch_main(argv: List[str]) -> None:
+    from pcbgen.batch import BatchOptions, collect_jobs, results_to_json, run_batch
+
+    ap = argparse.ArgumentParser(
+        prog="pcbgen batch",
+        description="Generate many KiCad projects from YAML specs and/or prompts on a worker pool.",
+    )
+    ap.add_argument("sources", nargs="*", help="Spec files, directories of *.yaml specs, or glob patterns")
+    ap.add_argument("--manifest", action="append", default=[], help="YAML list of {spec|prompt, out} entries (repeatable)")
+    ap.add_argument("--prompts", action="append", default=[], help="Text file with one prompt per line (repeatable)")
+    ap.add_argument("--out", help="Output root; each job gets its own project folder here")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    ap.add_argument("--ai", action="store_true", help="Optional: enable AI layout planning.")
+    ap.add_argument("--hint", default="", help="Optional hint (compact/neat/left-header/etc.)")
+    ap.add_argument("--report", help="Write a JSON report of per-job results here")
+    ap.add_argument("--fail-fast", action="store_true", help="Validate every spec first and stop before generating anything if one is invalid")
+    _add_cache_args(ap)
+    _add_layout_cache_args(ap)
+    _add_backend_arg(ap)
+    _add_route_arg(ap)
+    _add_update_arg(ap)
+    _add_archive_args(ap)
+    _add_profile_args(ap)
+
+    args = ap.parse_args(argv)
+    if not (args.out or args.archive):
+        ap.error("one of the arguments --out --archive is required")
+    if args.archive and args.update:
+        ap.error("--update patches a project folder; it can't be combined with --archive")
+    # progress goes to stderr when the archive itself is on stdout
+    log = sys.stderr if args.archive == "-" else sys.stdout
+    if args.clear_layout_cache:
+        from pcbgen.ai_layout import clear_layout_cache
+
+        clear_layout_cache()
+
+    try:
+        jobs = collect_jobs(args.sources, args.manifest, args.prompts)
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+    if not jobs:
+        raise SystemExit("No specs or prompts found.")
+    if args.fail_fast:
+        from pcbgen.batch import validate_jobs
+
+        bad = validate_jobs(jobs, fail_fast=True)
+        if bad:
+            job, error = bad[0]
+            raise SystemExit(f"{job.source}: {error}\nNothing was generated.")
+
+    def _print(res) -> None:
+        status = "OK  " if res.ok else "FAIL"
+        line = f"{status} {res.seconds * 1000:8.1f} ms  {res.source} -> {res.out_dir}"
+        if res.ok and res.status != "built":
+            line += f" ({res.status})"
+        if not res.ok:
+            line += f"\n       {res.error}"
+        print(line, file=log, flush=True)
+
+    t0 = time.perf_counter()
+    opts = BatchOptions(
+        use_ai=args.ai,
+        hint=args.hint,
+        layout_cache=not args.no_layout_cache,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        backend=args.backend,
+        route=args.route,
+        update=args.update,
+        profile=_profiling(args),
+        profile_memory=args.profile_memory,
+    )
+    results: list = []
+    with _profiled(args, results):
+        if args.archive:
+            from pcbgen.archive import ProjectArchive
+
+            try:
+                archive = ProjectArchive(args.archive, args.archive_format)
+            except (OSError, ValueError) as e:
+                raise SystemExit(str(e))
+            with archive:
+                results += run_batch(jobs, Path("."), workers=args.workers, opts=opts, on_result=_print, archive=archive)
+        else:
+            results += run_batch(jobs, Path(args.out), workers=args.workers, opts=opts, on_result=_print)
+    wall = time.perf_counter() - t0
+
+    summary = results_to_json(results, wall)
+    print(f"{summary['ok']}/{summary['total']} succeeded, {summary['failed']} failed in {wall:.2f} s", file=log)
+    if args.report:
+        Path(args.report).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+def _sweep_main(argv: List[str]) -> None:
+    from pcbgen.sweep import SWEEP_INDEX, run_sweep
+
+    ap = argparse.ArgumentParser(
+        prog="pcbgen sweep",
+        description="Generate every variant of a spec whose `sweep:` section lists values per spec path "
+        "(e.g. power.vcc_net: [+3V3, +5V]), one project folder each.",
+    )
+    ap.add_argument("spec", help="YAML spec with a sweep: section")
+    ap.add_argument("--out", required=True, help="Output root; each variant gets its own project folder here")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    ap.add_argument("--ai", action="store_true", help="Optional: enable AI layout planning.")
+    ap.add_argument("--hint", default="", help="Optional hint (compact/neat/left-header/etc.)")
+    _add_backend_arg(ap)
+    _add_route_arg(ap)
+    args = ap.parse_args(argv)
+
+    def _print(res) -> None:
+        status = "OK  " if res.ok else "FAIL"
+        params = ", ".join(f"{k}={v}" for k, v in res.params.items())
+        line = f"{status} {res.seconds * 1000:8.1f} ms  {res.folder}  {params}"
+        if res.ok:
+            line += f" ({res.board} board, {res.schematic} schematic)"
+        else:
+            line += f"\n       {res.error}"
+        print(line, flush=True)
+
+    t0 = time.perf_counter()
+    try:
+        data = load_spec_file(Path(args.spec).expanduser().resolve())
+        results = run_sweep(
+            data,
+            Path(args.out),
+            workers=args.workers,
+            backend=args.backend,
+            route=args.route,
+            use_ai=args.ai,
+            hint=args.hint,
+            on_result=_print,
+        )
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+    wall = time.perf_counter() - t0
+
+    ok = sum(1 for r in results if r.ok)
+    placed = sum(1 for r in results if r.board == "placed")
+    print(f"{ok}/{len(results)} variants in {wall:.2f} s ({placed} placements); index at {Path(args.out) / SWEEP_INDEX}")
+    if ok < len(results):
+        raise SystemExit(1)
+
+
+def _serve_main(argv: List[str]) -> None:
+    from pcbgen.batch import BatchOptions
+    from pcbgen.server import serve
+
+    ap = argparse.ArgumentParser(
+        prog="pcbgen serve",
+        description="Long-lived generator: POST /generate with {\"spec\": {...}} or {\"prompt\": \"...\"} "
+        "(optional \"archive\": true for a .zip response).",
+    )
+    ap.add_argument("--out", required=True, help="Output root; each request gets a folder keyed by its spec hash")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    ap.add_argument("-j", "--workers", type=int, default=min(4, os.cpu_count() or 1), help="Concurrent generations")
+    ap.add_argument("--max-pending", type=int, default=None, help="Requests allowed to wait before answering 503 (default: 4 x workers)")
+    ap.add_argument("--quiet", action="store_true", help="Don't log each request")
+    _add_cache_args(ap)
+    _add_backend_arg(ap)
+    _add_route_arg(ap)
+
+    args = ap.parse_args(argv)
+    opts = BatchOptions(
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        backend=args.backend,
+        route=args.route,
+    )
+    serve(
+        Path(args.out),
+        host=args.host,
+        port=args.port,
+        unix_socket=args.socket,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        opts=opts,
+        quiet=args.quiet,
+    )
+
+
+def _watch_main(argv: List[str]) -> None:
+    from pcbgen.watch import DEBOUNCE, POLL_INTERVAL, SpecWatcher
+
     ap = argparse.ArgumentParser(
-        description="Generate a KiCad 9 project from YAML spec OR natural-language prompt (offline parser)."
+        prog="pcbgen watch",
+        description="Regenerate projects whenever their spec files change, from one warm process.",
     )
+    ap.add_argument("specs", nargs="+", help="Spec files to watch")
+    ap.add_argument("--out", required=True, help="Output directory (with several specs, each gets a folder named after it here)")
+    ap.add_argument("--debounce-ms", type=float, default=DEBOUNCE * 1000, help="Wait this long after the last write before regenerating")
+    ap.add_argument("--interval-ms", type=float, default=POLL_INTERVAL * 1000, help="How often to check the files")
+    ap.add_argument("--ai", action="store_true", help="Optional: enable AI layout planning.")
+    ap.add_argument("--hint", default="", help="Optional hint (compact/neat/left-header/etc.)")
+    _add_cache_args(ap)
+    _add_backend_arg(ap)
+    _add_route_arg(ap)
+    _add_update_arg(ap)
+    args = ap.parse_args(argv)
+
+    cache = DiskCache(Path(args.cache_dir), max_bytes=args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+    try:
+        watcher = SpecWatcher(
+            [Path(p) for p in args.specs],
+            Path(args.out),
+            backend=args.backend,
+            route=args.route,
+            update=args.update,
+            use_cache=not args.no_cache,
+            cache=cache,
+            use_ai=args.ai,
+            hint=args.hint,
+            debounce=args.debounce_ms / 1000,
+        )
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    def _print(ev) -> None:
+        line = f"{time.strftime('%H:%M:%S')}  {ev.path.name}: "
+        if ev.status == "error":
+            line += f"error\n       {ev.error}"
+        elif ev.status == "same":
+            line += f"spec unchanged, skipped ({ev.seconds * 1000:.1f} ms)"
+        else:
+            line += f"{ev.status} in {ev.seconds * 1000:.0f} ms"
+            if ev.latency > ev.seconds:
+                line += f" ({ev.latency * 1000:.0f} ms after the save)"
+            line += f" -> {ev.out_dir}"
+        print(line, flush=True)
+
+    print(f"Watching {len(watcher.watched)} spec(s); Ctrl-C to stop.", flush=True)
+    try:
+        watcher.run(on_event=_print, interval=args.interval_ms / 1000)
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+
+def _open_inputs(paths: List[str]):
+    # one file at a time, read line by line; "-" is stdin
+    for path in paths:
+        if path == "-":
+            yield from sys.stdin
+        else:
+            with open(Path(path).expanduser(), encoding="utf-8") as fh:
+                yield from fh
+
+
+def _parse_main(argv: List[str]) -> None:
+    from pcbgen.ai_spec import ParseStats, prompt_lines, spec_lines_from_prompts
+
+    ap = argparse.ArgumentParser(
+        prog="pcbgen parse",
+        description="Turn prompts (one per line) into specs without generating any KiCad files.",
+    )
+    ap.add_argument("inputs", nargs="*", default=["-"], help="Prompt files, one prompt per line ('-' or nothing: stdin)")
+    ap.add_argument("--jsonl", action="store_true", help="Write one compact JSON spec per line (default: indented JSON)")
+    ap.add_argument("-o", "--output", help="Write here instead of stdout")
+    ap.add_argument("--memo", type=int, default=4096, help="Distinct prompts remembered for reuse")
+    args = ap.parse_args(argv)
+
+    stats = ParseStats()
+    t0 = time.perf_counter()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        lines = spec_lines_from_prompts(prompt_lines(_open_inputs(args.inputs)), max(0, args.memo), stats)
+        for line in lines:
+            out.write(line if args.jsonl else json.dumps(json.loads(line), indent=2, ensure_ascii=False))
+            out.write("\n")
+    except OSError as e:
+        if isinstance(e, BrokenPipeError):
+            # e.g. `pcbgen parse --jsonl big.txt | head`
+            sys.stderr.close()
+            os._exit(0)
+        raise SystemExit(str(e))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    dt = time.perf_counter() - t0
+    print(f"parsed {stats.prompts} prompts ({stats.memo_hits} repeats) in {dt:.2f} s", file=sys.stderr)
+
+
+def _validate_main(argv: List[str]) -> None:
+    from pcbgen.batch import collect_jobs, validate_jobs
+
+    ap = argparse.ArgumentParser(
+        prog="pcbgen validate",
+        description="Check specs (and prompt output) against the spec schema without generating anything.",
+    )
+    ap.add_argument("sources", nargs="*", help="Spec files, directories of *.yaml specs, or glob patterns")
+    ap.add_argument("--manifest", action="append", default=[], help="YAML list of {spec|prompt, out} entries (repeatable)")
+    ap.add_argument("--prompts", action="append", default=[], help="Text file with one prompt per line (repeatable)")
+    ap.add_argument("--strict", action="store_true", help="Require every section of the schema, not just name and type")
+    ap.add_argument("--fail-fast", action="store_true", help="Stop at the first invalid spec")
+    ap.add_argument(
+        "--footprints",
+        action="store_true",
+        help="Also check every footprint exists in the installed KiCad libraries and has enough pads",
+    )
+    ap.add_argument("-v", "--verbose", action="store_true", help="Also list valid specs")
+    args = ap.parse_args(argv)
+
+    if args.footprints:
+        from pcbgen.footprint_index import footprint_dirs
+
+        if not footprint_dirs():
+            raise SystemExit("No KiCad footprint libraries found; set KICAD_FOOTPRINT_DIR to your KiCad footprints folder.")
+
+    try:
+        jobs = collect_jobs(args.sources, args.manifest, args.prompts)
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+    if not jobs:
+        raise SystemExit("No specs or prompts found.")
+
+    def _print(job, error: str) -> None:
+        if error:
+            print(f"FAIL {job.source}\n       " + error.replace("\n", "\n       "), flush=True)
+        elif args.verbose:
+            print(f"OK   {job.source}")
+
+    t0 = time.perf_counter()
+    bad = validate_jobs(jobs, strict=args.strict, fail_fast=args.fail_fast, on_result=_print, footprints=args.footprints)
+    dt = time.perf_counter() - t0
+    print(f"{len(bad)} invalid of {len(jobs)} checked in {dt:.2f} s")
+    if bad:
+        raise SystemExit(1)
+
+
+def _check_main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(
+        prog="pcbgen check",
+        description="Design-rule check generated boards: clearance, courtyard overlap, off-board parts, "
+        "unconnected nets and schematic labels missing from the board.",
+    )
+    ap.add_argument("boards", nargs="+", help=".kicad_pcb files or project folders (every .kicad_pcb inside)")
+    ap.add_argument("--clearance", type=float, default=None, help="Minimum copper clearance between nets in mm (default: 0.2)")
+    ap.add_argument("--allow-unconnected", action="store_true", help="Report unconnected nets but don't fail on them (unrouted boards)")
+    ap.add_argument("--report", help="Write a JSON report of every board's violations here")
+    ap.add_argument("-v", "--verbose", action="store_true", help="List every violation, not just the first few per board")
+    args = ap.parse_args(argv)
+
+    from pcbgen.drc import DEFAULT_CLEARANCE, check_board
+
+    paths: List[Path] = []
+    for raw in args.boards:
+        p = Path(raw).expanduser()
+        if p.is_dir():
+            paths += sorted(p.rglob("*.kicad_pcb"))
+        elif p.is_file():
+            paths.append(p)
+        else:
+            raise SystemExit(f"No such board or folder: {raw}")
+    if not paths:
+        raise SystemExit("No .kicad_pcb files found.")
 
-    src = ap.add_mutually_exclusive_group(required=True)
+    clearance = DEFAULT_CLEARANCE if args.clearance is None else args.clearance
+    results = []
+    failed = 0
+    t0 = time.perf_counter()
+    for p in paths:
+        try:
+            res = check_board(p, clearance=clearance)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"{p}: {e}")
+        results.append(res)
+        ok = res.ok(allow_unconnected=args.allow_unconnected)
+        failed += not ok
+        counts = ", ".join(f"{n} {kind}" for kind, n in sorted(res.counts().items()))
+        print(f"{'OK  ' if ok else 'FAIL'} {res.seconds * 1000:8.1f} ms  {p}" + (f"  ({counts})" if counts else ""), flush=True)
+        for v in res.violations if args.verbose else res.violations[:5]:
+            print(f"       {v.kind}: {v.message}")
+        if not args.verbose and len(res.violations) > 5:
+            print(f"       ... {len(res.violations) - 5} more (-v lists all)")
+    wall = time.perf_counter() - t0
+
+    print(f"{len(paths) - failed}/{len(paths)} boards passed in {wall:.2f} s")
+    if args.report:
+        summary = {"boards": [r.to_json() for r in results], "total": len(paths), "failed": failed, "wall_s": wall}
+        Path(args.report).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    if failed:
+        raise SystemExit(1)
+
+
+def _inspect_main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(
+        prog="pcbgen inspect",
+        description="Outline an existing .kicad_sch/.kicad_pcb/.kicad_sym without loading it all, or diff two of them.",
+    )
+    ap.add_argument("file", help="KiCad S-expression file")
+    ap.add_argument("--depth", type=int, default=1, help="Levels of the outline to show")
+    ap.add_argument("--diff", metavar="OTHER", help="List what changed from FILE to OTHER instead")
+    args = ap.parse_args(argv)
+
+    from pcbgen.sexpr import diff, open_sexpr
+
+    def _outline(nodes: List, depth: int, indent: str) -> None:
+        groups: dict = {}
+        for node in nodes:
+            groups.setdefault(node.head, []).append(node)
+        for head, group in groups.items():
+            print(f"{indent}{head} x {len(group)}")
+            if depth > 1:
+                _outline([c for n in group for c in n.children()], depth - 1, indent + "  ")
+
+    try:
+        with open_sexpr(Path(args.file)) as doc:
+            if not args.diff:
+                print(f"{doc.root.head} ({Path(args.file).stat().st_size} bytes)")
+                _outline(list(doc.root.children()), args.depth, "  ")
+                return
+            with open_sexpr(Path(args.diff)) as other:
+                changes = 0
+                for path, old, new in diff(doc.root, other.root):
+                    changes += 1
+                    where = "/".join(path)
+                    if old is None:
+                        print(f"+ {where} {new.get('uuid') or ' '.join(new.atoms()[:2])}")
+                    elif new is None:
+                        print(f"- {where} {old.get('uuid') or ' '.join(old.atoms()[:2])}")
+                    else:
+                        print(f"~ {where}: {' '.join(old.atoms())} -> {' '.join(new.atoms())}")
+                print(f"{changes} changes")
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+
+
+_COMMANDS = {
+    "batch": _batch_main,
+    "sweep": _sweep_main,
+    "watch": _watch_main,
+    "serve": _serve_main,
+    "parse": _parse_main,
+    "validate": _validate_main,
+    "check": _check_main,
+    "inspect": _inspect_main,
+}
+
+
+def _archive_main(args, spec, cache: Optional[DiskCache]) -> None:
+    from pcbgen.archive import ProjectArchive
+    from pcbgen.kicad_project import project_files
+
+    status, files = project_files(
+        spec,
+        cache=None if args.no_cache else cache,
+        backend=args.backend,
+        route=args.route,
+        route_workers=max(1, args.route_workers),
+    )
+    try:
+        archive = ProjectArchive(args.archive, args.archive_format)
+    except (OSError, ValueError) as e:
+        raise SystemExit(str(e))
+    with archive:
+        archive.add(spec.name, files)
+    log = sys.stderr if args.archive == "-" else sys.stdout
+    print(f"Wrote {spec.name} to {archive.name} ({status})", file=log)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in _COMMANDS:
+        _COMMANDS[argv[0]](argv[1:])
+        return
+
+    ap = argparse.ArgumentParser(
+        description="Generate a KiCad 9 project from YAML spec OR natural-language prompt (offline parser). "
+        "Subcommands: " + ", ".join(_COMMANDS) + "."
+    )
+
+    src = ap.add_mutually_exclusive_group()
     src.add_argument("--spec", help="Path to YAML spec")
     src.add_argument("--prompt", help="Natural language description of the PCB to generate")
 
-    ap.add_argument("--out", required=True, help="Output directory (project folder will be created here)")
+    ap.add_argument("--out", help="Output directory (project folder will be created here)")
     ap.add_argument("--ai", action="store_true", help="Optional: enable AI layout planning (if you later add it).")
     ap.add_argument("--hint", default="", help="Optional hint (compact/neat/left-header/etc.)")
+    _add_cache_args(ap)
+    _add_layout_cache_args(ap)
+    _add_backend_arg(ap)
+    _add_route_arg(ap)
+    ap.add_argument("--route-workers", type=int, default=1, help="With --route: processes for routing independent nets (same result)")
+    _add_update_arg(ap)
+    _add_archive_args(ap)
+    _add_profile_args(ap)
 
-    args = ap.parse_args()
-    out_dir = Path(args.out).expanduser().resolve()
+    args = ap.parse_args(argv)
+    if args.clear_layout_cache:
+        from pcbgen.ai_layout import clear_layout_cache
+
+        clear_layout_cache()
+        if not (args.spec or args.prompt):
+            print("Cleared AI layout cache.")
+            return
+    if not (args.spec or args.prompt):
+        ap.error("one of the arguments --spec --prompt is required")
+    if not (args.out or args.archive):
+        ap.error("one of the arguments --out --archive is required")
+    if args.archive and args.update:
+        ap.error("--update patches a project folder; it can't be combined with --archive")
+    with _profiled(args):
+        _generate_main(args)
 
+
+def _generate_main(args: argparse.Namespace) -> None:
     # Load YAML spec OR generate spec from prompt (offline)
     if args.spec:
         spec_path = Path(args.spec).expanduser().resolve()
-        data = yaml.safe_load(spec_path.read_text(encoding="utf-8"))
-        if not isinstance(data, dict):
-            raise SystemExit("Spec YAML must be a mapping at the top level.")
+        try:
+            data = load_spec_file(spec_path)
+        except ValueError as e:
+            raise SystemExit(str(e))
     else:
         data = spec_from_prompt(args.prompt)
         if not isinstance(data, dict):
             raise SystemExit("Prompt parsing failed (did not return an object).")
 
-    # stash flags in spec so templates can use them
-    data["_use_ai"] = bool(args.ai)
-    data["_hint"] = str(args.hint)
-
-    name = str(data.get("name", "")).strip()
-    board_type = str(data.get("type", "")).strip()
-    if not name or not board_type:
-        raise SystemExit("Spec must include: name, type")
-
-    spec = ProjectSpec(name=name, type=board_type, raw=data)
-    generate_project(spec, out_dir)
+    try:
+        spec = project_spec_from_dict(data, use_ai=args.ai, hint=args.hint, layout_cache=not args.no_layout_cache)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    cache = DiskCache(Path(args.cache_dir), max_bytes=args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+    if args.archive:
+        _archive_main(args, spec, cache)
+        return
+    out_dir = Path(args.out).expanduser().resolve()
+    status = generate_project(
+        spec,
+        out_dir,
+        use_cache=not args.no_cache,
+        cache=cache,
+        backend=args.backend,
+        route=args.route,
+        route_workers=max(1, args.route_workers),
+        update=args.update,
+    )
 
-    print(f"Generated project at: {out_dir}")
+    if status == "built":
+        print(f"Generated project at: {out_dir}")
+    elif status == "updated":
+        print(f"Updated schematic at: {out_dir}")
+    else:
+        print(f"Project up to date at: {out_dir} ({status})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from pcbgen.trace import stage, timed
+
+Point = Tuple[float, float]
+
+# Schematic writers: "ksa" builds kicad_sch_api's object model and saves it,
+# "stream" writes the S-expression directly (pcbgen.sch_writer).
+BACKENDS = ("ksa", "stream")
+DEFAULT_BACKEND = "ksa"
+
+# uuid5 namespace for everything pcbgen writes into a schematic; KiCad itself makes
+# version-4 uuids, which is how an update tells hand-added elements from generated ones
+UUID_NAMESPACE = uuid.UUID("0b6c4f3e-2f1d-5c7a-9e44-7063626765e6")
+
+
+def stable_uuid(*parts: str) -> str:
+    """
+    Deterministic uuid for a generated element, from the project name and the element's
+    identity. Same value as str(uuid.uuid5(UUID_NAMESPACE, ...)), built without the UUID
+    object, which is most of the cost when a schematic has thousands of them.
+    """
+    h = bytearray(hashlib.sha1(UUID_NAMESPACE.bytes + "/".join(parts).encode("utf-8")).digest()[:16])
+    h[6] = (h[6] & 0x0F) | 0x50
+    h[8] = (h[8] & 0x3F) | 0x80
+    x = h.hex()
+    return f"{x[:8]}-{x[8:12]}-{x[12:16]}-{x[16:20]}-{x[20:]}"
+
+
+def wire_key(start: Point, end: Point) -> str:
+    return f"{start[0]:.4f},{start[1]:.4f},{end[0]:.4f},{end[1]:.4f}"
+
+
+def label_key(text: str, position: Point, rotation: float) -> str:
+    return f"{text}@{position[0]:.4f},{position[1]:.4f},{rotation:g}"
+
+
+@dataclass(slots=True)
+class Component:
+    ref: str
+    lib_id: str
+    value: str
+    footprint: str
+    position: Point
+    rotation: float = 0.0
+
+
+@dataclass(slots=True)
+class Label:
+    text: str
+    position: Point
+    rotation: float = 0.0  # 0: text runs right of the anchor, 180: left
+
+
+@dataclass(slots=True)
+class Wire:
+    start: Point
+    end: Point
+
+
+@dataclass
+class SchematicDesign:
+    """Backend-neutral content of one schematic sheet, as produced by the templates."""
+
+    name: str
+    components: List[Component] = field(default_factory=list)
+    labels: List[Label] = field(default_factory=list)
+    wires: List[Wire] = field(default_factory=list)
+
+    @property
+    def sheet_uuid(self) -> str:
+        return stable_uuid(self.name, "sheet")
+
+    def elements(self) -> Iterator[Tuple[str, str, Union[Component, Wire, Label]]]:
+        """
+        (kind, key, element) for every symbol, wire and label. The key is what the element's
+        uuid is derived from: the reference for a symbol, everything about a wire or label
+        (with #n on repeats), so an edit to one part's value leaves every other uuid alone.
+        """
+        for c in self.components:
+            yield "symbol", c.ref, c
+        seen: Dict[Tuple[str, str], int] = {}
+        for w in self.wires:
+            yield "wire", _repeat(seen, "wire", wire_key(w.start, w.end)), w
+        for lb in self.labels:
+            yield "label", _repeat(seen, "label", label_key(lb.text, lb.position, lb.rotation)), lb
+
+    def element_uuid(self, kind: str, key: str) -> str:
+        return stable_uuid(self.name, kind, key)
+
+    def digests(self) -> Dict[str, str]:
+        """"kind/key" -> short hash of the element's inputs; equal hashes mean it would be written the same."""
+        return {f"{kind}/{key}": element_digest(kind, el) for kind, key, el in self.elements()}
+
+
+def _repeat(seen: Dict[Tuple[str, str], int], kind: str, key: str) -> str:
+    n = seen.get((kind, key), 0)
+    seen[(kind, key)] = n + 1
+    return key if n == 0 else f"{key}#{n}"
+
+
+def element_digest(kind: str, element: Union[Component, Wire, Label]) -> str:
+    # a wire or label is all in its key, so a changed one is a new key; only symbols need hashing
+    if kind != "symbol":
+        return ""
+    fields = (element.ref, element.lib_id, element.value, element.footprint, element.position, element.rotation)
+    return hashlib.blake2b(repr(fields).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def save_with_ksa(design: SchematicDesign, out_path: Path) -> None:
+    import kicad_sch_api as ksa
+
+    sch = ksa.create_schematic(design.name)
+    # kicad_sch_api draws the sheet and pin uuids at random; use the stream writer's, so
+    # regenerating a spec gives the same file with either backend. It has no setter for
+    # the sheet uuid, so that one is swapped in the saved text (header and instance paths).
+    drawn = sch.uuid
+    with stage("schematic.add", elements=len(design.components) + len(design.wires) + len(design.labels)):
+        for kind, key, el in design.elements():
+            uid = design.element_uuid(kind, key)
+            if kind == "symbol":
+                comp = sch.components.add(
+                    el.lib_id, el.ref, el.value, position=el.position, footprint=el.footprint, rotation=el.rotation, component_uuid=uid
+                )
+                for pin in comp.pins:
+                    comp.pin_uuids[str(pin.number)] = stable_uuid(design.name, "symbol", el.ref, "pin", str(pin.number))
+            elif kind == "wire":
+                sch.wires.add(start=el.start, end=el.end, uuid=uid)
+            else:
+                sch.labels.add(
+                    el.text,
+                    position=el.position,
+                    rotation=el.rotation,
+                    justify_h="right" if el.rotation == 180 else "left",
+                    uuid=uid,
+                )
+    with stage("schematic.save"):
+        sch.save(str(out_path))
+        if drawn and drawn != design.sheet_uuid:
+            path = Path(out_path)
+            path.write_bytes(path.read_bytes().replace(drawn.encode(), design.sheet_uuid.encode()))
+
+
+def save_design(design: SchematicDesign, out_path: Path, backend: str = DEFAULT_BACKEND) -> None:
+    if backend == "stream":
+        from pcbgen.sch_writer import save_streaming
+
+        save_streaming(design, out_path)
+    elif backend == "ksa":
+        save_with_ksa(design, out_path)
+    else:
+        raise ValueError(f"Unknown schematic backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+@timed("schematic.render")
+def schematic_text(design: SchematicDesign, backend: str = DEFAULT_BACKEND) -> str:
+    """What save_design would write, built in memory (ksa only saves to a path, so it goes through a temp file)."""
+    if backend == "stream":
+        from pcbgen.sch_writer import write_schematic
+
+        buf = io.StringIO()
+        write_schematic(design, buf)
+        return buf.getvalue()
+    if backend == "ksa":
+        with tempfile.TemporaryDirectory(prefix="pcbgen-") as tmp:
+            path = Path(tmp) / f"{design.name}.kicad_sch"
+            save_with_ksa(design, path)
+            return path.read_bytes().decode("utf-8")
+    raise ValueError(f"Unknown schematic backend: {backend} (expected one of {', '.join(BACKENDS)})")
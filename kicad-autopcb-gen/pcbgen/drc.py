@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import math
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from pcbgen.footprint_index import B_CU, F_CU, PAD_RE, pad_shape, parse_footprint
+from pcbgen.netlist import DisjointSet
+from pcbgen.symbol_index import TOKEN_RE, sexpr_end
+
+DEFAULT_CLEARANCE = 0.2  # mm, copper to copper of different nets
+EPS = 1e-6
+
+_STR = r'"((?:[^"\\]|\\.)*)"'
+_NUM = r"([-\d.eE+]+)"
+_AT_RE = re.compile(r"\(at\s+" + _NUM + r"\s+" + _NUM + r"(?:\s+" + _NUM + r")?")
+_REF_RE = re.compile(r'\(property\s+"Reference"\s+' + _STR + r"|\(fp_text\s+reference\s+(?:" + _STR + r"|([^\s()]+))")
+_LAYER_RE = re.compile(r'\(layer\s+"?([^"\s()]+)"?\s*\)')
+_NET_RE = re.compile(r"\(net\s+(\d+)(?:\s+" + _STR + r")?\s*\)")
+_POINT_RE = re.compile(r"\((start|end|mid|center|xy|at)\s+" + _NUM + r"\s+" + _NUM)
+_WIDTH_RE = re.compile(r"\((?:width|size)\s+" + _NUM)
+_PAD_FORM_RE = re.compile(r"\(pad\s+(?:" + _STR + r'|[^\s()"]+)\s+\S+\s+([^\s()]+)')
+_LABEL_RE = re.compile(r"\((?:label|global_label|hierarchical_label)\s+" + _STR)
+
+# copper shapes: a box (x1, y1, x2, y2) or a capsule (segment a-b grown by r)
+BOX, CAPSULE = 0, 1
+
+
+@dataclass
+class Violation:
+    kind: str  # clearance | courtyard | off_board | unconnected | missing_net | no_outline
+    message: str
+    at: Optional[Tuple[float, float]] = None
+    items: List[str] = field(default_factory=list)
+    distance: Optional[float] = None
+    net: Optional[str] = None
+
+
+@dataclass
+class BoardCheck:
+    board: str
+    footprints: int
+    pads: int
+    tracks: int
+    vias: int
+    seconds: float
+    violations: List[Violation]
+
+    def counts(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for v in self.violations:
+            out[v.kind] = out.get(v.kind, 0) + 1
+        return out
+
+    def ok(self, allow_unconnected: bool = False) -> bool:
+        return not any(v.kind != "unconnected" or not allow_unconnected for v in self.violations)
+
+    def to_json(self) -> Dict[str, Any]:
+        out = asdict(self)
+        out["counts"] = self.counts()
+        return out
+
+
+@dataclass
+class _Copper:
+    """Flat arrays of every copper shape on the board, one row per pad/track/via."""
+
+    kind: List[int] = field(default_factory=list)
+    geom: List[Tuple[float, float, float, float, float]] = field(default_factory=list)  # ax ay bx by r
+    layers: List[int] = field(default_factory=list)
+    net: List[int] = field(default_factory=list)
+    owner: List[int] = field(default_factory=list)  # footprint index for pads, -1 otherwise
+    label: List[str] = field(default_factory=list)
+
+    def add(self, kind: int, geom: Tuple[float, float, float, float, float], layers: int, net: int, owner: int, label: str) -> None:
+        self.kind.append(kind)
+        self.geom.append(geom)
+        self.layers.append(layers)
+        self.net.append(net)
+        self.owner.append(owner)
+        self.label.append(label)
+
+
+def _top_level(text: str) -> Iterator[Tuple[str, int, int]]:
+    # (head token, start, end) of every item directly inside (kicad_pcb ...)
+    depth = 0
+    start = -1
+    for m in TOKEN_RE.finditer(text):
+        tok = m.group()
+        if tok == "(":
+            depth += 1
+            if depth == 2:
+                start = m.start()
+        elif tok == ")":
+            if depth == 2 and start >= 0:
+                head = text[start + 1 : start + 40].split(None, 1)[0]
+                yield head, start, m.end()
+                start = -1
+            depth -= 1
+
+
+def _turn(x: float, y: float, rotation: float) -> Tuple[float, float]:
+    # KiCad board rotation: counter-clockwise on screen, y down
+    if not rotation:
+        return x, y
+    a = math.radians(rotation)
+    return x * math.cos(a) + y * math.sin(a), -x * math.sin(a) + y * math.cos(a)
+
+
+def _turned_box(box: Tuple[float, float, float, float], rotation: float, dx: float, dy: float) -> Tuple[float, float, float, float]:
+    x1, y1, x2, y2 = box
+    pts = [_turn(x, y, rotation) for x, y in ((x1, y1), (x2, y1), (x1, y2), (x2, y2))]
+    xs = [p[0] + dx for p in pts]
+    ys = [p[1] + dy for p in pts]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _layer_mask(item: str) -> int:
+    m = _LAYER_RE.search(item)
+    return {"F.Cu": F_CU, "B.Cu": B_CU}.get(m.group(1), 0) if m else 0
+
+
+class Board:
+    """What the checks need from a .kicad_pcb: footprints, copper shapes, nets and the outline."""
+
+    def __init__(self, text: str) -> None:
+        self.nets: Dict[int, str] = {}
+        self.refs: List[str] = []
+        self.courtyards: List[Optional[Tuple[float, float, float, float]]] = []
+        self.sides: List[int] = []
+        self.pad_count = 0
+        self.tracks = 0
+        self.vias = 0
+        self.copper = _Copper()
+        edge: List[Tuple[float, float]] = []
+        for head, start, end in _top_level(text):
+            item = text[start:end]
+            if head == "net":
+                m = _NET_RE.match(item)
+                if m:
+                    self.nets[int(m.group(1))] = m.group(2) or ""
+            elif head == "footprint":
+                self._footprint(item)
+            elif head in ("segment", "arc"):
+                pts = {m.group(1): (float(m.group(2)), float(m.group(3))) for m in _POINT_RE.finditer(item)}
+                width = _WIDTH_RE.search(item)
+                net = _NET_RE.search(item)
+                if "start" in pts and "end" in pts:
+                    # an arc is checked as its chord, close enough for generated boards
+                    a, b = pts["start"], pts["end"]
+                    r = float(width.group(1)) / 2 if width else 0.0
+                    self.copper.add(CAPSULE, (a[0], a[1], b[0], b[1], r), _layer_mask(item), int(net.group(1)) if net else 0, -1, "track")
+                    self.tracks += 1
+            elif head == "via":
+                at = _AT_RE.search(item)
+                size = _WIDTH_RE.search(item)
+                net = _NET_RE.search(item)
+                if at:
+                    x, y = float(at.group(1)), float(at.group(2))
+                    r = float(size.group(1)) / 2 if size else 0.0
+                    self.copper.add(CAPSULE, (x, y, x, y, r), F_CU | B_CU, int(net.group(1)) if net else 0, -1, "via")
+                    self.vias += 1
+            elif head.startswith("gr_") and ('"Edge.Cuts"' in item or "(layer Edge.Cuts)" in item):
+                pts = [(m.group(1), float(m.group(2)), float(m.group(3))) for m in _POINT_RE.finditer(item)]
+                if head == "gr_circle" and len(pts) == 2:
+                    (_, cx, cy), (_, ex, ey) = pts
+                    r = math.hypot(ex - cx, ey - cy)
+                    edge += [(cx - r, cy - r), (cx + r, cy + r)]
+                else:
+                    edge += [(x, y) for _, x, y in pts]
+        self.outline: Optional[Tuple[float, float, float, float]] = None
+        if edge:
+            xs, ys = zip(*edge)
+            self.outline = (min(xs), min(ys), max(xs), max(ys))
+
+    def _footprint(self, item: str) -> None:
+        fi = len(self.refs)
+        at = _AT_RE.search(item)
+        x, y, rot = (float(at.group(1)), float(at.group(2)), float(at.group(3) or 0)) if at else (0.0, 0.0, 0.0)
+        ref = _REF_RE.search(item)
+        self.refs.append(next((g for g in ref.groups() if g), "?") if ref else "?")
+        self.sides.append(B_CU if _layer_mask(item) == B_CU else F_CU)
+        _, courtyard, _ = parse_footprint(item)
+        pad_boxes = []
+        for m in PAD_RE.finditer(item):
+            pad = item[m.start() : sexpr_end(item, m.start())]
+            number = m.group(1) if m.group(1) is not None else m.group(2)
+            px, py = _turn(float(m.group(4)), float(m.group(5)), rot)
+            px, py = px + x, py + y
+            # the pad's (at) angle already includes the footprint's in a board file
+            w, h, layers = pad_shape(pad, m.group(3), float(m.group(6) or 0))
+            if not layers or not w:
+                continue
+            net = _NET_RE.search(pad)
+            form = _PAD_FORM_RE.match(pad)
+            form = form.group(2) if form else "rect"
+            label = f"{self.refs[fi]} pad {number}" if number else f"{self.refs[fi]} pad"
+            if form == "circle" or (form == "oval" and abs(w - h) < EPS):
+                geom = (px, py, px, py, w / 2)
+                kind = CAPSULE
+            elif form == "oval":
+                # a stadium: the long axis as a segment, grown by half the short side
+                d = abs(w - h) / 2
+                geom = (px - d, py, px + d, py, h / 2) if w > h else (px, py - d, px, py + d, w / 2)
+                kind = CAPSULE
+            else:
+                geom = (px - w / 2, py - h / 2, px + w / 2, py + h / 2, 0.0)
+                kind = BOX
+            self.copper.add(kind, geom, layers, int(net.group(1)) if net else 0, fi, label)
+            pad_boxes.append((px - w / 2, py - h / 2, px + w / 2, py + h / 2))
+            self.pad_count += 1
+        if courtyard is not None:
+            self.courtyards.append(_turned_box(courtyard, rot, x, y))
+        elif pad_boxes:
+            xs1, ys1, xs2, ys2 = zip(*pad_boxes)
+            self.courtyards.append((min(xs1), min(ys1), max(xs2), max(ys2)))
+        else:
+            self.courtyards.append(None)
+
+
+def grid_pairs(box: np.ndarray, cell: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (i, j), i < j, of every pair of boxes (rows of x1 y1 x2 y2) that overlap or touch,
+    through a uniform grid: each box is entered in the cells it covers, boxes sharing a
+    cell are paired, and a pair sharing several cells is kept only in the cell holding
+    the corner of their overlap. Linear in the boxes while they are spread out.
+    """
+    n = len(box)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    g0 = np.floor(box[:, :2].min(axis=0) / cell)
+    lo = (np.floor(box[:, :2] / cell) - g0).astype(np.int64)
+    hi = (np.floor(box[:, 2:] / cell) - g0).astype(np.int64)
+    span = hi - lo + 1
+    count = span[:, 0] * span[:, 1]
+    item = np.repeat(np.arange(n), count)
+    k = np.arange(len(item)) - np.repeat(np.cumsum(count) - count, count)
+    cols = int(hi[:, 0].max()) + 1
+    key = (lo[item, 1] + k // span[item, 0]) * cols + lo[item, 0] + k % span[item, 0]
+    order = np.argsort(key, kind="stable")
+    key, item = key[order], item[order]
+
+    # every entry pairs with the entries after it in its cell
+    bounds = np.flatnonzero(np.diff(key)) + 1
+    sizes = np.diff(np.concatenate(([0], bounds, [len(key)])))
+    ends = np.repeat(np.concatenate((bounds, [len(key)])), sizes)
+    after = ends - np.arange(len(key)) - 1
+    first = np.repeat(np.arange(len(key)), after)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(after) - after, after)
+    i, j = item[first], item[second]
+
+    ox = (np.floor(np.maximum(box[i, 0], box[j, 0]) / cell) - g0[0]).astype(np.int64)
+    oy = (np.floor(np.maximum(box[i, 1], box[j, 1]) / cell) - g0[1]).astype(np.int64)
+    keep = (
+        (oy * cols + ox == key[first])
+        & (box[i, 0] <= box[j, 2])
+        & (box[j, 0] <= box[i, 2])
+        & (box[i, 1] <= box[j, 3])
+        & (box[j, 1] <= box[i, 3])
+    )
+    i, j = i[keep], j[keep]
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def _cell_size(box: np.ndarray) -> float:
+    # about twice a typical shape, so most shapes sit in one to four cells
+    return max(2.0 * float(np.median(np.maximum(box[:, 2] - box[:, 0], box[:, 3] - box[:, 1]))), 0.5) if len(box) else 1.0
+
+
+def _point_seg(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    t = np.clip(((px - ax) * dx + (py - ay) * dy) / np.maximum(dx * dx + dy * dy, EPS * EPS), 0.0, 1.0)
+    return np.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def _seg_seg(ax, ay, bx, by, cx, cy, dx, dy):
+    def cross(ox, oy, px, py, qx, qy):
+        return (px - ox) * (qy - oy) - (py - oy) * (qx - ox)
+
+    crossing = (cross(ax, ay, bx, by, cx, cy) * cross(ax, ay, bx, by, dx, dy) < 0) & (
+        cross(cx, cy, dx, dy, ax, ay) * cross(cx, cy, dx, dy, bx, by) < 0
+    )
+    d = np.minimum.reduce(
+        [
+            _point_seg(ax, ay, cx, cy, dx, dy),
+            _point_seg(bx, by, cx, cy, dx, dy),
+            _point_seg(cx, cy, ax, ay, bx, by),
+            _point_seg(dx, dy, ax, ay, bx, by),
+        ]
+    )
+    return np.where(crossing, 0.0, d)
+
+
+def _point_box(px, py, x1, y1, x2, y2):
+    return np.hypot(np.maximum(np.maximum(x1 - px, px - x2), 0.0), np.maximum(np.maximum(y1 - py, py - y2), 0.0))
+
+
+def _seg_box(ax, ay, bx, by, x1, y1, x2, y2):
+    # zero when the segment enters the box (it then crosses a diagonal or ends inside);
+    # otherwise the nearest point is a segment end or a box corner
+    parts = [_point_box(ax, ay, x1, y1, x2, y2), _point_box(bx, by, x1, y1, x2, y2)]
+    parts += [_point_seg(cx, cy, ax, ay, bx, by) for cx, cy in ((x1, y1), (x2, y1), (x1, y2), (x2, y2))]
+    parts += [_seg_seg(ax, ay, bx, by, x1, y1, x2, y2), _seg_seg(ax, ay, bx, by, x2, y1, x1, y2)]
+    return np.minimum.reduce(parts)
+
+
+def copper_gaps(kind: np.ndarray, geom: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Edge-to-edge distance between copper shapes i and j (0 when they touch or overlap)."""
+    gi, gj = geom[i], geom[j]
+    out = np.empty(len(i))
+    ki, kj = kind[i], kind[j]
+    bb = (ki == BOX) & (kj == BOX)
+    if bb.any():
+        a, b = gi[bb], gj[bb]
+        dx = np.maximum(np.maximum(a[:, 0], b[:, 0]) - np.minimum(a[:, 2], b[:, 2]), 0.0)
+        dy = np.maximum(np.maximum(a[:, 1], b[:, 1]) - np.minimum(a[:, 3], b[:, 3]), 0.0)
+        out[bb] = np.hypot(dx, dy)
+    cc = (ki == CAPSULE) & (kj == CAPSULE)
+    if cc.any():
+        a, b = gi[cc], gj[cc]
+        out[cc] = _seg_seg(*a[:, :4].T, *b[:, :4].T) - a[:, 4] - b[:, 4]
+    mixed = ki != kj
+    if mixed.any():
+        seg = np.where((ki[mixed] == CAPSULE)[:, None], gi[mixed], gj[mixed])
+        box = np.where((ki[mixed] == CAPSULE)[:, None], gj[mixed], gi[mixed])
+        out[mixed] = _seg_box(*seg[:, :4].T, *box[:, :4].T) - seg[:, 4]
+    return np.maximum(out, 0.0)
+
+
+def _bounds(kind: np.ndarray, geom: np.ndarray) -> np.ndarray:
+    r = geom[:, 4:5]
+    lo = np.minimum(geom[:, :2], geom[:, 2:4]) - r
+    hi = np.maximum(geom[:, :2], geom[:, 2:4]) + r
+    return np.hstack((lo, hi))
+
+
+def schematic_labels(path: Path) -> List[str]:
+    """Net label texts of a .kicad_sch (local, global and hierarchical)."""
+    return sorted(set(m.group(1) for m in _LABEL_RE.finditer(path.read_text(encoding="utf-8"))))
+
+
+def check_board(path: Path, clearance: float = DEFAULT_CLEARANCE, schematic: Optional[Path] = None) -> BoardCheck:
+    """
+    Design-rule check of a .kicad_pcb without KiCad:
+      clearance   - copper of different nets on a shared layer closer than `clearance`
+                    (pads of one footprint are left to the footprint's own design)
+      courtyard   - courtyards on the same side overlapping
+      off_board   - a courtyard or copper shape not inside the Edge.Cuts outline
+      unconnected - a net whose pads are not all joined by copper
+      missing_net - a schematic label (the .kicad_sch next to the board by default)
+                    that names no net on the board
+    Candidate pairs come from a uniform grid (grid_pairs) and distances are computed
+    for all of them at once, so the cost grows about linearly with the board.
+    """
+    t0 = time.perf_counter()
+    path = Path(path)
+    board = Board(path.read_text(encoding="utf-8"))
+    found: List[Violation] = []
+    cu = board.copper
+    kind = np.array(cu.kind, dtype=np.int8)
+    geom = np.array(cu.geom, dtype=float).reshape(-1, 5)
+    layers = np.array(cu.layers, dtype=np.int64)
+    net = np.array(cu.net, dtype=np.int64)
+    owner = np.array(cu.owner, dtype=np.int64)
+    bounds = _bounds(kind, geom)
+
+    # copper: one pass over candidate pairs serves both clearance and connectivity
+    grown = bounds + np.array([-clearance / 2, -clearance / 2, clearance / 2, clearance / 2])
+    i, j = grid_pairs(grown, _cell_size(grown))
+    shared = (layers[i] & layers[j]) != 0
+    i, j = i[shared], j[shared]
+    gap = copper_gaps(kind, geom, i, j)
+    same_net = (net[i] == net[j]) & (net[i] != 0)
+    bad = ~same_net & (gap < clearance - EPS) & ~((owner[i] == owner[j]) & (owner[i] >= 0))
+    for a, b, d in zip(i[bad], j[bad], gap[bad]):
+        names = [f"{cu.label[k]} ({board.nets.get(int(net[k])) or 'no net'})" for k in (a, b)]
+        at = ((bounds[a, 0] + bounds[a, 2] + bounds[b, 0] + bounds[b, 2]) / 4, (bounds[a, 1] + bounds[a, 3] + bounds[b, 1] + bounds[b, 3]) / 4)
+        found.append(
+            Violation("clearance", f"{names[0]} and {names[1]} are {d:.3f} mm apart", (round(at[0], 3), round(at[1], 3)), names, round(float(d), 4))
+        )
+
+    ds = DisjointSet()
+    for _ in range(len(kind)):
+        ds.add()
+    touch = same_net & (gap <= EPS)
+    for a, b in zip(i[touch], j[touch]):
+        ds.union(int(a), int(b))
+    groups: Dict[int, Dict[int, List[str]]] = {}
+    for k in np.flatnonzero((owner >= 0) & (net != 0)):
+        groups.setdefault(int(net[k]), {}).setdefault(ds.find(int(k)), []).append(cu.label[k])
+    for n, parts in sorted(groups.items()):
+        if len(parts) > 1:
+            islands = sorted(parts.values())
+            found.append(
+                Violation(
+                    "unconnected",
+                    f"net {board.nets.get(n, n)}: pads in {len(islands)} unconnected groups",
+                    items=[", ".join(g) for g in islands],
+                    net=board.nets.get(n, str(n)),
+                )
+            )
+
+    # courtyards
+    present = [k for k, c in enumerate(board.courtyards) if c is not None]
+    court = np.array([board.courtyards[k] for k in present], dtype=float).reshape(-1, 4)
+    a, b = grid_pairs(court, _cell_size(court))
+    sides = np.array(board.sides, dtype=np.int64)[present] if present else np.zeros(0, dtype=np.int64)
+    ow = np.minimum(court[a, 2], court[b, 2]) - np.maximum(court[a, 0], court[b, 0])
+    oh = np.minimum(court[a, 3], court[b, 3]) - np.maximum(court[a, 1], court[b, 1])
+    hit = (ow > EPS) & (oh > EPS) & (sides[a] == sides[b])
+    for p, q, w, h in zip(a[hit], b[hit], ow[hit], oh[hit]):
+        refs = [board.refs[present[p]], board.refs[present[q]]]
+        found.append(Violation("courtyard", f"{refs[0]} and {refs[1]} courtyards overlap by {w:.3f} x {h:.3f} mm", items=refs))
+
+    # outline
+    if board.outline is None:
+        found.append(Violation("no_outline", "no Edge.Cuts outline"))
+    else:
+        x1, y1, x2, y2 = board.outline
+        for box, labels in ((court, [board.refs[k] for k in present]), (bounds, cu.label)):
+            out = (box[:, 0] < x1 - EPS) | (box[:, 1] < y1 - EPS) | (box[:, 2] > x2 + EPS) | (box[:, 3] > y2 + EPS)
+            for k in np.flatnonzero(out):
+                if box is bounds and owner[k] >= 0 and board.courtyards[owner[k]] is not None:
+                    continue  # a part's pads are reported through its courtyard
+                c = ((box[k, 0] + box[k, 2]) / 2, (box[k, 1] + box[k, 3]) / 2)
+                found.append(Violation("off_board", f"{labels[k]} is outside the board outline", (round(c[0], 3), round(c[1], 3)), [labels[k]]))
+
+    # schematic labels
+    if schematic is None:
+        schematic = path.with_suffix(".kicad_sch")
+        schematic = schematic if schematic.is_file() else None
+    if schematic is not None:
+        names = set(board.nets.values())
+        for text in schematic_labels(schematic):
+            if text not in names:
+                found.append(Violation("missing_net", f"schematic label {text} has no net on the board", net=text))
+
+    return BoardCheck(str(path), len(board.refs), board.pad_count, board.tracks, board.vias, time.perf_counter() - t0, found)
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from pcbgen.cache import default_cache_dir, write_atomic
+from pcbgen.symbol_index import sexpr_end
+
+if TYPE_CHECKING:
+    from pcbgen.design import SchematicDesign
+
+FOOTPRINT_DIR_ENV = ("KICAD_FOOTPRINT_DIR", "KICAD9_FOOTPRINT_DIR", "KICAD8_FOOTPRINT_DIR", "KICAD7_FOOTPRINT_DIR")
+DEFAULT_FOOTPRINT_DIRS = (
+    "/usr/share/kicad/footprints",
+    "/usr/local/share/kicad/footprints",
+    "~/.local/share/kicad/footprints",
+    "~/Documents/KiCad/footprints",
+    "~/Documents/kicad/footprints",
+    "~/kicad/footprints",
+)
+
+BBox = Tuple[float, float, float, float]
+
+# Index file layout (little endian), one file per .pretty library:
+#   header  magic, version, slot count
+#   slots   open-addressing table of (name hash, record offset, record length); hash 0 = empty
+#   records source size, source mtime_ns, name, courtyard x1 y1 x2 y2 (NaN: none),
+#           pad count, per pad x y w h and copper layers, then the pad numbers joined by \x1f
+INDEX_VERSION = 2
+_MAGIC = b"PCBGFPI\0"
+_HEADER = struct.Struct("<8sII")
+_SLOT = struct.Struct("<QII")
+_REC_HEAD = struct.Struct("<QQH")
+_REC_GEOM = struct.Struct("<4dI")
+_PAD = struct.Struct("<ddddB")
+
+# copper layers of a pad, as a bit mask
+F_CU = 1
+B_CU = 2
+
+# a pad's head: quoted or bare number, type, shape, then (at x y [rotation]); pcbgen.drc
+# reads pads in written boards with it too
+PAD_RE = re.compile(
+    r'\(pad\s+(?:"((?:[^"\\]|\\.)*)"|([^\s()"]+))\s+(\S+)\s+\S+\s*\(at\s+([-\d.eE+]+)\s+([-\d.eE+]+)(?:\s+([-\d.eE+]+))?'
+)
+_SIZE_RE = re.compile(r"\(size\s+([-\d.eE+]+)\s+([-\d.eE+]+)")
+_LAYERS_RE = re.compile(r"\(layers\s+([^()]*)\)")
+_GRAPHIC_RE = re.compile(r"\(fp_(line|rect|poly|circle|arc)\b")
+_CRTYD_RE = re.compile(r'\(layer\s+"?[FB]\.CrtYd"?\s*\)')
+_POINT_RE = re.compile(r"\((start|end|mid|center|xy)\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s*\)")
+
+
+@dataclass(frozen=True)
+class FootprintInfo:
+    """What later stages need from a .kicad_mod: pads and courtyard, in footprint mm (y down)."""
+
+    fpid: str
+    pads: Tuple[Tuple[str, float, float], ...]  # (number, x, y); mounting pads have number ""
+    courtyard: Optional[BBox]
+    # per pad, same order: (width, height, copper layers F_CU|B_CU), w/h turned with the pad
+    shapes: Tuple[Tuple[float, float, int], ...] = ()
+
+    @property
+    def pad_count(self) -> int:
+        # distinct numbered pads, i.e. what a symbol's pins map onto
+        return len({num for num, _, _ in self.pads if num})
+
+
+def footprint_dirs() -> List[Path]:
+    dirs: List[Path] = []
+    for var in FOOTPRINT_DIR_ENV:
+        for part in (os.getenv(var) or "").split(os.pathsep):
+            if part.strip():
+                dirs.append(Path(part.strip()).expanduser())
+    dirs.extend(Path(d).expanduser() for d in DEFAULT_FOOTPRINT_DIRS)
+    return [d for d in dirs if d.is_dir()]
+
+
+def find_footprint_library(lib: str) -> Optional[Path]:
+    for d in footprint_dirs():
+        pretty = d / f"{lib}.pretty"
+        if pretty.is_dir():
+            return pretty
+    return None
+
+
+# (lib, footprint dir variables) -> .pretty dir; searching the dirs costs far more than a lookup
+_LIBRARIES: Dict[Tuple[str, Tuple[Optional[str], ...]], Path] = {}
+
+
+def _library(lib: str) -> Optional[Tuple[Path, int]]:
+    # find_footprint_library and the dir's mtime; the dir is remembered while it exists, and a
+    # missing library is searched for again every time, so installing it is seen without a restart
+    where = (lib, tuple(os.getenv(var) for var in FOOTPRINT_DIR_ENV))
+    pretty = _LIBRARIES.get(where)
+    if pretty is not None:
+        try:
+            return pretty, os.stat(pretty).st_mtime_ns
+        except OSError:
+            del _LIBRARIES[where]
+    pretty = find_footprint_library(lib)
+    if pretty is None:
+        return None
+    _LIBRARIES[where] = pretty
+    return pretty, os.stat(pretty).st_mtime_ns
+
+
+def footprint_path(fpid: str) -> Optional[Path]:
+    """The .kicad_mod file for "Lib:Name", or None when it isn't installed."""
+    lib, _, name = fpid.partition(":")
+    found = _library(lib) if name else None
+    if found is None:
+        return None
+    path = found[0] / f"{name}.kicad_mod"
+    return path if path.is_file() else None
+
+
+def pad_shape(item: str, kind: str, rotation: float) -> Tuple[float, float, int]:
+    """Width, height (rotation applied) and copper layer mask of one pad's S-expression."""
+    size = _SIZE_RE.search(item)
+    w, h = (float(size.group(1)), float(size.group(2))) if size else (0.0, 0.0)
+    if rotation % 180:
+        # axis-aligned box around the turned pad
+        a = math.radians(rotation)
+        w, h = abs(w * math.cos(a)) + abs(h * math.sin(a)), abs(w * math.sin(a)) + abs(h * math.cos(a))
+    layers = _LAYERS_RE.search(item)
+    names = layers.group(1) if layers else ""
+    mask = (F_CU if ("F.Cu" in names or "*.Cu" in names) else 0) | (B_CU if ("B.Cu" in names or "*.Cu" in names) else 0)
+    if kind in ("thru_hole", "np_thru_hole"):
+        mask = F_CU | B_CU  # the hole goes through every layer either way
+    return round(w, 6), round(h, 6), mask
+
+
+def parse_footprint(text: str) -> Tuple[Tuple[Tuple[str, float, float], ...], Optional[BBox], Tuple[Tuple[float, float, int], ...]]:
+    """(pads, courtyard, pad shapes) of one .kicad_mod, in FootprintInfo's form."""
+    pads = []
+    shapes = []
+    for m in PAD_RE.finditer(text):
+        pads.append((m.group(1) if m.group(1) is not None else m.group(2), float(m.group(4)), float(m.group(5))))
+        item = text[m.start() : sexpr_end(text, m.start())]
+        shapes.append(pad_shape(item, m.group(3), float(m.group(6) or 0)))
+
+    xs: List[float] = []
+    ys: List[float] = []
+    for m in _GRAPHIC_RE.finditer(text):
+        item = text[m.start() : sexpr_end(text, m.start())]
+        if not _CRTYD_RE.search(item):
+            continue
+        pts = {}
+        for pm in _POINT_RE.finditer(item):
+            x, y = float(pm.group(2)), float(pm.group(3))
+            if m.group(1) == "circle":
+                pts[pm.group(1)] = (x, y)
+            else:
+                xs.append(x)
+                ys.append(y)
+        if "center" in pts and "end" in pts:
+            (cx, cy), (ex, ey) = pts["center"], pts["end"]
+            r = math.hypot(ex - cx, ey - cy)
+            xs += [cx - r, cx + r]
+            ys += [cy - r, cy + r]
+    courtyard = (min(xs), min(ys), max(xs), max(ys)) if xs else None
+    return tuple(pads), courtyard, tuple(shapes)
+
+
+def _name_hash(name: str) -> int:
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def _encode(name: str, size: int, mtime_ns: int, text: str) -> bytes:
+    pads, courtyard, shapes = parse_footprint(text)
+    raw_name = name.encode("utf-8")
+    parts = [
+        _REC_HEAD.pack(size, mtime_ns, len(raw_name)),
+        raw_name,
+        _REC_GEOM.pack(*(courtyard or (math.nan,) * 4), len(pads)),
+    ]
+    parts += [_PAD.pack(x, y, w, h, layers) for (_, x, y), (w, h, layers) in zip(pads, shapes)]
+    parts.append("\x1f".join(num for num, _, _ in pads).encode("utf-8"))
+    return b"".join(parts)
+
+
+def _decode(lib: str, rec: bytes) -> Tuple[str, int, int, FootprintInfo]:
+    size, mtime_ns, name_len = _REC_HEAD.unpack_from(rec, 0)
+    off = _REC_HEAD.size
+    name = rec[off : off + name_len].decode("utf-8")
+    off += name_len
+    x1, y1, x2, y2, npads = _REC_GEOM.unpack_from(rec, off)
+    off += _REC_GEOM.size
+    geom = [_PAD.unpack_from(rec, off + i * _PAD.size) for i in range(npads)]
+    off += npads * _PAD.size
+    nums = rec[off:].decode("utf-8").split("\x1f") if npads else []
+    courtyard = None if math.isnan(x1) else (x1, y1, x2, y2)
+    info = FootprintInfo(
+        f"{lib}:{name}",
+        tuple((n, g[0], g[1]) for n, g in zip(nums, geom)),
+        courtyard,
+        tuple((g[2], g[3], g[4]) for g in geom),
+    )
+    return name, size, mtime_ns, info
+
+
+def _records(mm: bytes) -> Iterable[bytes]:
+    magic, version, nslots = _HEADER.unpack_from(mm, 0)
+    for i in range(nslots):
+        h, off, length = _SLOT.unpack_from(mm, _HEADER.size + i * _SLOT.size)
+        if h:
+            yield bytes(mm[off : off + length])
+
+
+def _pack(records: Dict[str, bytes]) -> bytes:
+    nslots = 8
+    while nslots < 2 * len(records):
+        nslots *= 2
+    slots = [(0, 0, 0)] * nslots
+    offset = _HEADER.size + nslots * _SLOT.size
+    blob = bytearray()
+    for name in sorted(records):
+        rec = records[name]
+        h = _name_hash(name)
+        i = h & (nslots - 1)
+        while slots[i][0]:
+            i = (i + 1) & (nslots - 1)
+        slots[i] = (h, offset + len(blob), len(rec))
+        blob += rec
+    return _HEADER.pack(_MAGIC, INDEX_VERSION, nslots) + b"".join(_SLOT.pack(*s) for s in slots) + bytes(blob)
+
+
+def footprint_index_dir() -> Path:
+    env = os.getenv("PCBGEN_FOOTPRINT_INDEX_DIR")
+    return Path(env).expanduser() if env else default_cache_dir() / "footprints"
+
+
+def _index_path(pretty: Path) -> Path:
+    digest = hashlib.sha256(str(pretty.resolve()).encode("utf-8")).hexdigest()[:24]
+    return footprint_index_dir() / f"{pretty.stem}-{digest}.idx"
+
+
+def _read_index(path: Path) -> Optional[bytes]:
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size or _HEADER.unpack_from(data, 0)[:2] != (_MAGIC, INDEX_VERSION):
+        return None
+    return data
+
+
+def ensure_footprint_index(pretty: Path) -> Path:
+    """
+    Index file for one .pretty library, updated incrementally: only .kicad_mod files
+    whose size or mtime changed (or that are new) are parsed; removed ones are dropped.
+    Nothing is written when the library is unchanged.
+    """
+    pretty = Path(pretty)
+    dest = _index_path(pretty)
+    current = {}
+    with os.scandir(pretty) as it:
+        for entry in it:
+            if entry.name.endswith(".kicad_mod") and entry.is_file():
+                st = entry.stat()
+                current[entry.name[: -len(".kicad_mod")]] = (st.st_size, st.st_mtime_ns)
+
+    records: Dict[str, bytes] = {}
+    old = _read_index(dest)
+    if old is not None:
+        for rec in _records(old):
+            name, size, mtime_ns, _ = _decode(pretty.stem, rec)
+            if current.get(name) == (size, mtime_ns):
+                records[name] = rec
+        if len(records) == len(current) and sum(1 for _ in _records(old)) == len(current):
+            return dest
+
+    for name, (size, mtime_ns) in current.items():
+        if name not in records:
+            text = (pretty / f"{name}.kicad_mod").read_text(encoding="utf-8")
+            records[name] = _encode(name, size, mtime_ns, text)
+    write_atomic(dest, _pack(records))
+    return dest
+
+
+class FootprintIndex:
+    """
+    Read-only view of one library's index; a lookup is a hash probe in the mmap'd table.
+    Decoded records are kept for the life of the view, which open_footprint_index
+    replaces once the library changes.
+    """
+
+    def __init__(self, pretty: Path, path: Path) -> None:
+        self.pretty = Path(pretty)
+        self.lib = self.pretty.stem
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._nslots = _HEADER.unpack_from(self._mm, 0)[2]
+        self._memo: Dict[str, Optional[Tuple[str, int, int, FootprintInfo]]] = {}
+
+    def _record(self, name: str) -> Optional[Tuple[str, int, int, FootprintInfo]]:
+        if name in self._memo:
+            return self._memo[name]
+        h = _name_hash(name)
+        mask = self._nslots - 1
+        i = h & mask
+        while True:
+            slot_h, off, length = _SLOT.unpack_from(self._mm, _HEADER.size + i * _SLOT.size)
+            if slot_h == 0:
+                rec = None
+                break
+            if slot_h == h:
+                rec = _decode(self.lib, self._mm[off : off + length])
+                if rec[0] == name:
+                    break
+            i = (i + 1) & mask
+        self._memo[name] = rec
+        return rec
+
+    def get(self, name: str) -> Optional[FootprintInfo]:
+        rec = self._record(name)
+        return rec[3] if rec is not None else None
+
+    def current(self, name: str) -> bool:
+        """Whether the entry for `name` (or its absence) still matches the .kicad_mod on disk."""
+        rec = self._record(name)
+        try:
+            st = os.stat(self.pretty / f"{name}.kicad_mod")
+        except OSError:
+            return rec is None
+        return rec is not None and (rec[1], rec[2]) == (st.st_size, st.st_mtime_ns)
+
+    def names(self) -> List[str]:
+        return sorted(_decode(self.lib, rec)[0] for rec in _records(self._mm))
+
+
+_OPEN: Dict[Path, Tuple[int, FootprintIndex]] = {}
+_OPEN_MAX = 256
+
+
+def open_footprint_index(lib: str, rescan: bool = False) -> Optional[FootprintIndex]:
+    """
+    The open index of one library, kept per process; None if the library isn't installed.
+    Each call stats the .pretty dir, and a changed mtime (a footprint added, removed or
+    saved by rename) goes back through ensure_footprint_index, as does `rescan`.
+    footprint_info catches footprints edited in place, which leave the dir's mtime alone.
+    """
+    found = _library(lib)
+    if found is None:
+        return None
+    pretty, mtime_ns = found
+    hit = _OPEN.get(pretty)
+    if hit is not None and hit[0] == mtime_ns and not rescan:
+        return hit[1]
+    index = FootprintIndex(pretty, ensure_footprint_index(pretty))
+    if hit is None and len(_OPEN) >= _OPEN_MAX:
+        del _OPEN[next(iter(_OPEN))]
+    _OPEN[pretty] = (mtime_ns, index)
+    return index
+
+
+def footprint_info(fpid: str) -> Optional[FootprintInfo]:
+    """Pads and courtyard for "Lib:Name" as the library has it now, or None when the library or footprint doesn't exist."""
+    lib, _, name = fpid.partition(":")
+    if not name:
+        return None
+    index = open_footprint_index(lib)
+    if index is not None and not index.current(name):
+        index = open_footprint_index(lib, rescan=True)
+    return index.get(name) if index is not None else None
+
+
+def missing_footprints(design: SchematicDesign) -> Dict[str, List[str]]:
+    """Footprint ids the installed libraries don't have -> the refs using them; those get a stub without pads."""
+    missing: Dict[str, List[str]] = {}
+    for c in design.components:
+        if c.footprint and footprint_info(c.footprint) is None:
+            missing.setdefault(c.footprint, []).append(c.ref)
+    return missing
+
+
+def design_footprint_problems(design: SchematicDesign) -> List[str]:
+    """
+    One line per component whose footprint doesn't resolve, or has fewer pads than
+    the symbol has pins. Components without a footprint are left alone.
+    """
+    from pcbgen.symbols import symbol_geometry
+
+    problems: List[str] = []
+    for c in design.components:
+        if not c.footprint:
+            continue
+        info = footprint_info(c.footprint)
+        if info is None:
+            problems.append(f"{c.ref}: footprint {c.footprint!r} not found")
+            continue
+        try:
+            pins = len(symbol_geometry(c.lib_id).pins)
+        except KeyError:
+            continue
+        if info.pad_count < pins:
+            problems.append(f"{c.ref}: footprint {c.footprint!r} has {info.pad_count} pads for {pins} pins of {c.lib_id}")
+    return problems
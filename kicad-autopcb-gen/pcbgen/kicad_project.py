@@ -1,14 +1,101 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import importlib
 import json
+import zlib
 
+from pcbgen.cache import DiskCache, canonical_digest
+from pcbgen.design import BACKENDS, DEFAULT_BACKEND, SchematicDesign, schematic_text
 from pcbgen.spec import ProjectSpec
-from pcbgen.templates_i2c import build_i2c_schematic
-from pcbgen.templates_esp32dev import build_esp32dev_schematic
-from pcbgen.templates_buck import build_buck_schematic
+from pcbgen.trace import timed
 
+# Bump GENERATOR_VERSION when shared output (.kicad_pro, tables, board writer) changes,
+# and a TEMPLATE_VERSIONS entry when that board's schematic output changes;
+# either one invalidates cached projects.
+GENERATOR_VERSION = 5
+TEMPLATE_VERSIONS: Dict[str, int] = {
+    "i2c_breakout": 2,
+    "esp32_devboard": 2,
+    "buck_module": 2,
+}
 
+# board type -> (module, builder); modules are imported on first use so a run
+# only loads the template (and kicad_sch_api) it actually needs.
+_TEMPLATES: Dict[str, Tuple[str, str]] = {
+    "i2c_breakout": ("pcbgen.templates_i2c", "build_i2c_schematic"),
+    "esp32_devboard": ("pcbgen.templates_esp32dev", "build_esp32dev_schematic"),
+    "buck_module": ("pcbgen.templates_buck", "build_buck_schematic"),
+}
+
+# board type -> (module, function) returning the backend-neutral SchematicDesign
+_DESIGNS: Dict[str, Tuple[str, str]] = {
+    "i2c_breakout": ("pcbgen.templates_i2c", "i2c_design"),
+    "esp32_devboard": ("pcbgen.templates_esp32dev", "esp32dev_design"),
+    "buck_module": ("pcbgen.templates_buck", "buck_design"),
+}
+
+MANIFEST_NAME = ".pcbgen-manifest.json"
+
+
+def template_builder(board_type: str) -> Callable[..., None]:
+    try:
+        module_name, func_name = _TEMPLATES[board_type]
+    except KeyError:
+        raise ValueError(f"Unknown board type: {board_type}") from None
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def template_design(spec: ProjectSpec) -> SchematicDesign:
+    """The design a template would save for this spec, without writing anything."""
+    try:
+        module_name, func_name = _DESIGNS[spec.type]
+    except KeyError:
+        raise ValueError(f"Unknown board type: {spec.type}") from None
+    return getattr(importlib.import_module(module_name), func_name)(spec)
+
+
+# Symbols the stock templates place; loading them once keeps a long-lived
+# process from re-reading the .kicad_sym libraries on every request.
+WARM_SYMBOLS = (
+    "Device:C",
+    "Device:R",
+    "Connector_Generic:Conn_01x04",
+    "Connector_Generic:Conn_01x05",
+    "Connector_Generic:Conn_01x15",
+)
+
+
+def warm_up(backend: str = DEFAULT_BACKEND) -> None:
+    """Import every template, the board writer and the backend's writer and pull the common symbols into its cache."""
+    for board_type in _TEMPLATES:
+        template_builder(board_type)
+    importlib.import_module("pcbgen.pcb_writer")
+
+    if backend == "stream":
+        from pcbgen.sch_writer import lib_symbol
+
+        for lib_id in WARM_SYMBOLS:
+            try:
+                lib_symbol(lib_id)
+            except ValueError:
+                pass
+        return
+
+    import kicad_sch_api as ksa
+
+    cache = ksa.get_symbol_cache()
+    for lib_id in WARM_SYMBOLS:
+        try:
+            cache.get_symbol(lib_id)
+        except Exception:
+            # a missing library only matters once a template asks for it
+            pass
+
+
+@timed("project.write_text")
 def _write_text(path: Path, content: str) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(content, encoding="utf-8")
@@ -40,57 +127,250 @@ def _fp_lib_table_default() -> str:
     return '(fp_lib_table\n)\n'
 
 
-def _starter_pcb(project_name: str) -> str:
-    return """(kicad_pcb (version 20231120) (generator "pcbgen")
-  (general (thickness 1.6))
-  (paper "A4")
-  (layers
-    (0 "F.Cu" signal)
-    (31 "B.Cu" signal)
-    (36 "B.SilkS" user)
-    (37 "F.SilkS" user)
-    (38 "B.Mask" user)
-    (39 "F.Mask" user)
-    (40 "Dwgs.User" user)
-    (44 "Edge.Cuts" user)
-    (46 "B.CrtYd" user)
-    (47 "F.CrtYd" user)
-    (48 "B.Fab" user)
-    (49 "F.Fab" user)
-  )
-  (setup
-    (pcbplotparams
-      (layerselection 0x00010fc_ffffffff)
-      (usegerberattributes true)
-      (usegerberadvancedattributes true)
-      (creategerberjobfile true)
-      (outputdirectory "")
+def project_cache_key(spec: ProjectSpec, backend: str = DEFAULT_BACKEND, route: bool = False) -> str:
+    return canonical_digest(
+        {
+            "generator": GENERATOR_VERSION,
+            "template": TEMPLATE_VERSIONS.get(spec.type),
+            "backend": backend,
+            "route": route,
+            # the model's digest: defaults applied, so equivalent specs share a key
+            "spec": spec.key,
+        }
     )
-  )
-  (gr_rect (start 0 0) (end 60 40)
-    (stroke (width 0.15) (type solid))
-    (fill none)
-    (layer "Edge.Cuts")
-  )
-)
-"""
 
 
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_manifest(out_dir: Path) -> Optional[dict]:
+    try:
+        return json.loads((out_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _outputs_match(out_dir: Path, manifest: dict, key: str) -> bool:
+    # Only trust the manifest if every file is still byte-identical to what we wrote;
+    # anything edited by hand gets regenerated, same as without the cache.
+    if manifest.get("key") != key or not manifest.get("files"):
+        return False
+    for rel, digest in manifest["files"].items():
+        try:
+            if _sha256((out_dir / rel).read_bytes()) != digest:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+@timed("project.manifest")
+def _write_manifest(out_dir: Path, key: str, files: Dict[str, bytes], elements: Optional[Dict[str, str]] = None) -> None:
+    # elements: SchematicDesign.digests() of what was generated, so --update can tell what the spec changed
+    manifest = {"key": key, "files": {rel: _sha256(data) for rel, data in files.items()}}
+    if elements is not None:
+        manifest["elements"] = elements
+    _write_text(out_dir / MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def _static_files(name: str) -> Dict[str, bytes]:
+    return {
+        f"{name}.kicad_pro": _kicad_pro_minimal(name).encode("utf-8"),
+        "sym-lib-table": _sym_lib_table_default().encode("utf-8"),
+        "fp-lib-table": _fp_lib_table_default().encode("utf-8"),
+    }
+
+
+@timed("project.files")
+def write_project_files(
+    out_dir: Path,
+    spec: ProjectSpec,
+    files: Optional[Dict[str, bytes]] = None,
+    key: Optional[str] = None,
+    elements: Optional[Dict[str, str]] = None,
+) -> Dict[str, bytes]:
+    """
+    Write the project's static files (.kicad_pro, library tables) and `files` (e.g. a
+    schematic and board built in memory) into out_dir. With `key`, the manifest follows,
+    over every project file (the ones not given are read back from out_dir); elements
+    are the design's digests, for --update. Returns the project's files.
+    """
+    written = _static_files(spec.name)
+    written.update(files or {})
+    for rel, data in written.items():
+        path = out_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    if key is None:
+        return written
+    project = {rel: written[rel] if rel in written else (out_dir / rel).read_bytes() for rel in _project_files(spec.name)}
+    _write_manifest(out_dir, key, project, elements)
+    return project
+
 
-def generate_project(spec: ProjectSpec, out_dir: Path) -> None:
+def _build_project(
+    spec: ProjectSpec, out_dir: Path, backend: str = DEFAULT_BACKEND, route: bool = False, route_workers: int = 1
+) -> SchematicDesign:
+    # resolve first: an unknown type or backend should fail before anything is written
+    build_schematic = template_builder(spec.type)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown schematic backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+    name = spec.name
     out_dir.mkdir(parents=True, exist_ok=True)
+    design = build_schematic(spec, out_dir / f"{name}.kicad_sch", backend)
+
+    # numpy and the footprint index only load once a board is actually built
+    from pcbgen.pcb_writer import save_board
+
+    save_board(design, out_dir / f"{name}.kicad_pcb", route=route, route_workers=route_workers)
+    return design
 
+
+def _update_project(
+    spec: ProjectSpec, out_dir: Path, manifest: Optional[dict], route: bool = False, route_workers: int = 1
+) -> SchematicDesign:
+    # Patch the schematic in place. The .kicad_pro and board are KiCad's to edit once they
+    # exist (Update PCB from Schematic pulls the changes in), so only missing ones are written.
+    from pcbgen.sch_update import update_schematic
+
+    design = template_design(spec)
     name = spec.name
-    _write_text(out_dir / f"{name}.kicad_pro", _kicad_pro_minimal(name))
-    _write_text(out_dir / "sym-lib-table", _sym_lib_table_default())
-    _write_text(out_dir / "fp-lib-table", _fp_lib_table_default())
-    _write_text(out_dir / f"{name}.kicad_pcb", _starter_pcb(name))
-
-    if spec.type == "i2c_breakout":
-        build_i2c_schematic(spec, out_dir / f"{name}.kicad_sch")
-    elif spec.type == "esp32_devboard":
-        build_esp32dev_schematic(spec, out_dir / f"{name}.kicad_sch")
-    elif spec.type == "buck_module":
-        build_buck_schematic(spec, out_dir / f"{name}.kicad_sch")
-    else:
-        raise ValueError(f"Unknown board type: {spec.type}")
+    for rel, data in _static_files(name).items():
+        if not (out_dir / rel).exists():
+            (out_dir / rel).write_bytes(data)
+    update_schematic(design, out_dir / f"{name}.kicad_sch", (manifest or {}).get("elements"))
+    if not (out_dir / f"{name}.kicad_pcb").exists():
+        from pcbgen.pcb_writer import save_board
+
+        save_board(design, out_dir / f"{name}.kicad_pcb", route=route, route_workers=route_workers)
+    return design
+
+
+def _has_stubs(design: SchematicDesign) -> bool:
+    # A board with stub footprints (libraries missing) is not cached and gets no manifest:
+    # the key doesn't cover the libraries, so it would be served again once they're installed.
+    from pcbgen.footprint_index import missing_footprints
+
+    return bool(missing_footprints(design))
+
+
+def _project_files(name: str) -> List[str]:
+    return [f"{name}.kicad_pro", "sym-lib-table", "fp-lib-table", f"{name}.kicad_pcb", f"{name}.kicad_sch"]
+
+
+def _cached_files(cache: DiskCache, key: str) -> Optional[Dict[str, bytes]]:
+    blob = cache.get(key)
+    if blob is None:
+        return None
+    try:
+        bundle: Dict[str, str] = json.loads(zlib.decompress(blob))
+    except (zlib.error, ValueError):
+        cache.delete(key)
+        return None
+    return {rel: text.encode("utf-8") for rel, text in bundle.items()}
+
+
+def _store_files(cache: DiskCache, key: str, files: Dict[str, bytes]) -> None:
+    bundle = {rel: data.decode("utf-8") for rel, data in files.items()}
+    cache.put(key, zlib.compress(json.dumps(bundle).encode("utf-8"), 1))
+
+
+@timed("project")
+def project_files(
+    spec: ProjectSpec,
+    cache: Optional[DiskCache] = None,
+    backend: str = DEFAULT_BACKEND,
+    route: bool = False,
+    route_workers: int = 1,
+) -> Tuple[str, Dict[str, bytes]]:
+    """
+    The whole project as {file name: bytes}, built in memory (archive output: nothing
+    is written to disk). Returns ("cache", files) when the shared cache had it, else
+    ("built", files), which are then stored in the cache (unless footprints were stubbed).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown schematic backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    key = project_cache_key(spec, backend, route)
+    if cache is not None:
+        files = _cached_files(cache, key)
+        if files is not None:
+            return "cache", files
+
+    from pcbgen.pcb_writer import board_text
+
+    design = template_design(spec)
+    name = spec.name
+    files = _static_files(name)
+    files[f"{name}.kicad_sch"] = schematic_text(design, backend).encode("utf-8")
+    files[f"{name}.kicad_pcb"] = board_text(design, route=route, route_workers=route_workers).encode("utf-8")
+    if cache is not None and not _has_stubs(design):
+        _store_files(cache, key, files)
+    return "built", files
+
+
+@timed("project")
+def generate_project(
+    spec: ProjectSpec,
+    out_dir: Path,
+    use_cache: bool = True,
+    cache: Optional[DiskCache] = None,
+    backend: str = DEFAULT_BACKEND,
+    route: bool = False,
+    route_workers: int = 1,
+    update: bool = False,
+) -> str:
+    """
+    Write the project into out_dir; backend picks the schematic writer (design.BACKENDS),
+    route adds tracks and vias to the board (route_workers processes; same result).
+    With update, an existing schematic is patched instead of rewritten (sch_update), and
+    an existing .kicad_pro and board are left alone.
+    Returns how it was produced:
+      "unchanged" - out_dir already holds this exact spec's output (manifest hit)
+      "cache"     - restored from the shared cache, no template was run
+      "built"     - templates ran (and the result was stored in the cache)
+      "updated"   - the existing schematic was patched (never cached: it holds hand edits)
+    A board that needed stub footprints (pcb_placer warns about each) is neither cached
+    nor recorded in the manifest, so the next run builds it again.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    update = update and (out_dir / f"{spec.name}.kicad_sch").exists()
+    if not use_cache:
+        if update:
+            _update_project(spec, out_dir, None, route, route_workers)
+            return "updated"
+        _build_project(spec, out_dir, backend, route, route_workers)
+        write_project_files(out_dir, spec)
+        return "built"
+
+    key = project_cache_key(spec, backend, route)
+    manifest = _read_manifest(out_dir)
+    if manifest is not None and _outputs_match(out_dir, manifest, key):
+        return "unchanged"
+
+    # Drop the old manifest first so a half-written project never looks valid.
+    (out_dir / MANIFEST_NAME).unlink(missing_ok=True)
+
+    if update:
+        board_existed = (out_dir / f"{spec.name}.kicad_pcb").exists()
+        design = _update_project(spec, out_dir, manifest, route, route_workers)
+        if board_existed or not _has_stubs(design):
+            files = {rel: (out_dir / rel).read_bytes() for rel in _project_files(spec.name)}
+            _write_manifest(out_dir, key, files, design.digests())
+        return "updated"
+
+    if cache is not None:
+        files = _cached_files(cache, key)
+        if files is not None:
+            write_project_files(out_dir, spec, files, key)
+            return "cache"
+
+    design = _build_project(spec, out_dir, backend, route, route_workers)
+    if _has_stubs(design):
+        write_project_files(out_dir, spec)
+        return "built"
+    files = write_project_files(out_dir, spec, key=key, elements=design.digests())
+    if cache is not None:
+        _store_files(cache, key, files)
+    return "built"
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from pcbgen.design import SchematicDesign
+from pcbgen.symbols import rotate, symbol_geometry
+from pcbgen.trace import timed
+
+Point = Tuple[float, float]
+PinRef = Tuple[int, str]  # (component index, pin number)
+
+SNAP = 0.01  # points closer than this (mm) are the same point
+_BUCKET = 5.08  # spatial-hash cell used to find wires passing through a point
+
+
+def _pin_order(m: PinRef) -> Tuple[int, int, str]:
+    return m[0], len(m[1]), m[1]  # pin "2" before "10"
+
+
+class DisjointSet:
+    """Union-find over 0..n-1 with union by size and path halving."""
+
+    __slots__ = ("parent", "size")
+
+    def __init__(self) -> None:
+        self.parent: List[int] = []
+        self.size: List[int] = []
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> int:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+
+@dataclass
+class Netlist:
+    """
+    Nets of one schematic, stored flat: net i's pins are members[starts[i]:starts[i + 1]],
+    ordered by component then pin. Net names come from labels; a net without one is
+    called Net-(<ref>-Pad<pin>) after its first pin, as KiCad does.
+    """
+
+    refs: List[str]  # component index -> reference
+    names: List[str] = field(default_factory=list)
+    starts: List[int] = field(default_factory=lambda: [0])
+    members: List[PinRef] = field(default_factory=list)
+    # label names that ended up on one net (a short between differently named nets)
+    merged: List[Tuple[str, ...]] = field(default_factory=list)
+    _index: Optional[Dict[PinRef, int]] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def pins(self, net: int) -> List[PinRef]:
+        return self.members[self.starts[net] : self.starts[net + 1]]
+
+    def net_of(self, component: int, pin: str) -> Optional[int]:
+        if self._index is None:
+            self._index = {m: i for i in range(len(self.names)) for m in self.pins(i)}
+        return self._index.get((component, pin))
+
+    def by_name(self) -> Dict[str, List[Tuple[str, str]]]:
+        """net name -> [(ref, pin)], the shape a report or a test wants."""
+        return {name: [(self.refs[c], p) for c, p in self.pins(i)] for i, name in enumerate(self.names)}
+
+
+def _key(p: Point) -> Tuple[int, int]:
+    return round(p[0] / SNAP), round(p[1] / SNAP)
+
+
+def _on_segment(p: Point, a: Point, b: Point) -> bool:
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    if not (min(ax, bx) - SNAP <= px <= max(ax, bx) + SNAP and min(ay, by) - SNAP <= py <= max(ay, by) + SNAP):
+        return False
+    cross = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+    length = abs(bx - ax) + abs(by - ay)
+    return abs(cross) <= SNAP * max(length, SNAP)
+
+
+@timed("board.netlist")
+def build_netlist(design: SchematicDesign) -> Netlist:
+    """
+    Connectivity of the sheet: pin ends, wire ends and labels at the same point are
+    joined, a point lying on a wire joins that wire, and labels with the same text
+    are one net (they are local labels on a single sheet). Coincident points are found
+    through a hash of snapped coordinates and wires through a coarse bucket grid, so
+    the whole pass is near-linear in pins + wires + labels.
+    """
+    ds = DisjointSet()
+    nodes: Dict[Tuple[int, int], int] = {}
+    points: List[Point] = []
+
+    def node(p: Point) -> int:
+        k = _key(p)
+        n = nodes.get(k)
+        if n is None:
+            n = nodes[k] = ds.add()
+            points.append(p)
+        return n
+
+    pin_nodes: List[Tuple[int, str, int]] = []
+    for ci, c in enumerate(design.components):
+        try:
+            geo = symbol_geometry(c.lib_id)
+        except KeyError:
+            continue  # no pin geometry: the part stays off every net
+        for pin, (px, py) in geo.pins.items():
+            dx, dy = rotate(px, py, c.rotation)
+            pin_nodes.append((ci, pin, node((c.position[0] + dx, c.position[1] + dy))))
+
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    wires: List[Tuple[Point, Point, int]] = []
+    for w in design.wires:
+        a, b = node(w.start), node(w.end)
+        ds.union(a, b)
+        wires.append((w.start, w.end, a))
+        x0, x1 = sorted((w.start[0], w.end[0]))
+        y0, y1 = sorted((w.start[1], w.end[1]))
+        for bx in range(int(x0 // _BUCKET), int(x1 // _BUCKET) + 1):
+            for by in range(int(y0 // _BUCKET), int(y1 // _BUCKET) + 1):
+                buckets.setdefault((bx, by), []).append(len(wires) - 1)
+
+    label_node: Dict[str, int] = {}
+    for lb in design.labels:
+        n = node(lb.position)
+        label_node[lb.text] = ds.union(label_node.get(lb.text, n), n)
+
+    # points in the middle of a wire (T junctions, labels dropped onto a wire)
+    if wires:
+        for n, p in enumerate(points):
+            for wi in buckets.get((int(p[0] // _BUCKET), int(p[1] // _BUCKET)), ()):
+                a, b, wn = wires[wi]
+                if _on_segment(p, a, b):
+                    ds.union(n, wn)
+
+    labels_at: Dict[int, List[str]] = {}
+    for text, n in label_node.items():
+        labels_at.setdefault(ds.find(n), []).append(text)
+
+    pins_at: Dict[int, List[PinRef]] = {}
+    for ci, pin, n in pin_nodes:
+        pins_at.setdefault(ds.find(n), []).append((ci, pin))
+
+    refs = [c.ref for c in design.components]
+    named: List[Tuple[str, List[PinRef]]] = []
+    merged: List[Tuple[str, ...]] = []
+    for root, pins in pins_at.items():
+        texts = sorted(labels_at.get(root, ()))
+        if len(texts) > 1:
+            merged.append(tuple(texts))
+        if texts:
+            named.append((texts[0], pins))
+        elif len(pins) > 1:
+            first = min(pins, key=_pin_order)
+            named.append((f"Net-({refs[first[0]]}-Pad{first[1]})", pins))
+
+    out = Netlist(refs, merged=sorted(merged))
+    for name, pins in sorted(named, key=lambda item: item[0]):
+        out.names.append(name)
+        out.members.extend(sorted(pins, key=_pin_order))
+        out.starts.append(len(out.members))
+    return out
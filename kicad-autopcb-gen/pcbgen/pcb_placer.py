@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pcbgen.design import SchematicDesign
+from pcbgen.footprint_index import FootprintInfo, footprint_info
+from pcbgen.netlist import Netlist, build_netlist
+from pcbgen.symbols import BBox
+from pcbgen.trace import timed
+
+log = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+
+PLACE_GRID = 0.25  # footprint origins and the board outline land on this grid (mm)
+BOARD_MARGIN = 1.0  # board edge to the nearest courtyard
+EMPTY_BOARD = (60.0, 40.0)
+TARGET_DENSITY = 0.5  # courtyard area / board area the starting positions are spread over
+ITERATIONS = 250
+PAIR_REFRESH = 10  # optimiser steps between neighbour-list rebuilds
+
+# courtyard for a footprint the libraries don't have, so it still gets a spot on the board
+FALLBACK_COURTYARD: BBox = (-1.5, -1.5, 1.5, 1.5)
+
+
+@dataclass
+class PlacedFootprint:
+    ref: str
+    value: str
+    fpid: str
+    info: Optional[FootprintInfo]  # None when the footprint isn't in the installed libraries
+    position: Point = (0.0, 0.0)  # board mm, y down; rotation is always 0
+
+    @property
+    def courtyard(self) -> BBox:
+        if self.info is not None and self.info.courtyard is not None:
+            return self.info.courtyard
+        return FALLBACK_COURTYARD
+
+    def pad_xy(self, number: str) -> Point:
+        if self.info is not None:
+            for num, x, y in self.info.pads:
+                if num == number:
+                    return x, y
+        c = self.courtyard
+        return (c[0] + c[2]) / 2, (c[1] + c[3]) / 2
+
+
+@dataclass
+class BoardLayout:
+    footprints: List[PlacedFootprint]
+    netlist: Netlist  # component indices are footprint indices, pin numbers pad numbers
+    outline: BBox
+    wirelength: float  # half-perimeter wirelength over all nets, mm
+    name: str = ""  # the design's; the board's uuids are derived from it
+
+
+def _pin_arrays(parts: List[PlacedFootprint], netlist: Netlist):
+    # flat pin arrays for the multi-part nets: owning part, pad offset, net index, net weight
+    part, dx, dy, net, weight = [], [], [], [], []
+    for i in range(len(netlist)):
+        members = netlist.pins(i)
+        if len({i for i, _ in members}) < 2:
+            continue
+        k = len(weight)
+        for i, pin in members:
+            x, y = parts[i].pad_xy(pin)
+            part.append(i)
+            dx.append(x)
+            dy.append(y)
+            net.append(k)
+        weight.append(1.0 / (len(members) - 1))
+    return (
+        np.asarray(part, dtype=np.intp),
+        np.asarray(dx, dtype=np.float64),
+        np.asarray(dy, dtype=np.float64),
+        np.asarray(net, dtype=np.intp),
+        np.asarray(weight, dtype=np.float64),
+    )
+
+
+def wirelength(x: np.ndarray, y: np.ndarray, pins) -> float:
+    """Half-perimeter wirelength of every net for part origins (x, y)."""
+    part, dx, dy, net, weight = pins
+    if not len(weight):
+        return 0.0
+    order = np.argsort(net, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(net[order]) != 0])
+    total = 0.0
+    for coord in (x[part] + dx, y[part] + dy):
+        c = coord[order]
+        total += float((np.maximum.reduceat(c, starts) - np.minimum.reduceat(c, starts)).sum())
+    return total
+
+
+def _near_pairs(x: np.ndarray, y: np.ndarray, hw: np.ndarray, hh: np.ndarray, reach: float) -> Tuple[np.ndarray, np.ndarray]:
+    # (i, j), i < j, of every pair whose courtyards are within `reach` of touching
+    i, j = np.triu_indices(len(x), 1)
+    near = (np.abs(x[i] - x[j]) < hw[i] + hw[j] + reach) & (np.abs(y[i] - y[j]) < hh[i] + hh[j] + reach)
+    return i[near], j[near]
+
+
+def _global_place(x: np.ndarray, y: np.ndarray, hw: np.ndarray, hh: np.ndarray, pins, iters: int) -> None:
+    """
+    Gradient descent on quadratic wirelength (each pin pulled to its net's centroid,
+    nets weighted 1/(k-1)) plus a pairwise courtyard-overlap area penalty whose weight
+    ramps up, so parts first cluster by connectivity and are then pushed apart.
+    Overlaps are only evaluated for neighbour pairs, refreshed every PAIR_REFRESH steps.
+    Centres (x, y) are updated in place.
+    """
+    n = len(x)
+    part, dx, dy, net, weight = pins
+    nnets = len(weight)
+    counts = np.maximum(np.bincount(net, minlength=nnets), 1) if nnets else None
+    pin_w = weight[net] if nnets else None
+    degree = np.bincount(part, pin_w, minlength=n) if nnets else np.zeros(n)
+    size = np.maximum(hw, hh)
+    reach = 2.0 * float(size.max())
+
+    for it in range(iters):
+        gx = np.zeros(n)
+        gy = np.zeros(n)
+        if nnets:
+            px = x[part] + dx
+            py = y[part] + dy
+            cx = np.bincount(net, px, nnets) / counts
+            cy = np.bincount(net, py, nnets) / counts
+            gx += np.bincount(part, (px - cx[net]) * pin_w, n)
+            gy += np.bincount(part, (py - cy[net]) * pin_w, n)
+
+        if it % PAIR_REFRESH == 0:
+            pi, pj = _near_pairs(x, y, hw, hh, reach)
+        ddx = x[pi] - x[pj]
+        ddy = y[pi] - y[pj]
+        ox = hw[pi] + hw[pj] - np.abs(ddx)
+        oy = hh[pi] + hh[pj] - np.abs(ddy)
+        hit = (ox > 0) & (oy > 0)
+        # d(overlap area)/dx_i = -sign(dx) * oy, and the opposite for j
+        fx = np.where(hit, np.sign(ddx) * oy, 0.0)
+        fy = np.where(hit, np.sign(ddy) * ox, 0.0)
+        ovx = np.bincount(pj, fx, n) - np.bincount(pi, fx, n)
+        ovy = np.bincount(pj, fy, n) - np.bincount(pi, fy, n)
+        touching = np.bincount(pi, hit, n) + np.bincount(pj, hit, n)
+
+        lam = 0.05 * 400.0 ** (it / max(iters - 1, 1))
+        # per-part step ~ inverse curvature, capped so nothing jumps past a neighbour
+        step = 0.5 / (degree + lam * (1.0 + touching) + 1e-9)
+        x += np.clip(-step * (gx + lam * ovx), -size, size)
+        y += np.clip(-step * (gy + lam * ovy), -size, size)
+
+
+def _legalize(x: np.ndarray, y: np.ndarray, court: np.ndarray, grid: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Snap every origin to the grid without any two courtyards overlapping. Parts go
+    biggest first; each takes the free spot nearest its global position, found with
+    a summed-area table over an occupancy grid around the target. Returns grid
+    (column, row) of each origin.
+    """
+    n = len(x)
+    lo_c = np.floor(court[:, 0] / grid + 1e-9).astype(np.intp)
+    lo_r = np.floor(court[:, 1] / grid + 1e-9).astype(np.intp)
+    w = np.maximum(np.ceil(court[:, 2] / grid - 1e-9).astype(np.intp) - lo_c, 1)
+    h = np.maximum(np.ceil(court[:, 3] / grid - 1e-9).astype(np.intp) - lo_r, 1)
+
+    # target cell of each courtyard's top-left corner
+    tc = np.rint(x / grid).astype(np.intp) + lo_c
+    tr = np.rint(y / grid).astype(np.intp) + lo_r
+    slack = int(np.sqrt((w * h).sum())) + int(max(w.max(), h.max()))
+    c0, r0 = int(tc.min()) - slack, int(tr.min()) - slack
+    occ = np.zeros((int(tr.max() + h.max()) - r0 + slack, int(tc.max() + w.max()) - c0 + slack), dtype=bool)
+
+    col = np.zeros(n, dtype=np.intp)
+    row = np.zeros(n, dtype=np.intp)
+    for i in np.argsort(-(w * h), kind="stable"):
+        wi, hi = int(w[i]), int(h[i])
+        radius = 4 + max(wi, hi)
+        while True:
+            rows, cols = occ.shape
+            ti, tj = int(tr[i]) - r0, int(tc[i]) - c0
+            a0, a1 = max(0, ti - radius), min(rows - hi, ti + radius)
+            b0, b1 = max(0, tj - radius), min(cols - wi, tj + radius)
+            if a0 <= a1 and b0 <= b1:
+                sub = occ[a0 : a1 + hi, b0 : b1 + wi]
+                sat = np.zeros((sub.shape[0] + 1, sub.shape[1] + 1), dtype=np.int32)
+                np.cumsum(np.cumsum(sub, 0, dtype=np.int32), 1, out=sat[1:, 1:])
+                used = sat[hi:, wi:] - sat[:-hi, wi:] - sat[hi:, :-wi] + sat[:-hi, :-wi]
+                if not used.all():
+                    ii = np.arange(a0, a1 + 1)[:, None] - ti
+                    jj = np.arange(b0, b1 + 1)[None, :] - tj
+                    dist = np.where(used == 0, ii * ii + jj * jj, np.iinfo(np.int64).max)
+                    k = int(dist.argmin())
+                    si, sj = a0 + k // dist.shape[1], b0 + k % dist.shape[1]
+                    occ[si : si + hi, sj : sj + wi] = True
+                    row[i], col[i] = si + r0, sj + c0
+                    break
+            if a0 == 0 and b0 == 0 and a1 >= rows - hi and b1 >= cols - wi:
+                # the whole grid is full around this part: grow it on every side
+                pad = max(wi, hi) + slack
+                occ = np.pad(occ, pad)
+                r0 -= pad
+                c0 -= pad
+            radius *= 2
+    return col - lo_c, row - lo_r
+
+
+@timed("board.place")
+def place_footprints(design: SchematicDesign, iters: int = ITERATIONS, netlist: Optional[Netlist] = None) -> BoardLayout:
+    """
+    Board placement for the design's footprints: schematic positions (scaled) as the
+    start, a vectorised wirelength/overlap optimisation, then legalisation onto the
+    PLACE_GRID so no two courtyards overlap. The outline is the courtyards' bounding
+    box plus BOARD_MARGIN, with its top-left corner at (0, 0). Pass the design's
+    netlist if it is already built.
+    """
+    parts = [PlacedFootprint(c.ref, c.value, c.footprint, footprint_info(c.footprint) if c.footprint else None) for c in design.components]
+    stubs: Dict[str, List[str]] = {}
+    for p in parts:
+        if p.fpid and p.info is None:
+            stubs.setdefault(p.fpid, []).append(p.ref)
+    for fpid, refs in stubs.items():
+        log.warning("Footprint %s is not installed: %s placed as a stub without pads", fpid, ", ".join(refs))
+    netlist = build_netlist(design) if netlist is None else netlist
+    if not parts:
+        return BoardLayout([], netlist, (0.0, 0.0) + EMPTY_BOARD, 0.0, design.name)
+
+    court = np.array([p.courtyard for p in parts], dtype=np.float64)
+    pins = _pin_arrays(parts, netlist)
+    cx = (court[:, 0] + court[:, 2]) / 2
+    cy = (court[:, 1] + court[:, 3]) / 2
+    hw = (court[:, 2] - court[:, 0]) / 2
+    hh = (court[:, 3] - court[:, 1]) / 2
+
+    # centres start at the schematic positions stretched onto a square board of
+    # TARGET_DENSITY, keeping the schematic's grouping; nudged apart so no two coincide
+    sch = np.array([c.position for c in design.components], dtype=np.float64)
+    side = np.sqrt(4 * (hw * hh).sum() / TARGET_DENSITY)
+    span = np.maximum(np.ptp(sch, axis=0), 1e-9)
+    start = (sch - sch.min(axis=0)) / span * side
+    start += np.random.default_rng(0).uniform(-0.01, 0.01, start.shape)
+    x = start[:, 0] + cx
+    y = start[:, 1] + cy
+    _global_place(x, y, hw, hh, _centred(pins, cx, cy), iters)
+
+    col, row = _legalize(x - cx, y - cy, court, PLACE_GRID)
+    ox = col * PLACE_GRID
+    oy = row * PLACE_GRID
+    left = np.floor((ox + court[:, 0]).min() / PLACE_GRID + 1e-9) * PLACE_GRID
+    top = np.floor((oy + court[:, 1]).min() / PLACE_GRID + 1e-9) * PLACE_GRID
+    ox += BOARD_MARGIN - left
+    oy += BOARD_MARGIN - top
+    right = np.ceil((ox + court[:, 2]).max() / PLACE_GRID - 1e-9) * PLACE_GRID + BOARD_MARGIN
+    bottom = np.ceil((oy + court[:, 3]).max() / PLACE_GRID - 1e-9) * PLACE_GRID + BOARD_MARGIN
+
+    for p, px, py in zip(parts, ox.tolist(), oy.tolist()):
+        p.position = (round(px, 4), round(py, 4))
+    outline = (0.0, 0.0, round(float(right), 4), round(float(bottom), 4))
+    return BoardLayout(parts, netlist, outline, wirelength(ox, oy, pins), design.name)
+
+
+def placement_inputs(design: SchematicDesign, netlist: Netlist) -> Tuple:
+    """
+    Everything place_footprints' result depends on: footprints, schematic positions and
+    which pads share a net (in net order). Values and net names are not in it, so designs
+    that differ only there place the same.
+    """
+    return (
+        tuple((c.footprint, c.position) for c in design.components),
+        tuple(netlist.starts),
+        tuple(netlist.members),
+    )
+
+
+def reuse_layout(layout: BoardLayout, design: SchematicDesign, netlist: Netlist) -> BoardLayout:
+    """`layout`'s placement for a design with the same placement_inputs, with that design's refs, values and nets."""
+    parts = [PlacedFootprint(c.ref, c.value, p.fpid, p.info, p.position) for c, p in zip(design.components, layout.footprints)]
+    return BoardLayout(parts, netlist, layout.outline, layout.wirelength, design.name)
+
+
+def _centred(pins, cx: np.ndarray, cy: np.ndarray):
+    # the optimiser moves courtyard centres, so pad offsets are taken from the centre
+    part, dx, dy, net, weight = pins
+    return part, dx - cx[part], dy - cy[part], net, weight
+
+
+def courtyard_overlaps(layout: BoardLayout) -> List[Tuple[str, str]]:
+    """Pairs of refs whose placed courtyards overlap (touching edges don't count)."""
+    if not layout.footprints:
+        return []
+    pos = np.array([p.position for p in layout.footprints])
+    court = np.array([p.courtyard for p in layout.footprints])
+    box = np.concatenate([pos + court[:, :2], pos + court[:, 2:]], axis=1)
+    eps = 1e-6
+    hit = (
+        (box[:, None, 0] < box[None, :, 2] - eps)
+        & (box[None, :, 0] < box[:, None, 2] - eps)
+        & (box[:, None, 1] < box[None, :, 3] - eps)
+        & (box[None, :, 1] < box[:, None, 3] - eps)
+    )
+    i, j = np.nonzero(np.triu(hit, 1))
+    refs = [p.ref for p in layout.footprints]
+    return [(refs[a], refs[b]) for a, b in zip(i.tolist(), j.tolist())]
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, TextIO, Tuple, Union
+
+from pcbgen.design import SchematicDesign, stable_uuid
+from pcbgen.footprint_index import footprint_path
+from pcbgen.pcb_placer import FALLBACK_COURTYARD, BoardLayout, PlacedFootprint, place_footprints
+from pcbgen.symbol_index import sexpr_end, sexpr_num, sexpr_quote
+from pcbgen.trace import timed
+
+if TYPE_CHECKING:
+    from pcbgen.router import Routing
+
+_WRITE_BUFFER = 1 << 16
+
+_HEADER = """(kicad_pcb
+	(version 20240108)
+	(generator "pcbgen")
+	(general
+		(thickness 1.6)
+	)
+	(paper "A4")
+	(layers
+		(0 "F.Cu" signal)
+		(31 "B.Cu" signal)
+		(32 "B.Adhes" user "B.Adhesive")
+		(33 "F.Adhes" user "F.Adhesive")
+		(34 "B.Paste" user)
+		(35 "F.Paste" user)
+		(36 "B.SilkS" user "B.Silkscreen")
+		(37 "F.SilkS" user "F.Silkscreen")
+		(38 "B.Mask" user)
+		(39 "F.Mask" user)
+		(40 "Dwgs.User" user "User.Drawings")
+		(41 "Cmts.User" user "User.Comments")
+		(44 "Edge.Cuts" user)
+		(45 "Margin" user)
+		(46 "B.CrtYd" user "B.Courtyard")
+		(47 "F.CrtYd" user "F.Courtyard")
+		(48 "B.Fab" user)
+		(49 "F.Fab" user)
+	)
+	(setup
+		(pad_to_mask_clearance 0)
+		(pcbplotparams
+			(layerselection 0x00010fc_ffffffff)
+			(usegerberattributes yes)
+			(usegerberadvancedattributes yes)
+			(creategerberjobfile yes)
+			(outputdirectory "")
+		)
+	)
+	(net 0 "")
+"""
+
+_STR = r'"(?:[^"\\]|\\.)*"'
+_FILE_ONLY_RE = re.compile(r"\n\s*\((?:version|generator|generator_version)\s+(?:" + _STR + r"|[^\s()]+)\s*\)")
+_HEAD_RE = re.compile(r"\(footprint\s+(?:" + _STR + r"|[^\s()]+)")
+# spans that differ per placed instance: every uuid, the Reference/Value text, and
+# the first (layer ...) which the board's (uuid)/(at) entries follow
+_SLOT_RE = re.compile(
+    r'\((?:uuid|tstamp)\s+"?[0-9A-Fa-f-]+"?\s*\)'
+    r'|(\(property\s+"(Reference|Value)"\s+)' + _STR + r"|(\(fp_text\s+(reference|value)\s+)(?:" + _STR + r"|[^\s()]+)"
+    r'|\(layer\s+"[^"]*"\s*\)'
+)
+_PAD_RE = re.compile(r"\(pad\s+(" + _STR + r"|[^\s()]+)")
+
+# literal text, or (slot, arg) for "uuid" (arg: the "(uuid" prefix), "at",
+# "Reference", "Value" and "net" (arg: pad number; the pad's net goes there)
+Template = Tuple[Union[str, Tuple[str, str]], ...]
+
+
+def _stub_footprint(fpid: str) -> str:
+    # stand-in for a footprint the libraries don't have: fields and the fallback courtyard only
+    x1, y1, x2, y2 = FALLBACK_COURTYARD
+    fields = "".join(
+        f'\t(property "{name}" ""\n\t\t(at 0 {sexpr_num(y)} 0)\n\t\t(layer "{layer}")\n\t\t(uuid "0")\n'
+        "\t\t(effects\n\t\t\t(font\n\t\t\t\t(size 1 1)\n\t\t\t\t(thickness 0.15)\n\t\t\t)\n\t\t)\n\t)\n"
+        for name, y, layer in (("Reference", y1 - 1, "F.SilkS"), ("Value", y2 + 1, "F.Fab"))
+    )
+    return (
+        f'(footprint {sexpr_quote(fpid)}\n\t(layer "F.Cu")\n{fields}'
+        f"\t(fp_rect\n\t\t(start {sexpr_num(x1)} {sexpr_num(y1)})\n\t\t(end {sexpr_num(x2)} {sexpr_num(y2)})\n"
+        '\t\t(stroke\n\t\t\t(width 0.05)\n\t\t\t(type solid)\n\t\t)\n\t\t(fill none)\n\t\t(layer "F.CrtYd")\n\t\t(uuid "0")\n\t)\n)'
+    )
+
+
+def footprint_template(fpid: str) -> Template:
+    """
+    The library footprint as board text, split around the per-instance parts. The
+    .kicad_mod header (version/generator) is dropped, the name becomes "Lib:Name" and
+    everything moves one tab in. Footprints that aren't installed get a stub. Templates
+    are kept per file size and mtime, so an edited or newly installed footprint is seen.
+    """
+    path = footprint_path(fpid)
+    if path is None:
+        return _template(fpid, None, None)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _template(fpid, None, None)
+    return _template(fpid, path, (st.st_size, st.st_mtime_ns))
+
+
+@lru_cache(maxsize=1024)
+def _template(fpid: str, path: Optional[Path], stamp: Optional[Tuple[int, int]]) -> Template:
+    # stamp is only part of the cache key
+    text = path.read_text(encoding="utf-8").strip() if path is not None else _stub_footprint(fpid)
+    text = _FILE_ONLY_RE.sub("", text)
+    head = _HEAD_RE.match(text)
+    if head is None:
+        raise ValueError(f"{path}: not a KiCad footprint (expected a (footprint ...) file)")
+    text = "\t" + f"(footprint {sexpr_quote(fpid)}" + text[head.end() :].replace("\n", "\n\t") + "\n"
+
+    # (start, end, slot): text[start:end] is replaced by the slot when writing
+    slots: List[Tuple[int, int, Tuple[str, str]]] = []
+    placed = False
+    for m in _SLOT_RE.finditer(text):
+        if m.group(0).startswith("(layer"):
+            if not placed:
+                placed = True
+                slots.append((m.end(), m.end(), ("at", "")))
+        elif m.group(1) or m.group(3):
+            g = 1 if m.group(1) else 3
+            slots.append((m.end(g), m.end(), (m.group(g + 1).capitalize(), "")))
+        else:
+            slots.append((m.start(), m.end(), ("uuid", m.group(0).split()[0] + ' "')))
+    for m in _PAD_RE.finditer(text):
+        number = m.group(1)[1:-1] if m.group(1).startswith('"') else m.group(1)
+        if number:
+            # the pad's net goes on its own line just before the pad's closing ")"
+            close = text.rfind("\n", m.start(), sexpr_end(text, m.start()) - 1)
+            slots.append((close, close, ("net", number)))
+
+    parts: List[Union[str, Tuple[str, str]]] = []
+    pos = 0
+    for start, end, slot in sorted(slots, key=lambda s: s[0]):
+        parts += [text[pos:start], slot]
+        pos = end
+    parts.append(text[pos:])
+    return tuple(parts)
+
+
+def _write_footprint(out: TextIO, fp: PlacedFootprint, pad_nets: Dict[str, str], key: Tuple[str, ...]) -> None:
+    # pad_nets: pad number -> the "(net N "name")" entry for it; key: (board name, "footprint",
+    # ref), which the footprint's uuid and, numbered in file order, its items' uuids come from
+    x, y = fp.position
+    items = 0
+    for part in footprint_template(fp.fpid):
+        if isinstance(part, str):
+            out.write(part)
+            continue
+        slot, arg = part
+        if slot == "uuid":
+            out.write(f'{arg}{stable_uuid(*key, str(items))}")')
+            items += 1
+        elif slot == "net":
+            if arg in pad_nets:
+                out.write("\n\t\t\t" + pad_nets[arg])
+        elif slot == "at":
+            out.write(f'\n\t\t(uuid "{stable_uuid(*key)}")\n\t\t(at {sexpr_num(x)} {sexpr_num(y)})')
+        else:
+            out.write(sexpr_quote(fp.ref if slot == "Reference" else fp.value))
+
+
+def _write_routing(out: TextIO, routing: "Routing", name: str, net_names: List[str]) -> None:
+    from pcbgen.router import TRACK_WIDTH, VIA_DRILL, VIA_SIZE
+
+    # uuids from the net's name and the item's number within the net
+    seen: Dict[Tuple[str, int], int] = {}
+
+    def _uid(kind: str, net: int) -> str:
+        n = seen.get((kind, net), 0)
+        seen[(kind, net)] = n + 1
+        return stable_uuid(name, kind, net_names[net - 1] if net > 0 else "", str(n))
+
+    for s in routing.segments:
+        out.write(
+            f"\t(segment\n\t\t(start {sexpr_num(s.start[0])} {sexpr_num(s.start[1])})\n\t\t(end {sexpr_num(s.end[0])} {sexpr_num(s.end[1])})\n"
+            f'\t\t(width {sexpr_num(TRACK_WIDTH)})\n\t\t(layer "{s.layer}")\n\t\t(net {s.net})\n\t\t(uuid "{_uid("segment", s.net)}")\n\t)\n'
+        )
+    for v in routing.vias:
+        out.write(
+            f"\t(via\n\t\t(at {sexpr_num(v.at[0])} {sexpr_num(v.at[1])})\n\t\t(size {sexpr_num(VIA_SIZE)})\n\t\t(drill {sexpr_num(VIA_DRILL)})\n"
+            f'\t\t(layers "F.Cu" "B.Cu")\n\t\t(net {v.net})\n\t\t(uuid "{_uid("via", v.net)}")\n\t)\n'
+        )
+
+
+@timed("board.write")
+def write_board(layout: BoardLayout, out: TextIO, routing: Optional["Routing"] = None) -> None:
+    """
+    Emit a .kicad_pcb: the net table from the schematic netlist (net 0 is "no net"),
+    every footprint at its placed position with its pads on their nets, the tracks and
+    vias when the board was routed, and the outline.
+    """
+    out.write(_HEADER)
+    netlist = layout.netlist
+    entries = [f"(net {i} {sexpr_quote(name)})" for i, name in enumerate(netlist.names, start=1)]
+    for entry in entries:
+        out.write(f"\t{entry}\n")
+    pad_nets: List[Dict[str, str]] = [{} for _ in layout.footprints]
+    for i, entry in enumerate(entries):
+        for ci, pin in netlist.pins(i):
+            pad_nets[ci][pin] = entry
+    refs: Dict[str, int] = {}
+    for fp, nets in zip(layout.footprints, pad_nets):
+        if fp.fpid:
+            n = refs.get(fp.ref, 0)
+            refs[fp.ref] = n + 1
+            _write_footprint(out, fp, nets, (layout.name, "footprint", fp.ref if n == 0 else f"{fp.ref}#{n}"))
+    if routing is not None:
+        _write_routing(out, routing, layout.name, netlist.names)
+    x1, y1, x2, y2 = layout.outline
+    out.write(
+        f"\t(gr_rect\n\t\t(start {sexpr_num(x1)} {sexpr_num(y1)})\n\t\t(end {sexpr_num(x2)} {sexpr_num(y2)})\n"
+        "\t\t(stroke\n\t\t\t(width 0.15)\n\t\t\t(type solid)\n\t\t)\n\t\t(fill none)\n"
+        f'\t\t(layer "Edge.Cuts")\n\t\t(uuid "{stable_uuid(layout.name, "outline")}")\n\t)\n)\n'
+    )
+
+
+def _laid_out(design: SchematicDesign, route: bool, route_workers: int) -> Tuple[BoardLayout, Optional["Routing"]]:
+    layout = place_footprints(design)
+    routing = None
+    if route:
+        from pcbgen.router import route_board
+
+        routing = route_board(layout, workers=route_workers)
+    # resolve every footprint before any output is started
+    for fp in layout.footprints:
+        if fp.fpid:
+            footprint_template(fp.fpid)
+    return layout, routing
+
+
+def save_board(design: SchematicDesign, out_path: Path, route: bool = False, route_workers: int = 1) -> BoardLayout:
+    """
+    Place the design's footprints (pcbgen.pcb_placer), optionally route the nets
+    (pcbgen.router) and write the board.
+    """
+    layout, routing = _laid_out(design, route, route_workers)
+    with io.open(out_path, "w", encoding="utf-8", newline="\n", buffering=_WRITE_BUFFER) as fh:
+        write_board(layout, fh, routing)
+    return layout
+
+
+def board_text(design: SchematicDesign, route: bool = False, route_workers: int = 1) -> str:
+    """What save_board would write, built in memory."""
+    return layout_text(*_laid_out(design, route, route_workers))
+
+
+def layout_text(layout: BoardLayout, routing: Optional["Routing"] = None) -> str:
+    buf = io.StringIO()
+    write_board(layout, buf, routing)
+    return buf.getvalue()
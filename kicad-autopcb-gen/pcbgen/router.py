@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pcbgen.footprint_index import B_CU, F_CU
+from pcbgen.pcb_placer import BoardLayout
+from pcbgen.trace import timed
+
+Point = Tuple[float, float]
+Cell = Tuple[int, int, int]  # (layer, row, col)
+
+ROUTE_GRID = 0.25  # mm between track centrelines on the routing grid
+TRACK_WIDTH = 0.25
+CLEARANCE = 0.2
+VIA_SIZE = 0.6
+VIA_DRILL = 0.3
+VIA_COST = 10  # a via costs as much as this many grid steps
+WINDOW_MARGIN = 5.0  # mm around a connection's pads searched first
+DETOUR_MARGIN = 20.0  # ... and when that fails
+RIPUP_PASSES = 5
+RIPUP_MARGIN = 1.0  # routes passing this close to a failed connection's pads are ripped up
+LAYERS = ("F.Cu", "B.Cu")
+
+_RING = 3  # cells of context around a search window (covers the largest keep-out)
+_INF = np.iinfo(np.int32).max
+
+
+def _disk(radius: float) -> List[Tuple[int, int]]:
+    r = int(radius) + 1
+    return [(dr, dc) for dr in range(-r, r + 1) for dc in range(-r, r + 1) if dr * dr + dc * dc < radius * radius]
+
+
+# Every copper cell is a ROUTE_GRID square. A track centre must stay this far from
+# another net's copper cell centre, a via centre a bit further; a via's own copper
+# covers the plus-shaped cells around it.
+_TRACK_KEEPOUT = _disk((CLEARANCE + TRACK_WIDTH / 2 + ROUTE_GRID / 2) / ROUTE_GRID)
+_VIA_KEEPOUT = _disk((CLEARANCE + VIA_SIZE / 2 + ROUTE_GRID / 2) / ROUTE_GRID)
+_VIA_COPPER = _disk(VIA_SIZE / 2 / ROUTE_GRID + 1e-6)
+_STEPS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+
+@dataclass
+class Segment:
+    start: Point
+    end: Point
+    layer: str
+    net: int  # board net number (netlist index + 1)
+
+
+@dataclass
+class Via:
+    at: Point
+    net: int
+
+
+@dataclass
+class Routing:
+    segments: List[Segment]
+    vias: List[Via]
+    routed: List[str]  # multi-pad nets with every pad connected
+    failed: List[str]  # multi-pad nets left (partly) unrouted
+    seconds: float
+
+    @property
+    def completion(self) -> float:
+        total = len(self.routed) + len(self.failed)
+        return len(self.routed) / total if total else 1.0
+
+
+# A terminal is one pad in grid cells: (layer mask, row0, row1, col0, col1), inclusive.
+Terminal = Tuple[int, int, int, int, int]
+# A routed net in grid cells: its paths (cells in order) and via positions (row, col).
+NetRoute = Tuple[List[List[Cell]], List[Tuple[int, int]]]
+
+
+def _dilate(mask: np.ndarray, offsets: Sequence[Tuple[int, int]]) -> np.ndarray:
+    # OR of the mask shifted by every offset, over the last two axes
+    out = np.zeros_like(mask)
+    rows, cols = mask.shape[-2:]
+    for dr, dc in offsets:
+        out[..., max(dr, 0) : rows + min(dr, 0), max(dc, 0) : cols + min(dc, 0)] |= mask[
+            ..., max(-dr, 0) : rows + min(-dr, 0), max(-dc, 0) : cols + min(-dc, 0)
+        ]
+    return out
+
+
+def _lee(
+    seeds: np.ndarray, target: np.ndarray, free: np.ndarray, via_ok: np.ndarray
+) -> Optional[Tuple[List[Cell], List[Tuple[int, int]], Cell]]:
+    """
+    Lee wavefront over both layers at once: each step grows the front by one cell
+    (4-neighbours) in free cells; a front cell where a via is allowed reaches the other
+    layer VIA_COST steps later. Stops at the first target cell and backtraces a path
+    that keeps going straight where it can. Returns (path, vias, hit) or None.
+    """
+    dist = np.full(free.shape, _INF, dtype=np.int32)
+    front = seeds.copy()
+    dist[front] = 0
+    pending: Dict[int, np.ndarray] = {}
+    step = 0
+    passable = free | target
+    while not (front & target).any():
+        step += 1
+        nxt = np.zeros_like(front)
+        nxt[:, 1:, :] |= front[:, :-1, :]
+        nxt[:, :-1, :] |= front[:, 1:, :]
+        nxt[:, :, 1:] |= front[:, :, :-1]
+        nxt[:, :, :-1] |= front[:, :, 1:]
+        hop = front & via_ok
+        if hop.any():
+            arrive = pending.setdefault(step + VIA_COST - 1, np.zeros_like(front))
+            arrive |= hop[::-1]
+        if step in pending:
+            nxt |= pending.pop(step)
+        nxt &= passable & (dist == _INF)
+        if not nxt.any() and not pending:
+            return None
+        dist[nxt] = step
+        front = nxt
+
+    hit = np.argwhere(front & target)[0]
+    layer, row, col = (int(v) for v in hit)
+    cell = (layer, row, col)
+    d = int(dist[cell])
+    path = [cell]
+    vias: List[Tuple[int, int]] = []
+    heading = None
+    _, rows, cols = free.shape
+    while d > 0:
+        layer, row, col = cell
+        order = ([heading] if heading else []) + [s for s in _STEPS if s != heading]
+        for dr, dc in order:
+            r, c = row + dr, col + dc
+            if 0 <= r < rows and 0 <= c < cols and dist[layer, r, c] == d - 1:
+                cell, d, heading = (layer, r, c), d - 1, (dr, dc)
+                break
+        else:
+            # no same-layer predecessor: we came through a via here
+            cell, d, heading = (1 - layer, row, col), d - VIA_COST, None
+            vias.append((row, col))
+        path.append(cell)
+    return path, vias, hit
+
+
+def _route_net(copper: np.ndarray, net: int, terminals: List[Terminal], pads: np.ndarray) -> Optional[NetRoute]:
+    """
+    Route one net inside a window of the board: copper holds the window plus a _RING of
+    context (0 free, net + 1 for that net's copper, -1 blocked), terminals its pads in
+    window cells, pads marks every pad cell (no vias in pads). Grows a tree from the
+    first pad, connecting the nearest unconnected pad each round.
+    """
+    other = (copper != 0) & (copper != net + 1)
+    free = ~_dilate(other, _TRACK_KEEPOUT)
+    via_ok = ~(_dilate(other[0], _VIA_KEEPOUT) | _dilate(other[1], _VIA_KEEPOUT) | pads)
+    # only the window proper is searched; the ring is context for the keep-outs
+    edge = np.zeros(copper.shape[1:], dtype=bool)
+    edge[:_RING, :] = edge[-_RING:, :] = edge[:, :_RING] = edge[:, -_RING:] = True
+    free &= ~edge
+    via_ok &= ~edge
+
+    term_id = np.full(copper.shape, -1, dtype=np.int32)
+    for k, (mask, r0, r1, c0, c1) in enumerate(terminals):
+        for layer in (0, 1):
+            if mask & (1 << layer):
+                term_id[layer, r0 : r1 + 1, c0 : c1 + 1] = k
+    tree = term_id == 0
+    done = {0}
+    paths: List[List[Cell]] = []
+    vias: List[Tuple[int, int]] = []
+    while len(done) < len(terminals):
+        target = (term_id >= 0) & ~np.isin(term_id, list(done))
+        found = _lee(tree, target, free, via_ok)
+        if found is None:
+            return None
+        path, path_vias, hit = found
+        k = int(term_id[tuple(hit)])
+        done.add(k)
+        tree |= term_id == k
+        for cell in path:
+            tree[cell] = True
+        paths.append(path)
+        vias.extend(path_vias)
+    return paths, vias
+
+
+def _paint(copper: np.ndarray, net: int, route: NetRoute, r0: int = 0, c0: int = 0) -> None:
+    paths, vias = route
+    rows, cols = copper.shape[1:]
+    for path in paths:
+        for layer, r, c in path:
+            copper[layer, r + r0, c + c0] = net + 1
+    for r, c in vias:
+        for dr, dc in _VIA_COPPER:
+            rr, cc = r + r0 + dr, c + c0 + dc
+            if 0 <= rr < rows and 0 <= cc < cols:
+                copper[:, rr, cc] = net + 1
+
+
+class _Board:
+    """Routing grid of one placed board: pad copper, terminals per net and search windows."""
+
+    def __init__(self, layout: BoardLayout) -> None:
+        g = ROUTE_GRID
+        x1, y1, x2, y2 = layout.outline
+        self.origin = (x1, y1)
+        self.rows = int(round((y2 - y1) / g)) + 1
+        self.cols = int(round((x2 - x1) / g)) + 1
+        self.base = np.zeros((2, self.rows, self.cols), dtype=np.int32)
+        # the board edge: nothing within a cell of it
+        self.base[:, :1, :] = self.base[:, -1:, :] = self.base[:, :, :1] = self.base[:, :, -1:] = -1
+        self.pads = np.zeros((self.rows, self.cols), dtype=bool)
+        self.terminals: Dict[int, List[Terminal]] = {}
+
+        netlist = layout.netlist
+        for fi, fp in enumerate(layout.footprints):
+            if fp.info is None:
+                continue
+            fx, fy = fp.position
+            for (num, px, py), (w, h, mask) in zip(fp.info.pads, fp.info.shapes):
+                if not mask:
+                    continue
+                ax, ay = fx + px - x1, fy + py - y1
+                c0 = max(int(np.ceil((ax - w / 2) / g - 0.5)), 0)
+                c1 = min(int(np.floor((ax + w / 2) / g + 0.5)), self.cols - 1)
+                r0 = max(int(np.ceil((ay - h / 2) / g - 0.5)), 0)
+                r1 = min(int(np.floor((ay + h / 2) / g + 0.5)), self.rows - 1)
+                net = netlist.net_of(fi, num) if num else None
+                for layer in (0, 1):
+                    if mask & (F_CU, B_CU)[layer]:
+                        self.base[layer, r0 : r1 + 1, c0 : c1 + 1] = -1 if net is None else net + 1
+                self.pads[r0 : r1 + 1, c0 : c1 + 1] = True
+                if net is not None:
+                    # a track has to end on a cell centred inside the pad (or the one nearest its
+                    # centre); the box inscribed in a round pad keeps that true for any pad shape
+                    hw, hh = w * 0.35, h * 0.35
+                    tr0, tr1 = int(np.ceil((ay - hh) / g)), int(np.floor((ay + hh) / g))
+                    tc0, tc1 = int(np.ceil((ax - hw) / g)), int(np.floor((ax + hw) / g))
+                    if tr0 > tr1:
+                        tr0 = tr1 = int(round(ay / g))
+                    if tc0 > tc1:
+                        tc0 = tc1 = int(round(ax / g))
+                    term = (mask, max(tr0, r0), min(tr1, r1), max(tc0, c0), min(tc1, c1))
+                    self.terminals.setdefault(net, []).append(term)
+
+        # each multi-pad net becomes the 2-pad connections of a minimum spanning tree
+        # over its pad centres (Manhattan), routed one by one like separate nets
+        self.connections: List[Tuple[int, Terminal, Terminal]] = []
+        for net in sorted(self.terminals):
+            terms = self.terminals[net]
+            centre = [((t[1] + t[2]) / 2, (t[3] + t[4]) / 2) for t in terms]
+            best = {k: (abs(centre[k][0] - centre[0][0]) + abs(centre[k][1] - centre[0][1]), 0) for k in range(1, len(terms))}
+            while best:
+                k = min(best, key=lambda j: (best[j], j))
+                self.connections.append((net, terms[best.pop(k)[1]], terms[k]))
+                for j, (d, _) in best.items():
+                    dj = abs(centre[k][0] - centre[j][0]) + abs(centre[k][1] - centre[j][1])
+                    if dj < d:
+                        best[j] = (dj, k)
+
+    def window(self, conn: int, margin: float) -> Tuple[int, int, int, int]:
+        """(row0, row1, col0, col1) searched for a connection, including the context ring."""
+        _, a, b = self.connections[conn]
+        m = int(np.ceil(margin / ROUTE_GRID)) + _RING
+        return (
+            max(min(a[1], b[1]) - m, 0),
+            min(max(a[2], b[2]) + m + 1, self.rows),
+            max(min(a[3], b[3]) - m, 0),
+            min(max(a[4], b[4]) + m + 1, self.cols),
+        )
+
+    def task(self, copper: np.ndarray, conn: int, margin: float):
+        r0, r1, c0, c1 = win = self.window(conn, margin)
+        net, *terms = self.connections[conn]
+        terms = [(mask, a - r0, b - r0, c - c0, d - c0) for mask, a, b, c, d in terms]
+        return win, (copper[:, r0:r1, c0:c1].copy(), net, terms, self.pads[r0:r1, c0:c1])
+
+    def point(self, r: int, c: int) -> Point:
+        return round(self.origin[0] + c * ROUTE_GRID, 4), round(self.origin[1] + r * ROUTE_GRID, 4)
+
+
+def _overlap(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> bool:
+    # windows already carry their context ring; another ring keeps painted copper apart
+    return a[0] < b[1] + _RING and b[0] < a[1] + _RING and a[2] < b[3] + _RING and b[2] < a[3] + _RING
+
+
+def _batches(board: _Board, conns: List[int]) -> List[List[int]]:
+    """
+    Group connections so the windows within a group are disjoint: each goes in the
+    group after the last one holding an overlapping window, so routing the groups in
+    turn (and a group's members in any order, or at once) gives the same result as
+    routing them one by one.
+    """
+    groups: List[List[int]] = []
+    windows: List[List[Tuple[int, int, int, int]]] = []
+    for conn in conns:
+        win = board.window(conn, WINDOW_MARGIN)
+        level = 0
+        for i in range(len(groups) - 1, -1, -1):
+            if any(_overlap(win, w) for w in windows[i]):
+                level = i + 1
+                break
+        if level == len(groups):
+            groups.append([])
+            windows.append([])
+        groups[level].append(conn)
+        windows[level].append(win)
+    return groups
+
+
+@timed("board.route")
+def route_board(layout: BoardLayout, workers: int = 1) -> Routing:
+    """
+    Route every multi-pad net of a placed board on F.Cu/B.Cu, as the connections of
+    each net's spanning tree. Connections go shortest first, each searched in a window
+    around its two pads (then a wider one for detours); connections with disjoint
+    windows are independent and run on `workers` processes. Whatever is still
+    unrouted then gets up to RIPUP_PASSES rounds of rip-up and retry: the routes
+    crossing a failed connection's window are removed, the failed one is routed first
+    and the removed ones after it; a round that leaves more connections unrouted is
+    undone. The result does not depend on `workers`.
+    """
+    t0 = time.perf_counter()
+    board = _Board(layout)
+    names = layout.netlist.names
+    order = sorted(range(len(board.connections)), key=lambda k: ((lambda w: w[1] - w[0] + w[3] - w[2])(board.window(k, 0.0)), k))
+
+    routes: Dict[int, NetRoute] = {}
+    origins: Dict[int, Tuple[int, int]] = {}
+    copper = board.base.copy()
+
+    def commit(conn: int, route: NetRoute, r0: int, c0: int) -> None:
+        routes[conn] = route
+        origins[conn] = (r0, c0)
+        _paint(copper, board.connections[conn][0], route, r0, c0)
+
+    retry: List[int] = []
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(order) > 1 else None
+    try:
+        for group in _batches(board, order):
+            tasks = [board.task(copper, conn, WINDOW_MARGIN) for conn in group]
+            if pool is not None and len(group) > 1:
+                results = list(pool.map(_route_net, *zip(*(args for _, args in tasks))))
+            else:
+                results = [_route_net(*args) for _, args in tasks]
+            for conn, (win, _), route in zip(group, tasks, results):
+                if route is None:
+                    retry.append(conn)
+                else:
+                    commit(conn, route, win[0], win[2])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    def reroute(conn: int, margins: Tuple[float, ...] = (WINDOW_MARGIN, DETOUR_MARGIN)) -> bool:
+        for margin in margins:
+            win, args = board.task(copper, conn, margin)
+            route = _route_net(*args)
+            if route is not None:
+                commit(conn, route, win[0], win[2])
+                return True
+        return False
+
+    failed = [k for k in retry if not reroute(k, (DETOUR_MARGIN,))]
+    best = (dict(routes), dict(origins), list(failed))
+    for _ in range(RIPUP_PASSES):
+        if not failed:
+            break
+        still: List[int] = []
+        for conn in failed:
+            if conn in routes:
+                continue  # came back as another failure's victim
+            r0, r1, c0, c1 = board.window(conn, RIPUP_MARGIN)
+            victims = [
+                v
+                for v, (paths, _) in routes.items()
+                if any(r0 <= r + origins[v][0] < r1 and c0 <= c + origins[v][1] < c1 for path in paths for _, r, c in path)
+            ]
+            for v in victims:
+                del routes[v]
+            copper = board.base.copy()
+            for v, route in routes.items():
+                _paint(copper, board.connections[v][0], route, *origins[v])
+            still += [k for k in [conn] + victims if not reroute(k)]
+        failed = [k for k in still if k not in routes]
+        if len(failed) < len(best[2]):
+            best = (dict(routes), dict(origins), list(failed))
+    routes, origins, failed = best
+
+    segments: List[Segment] = []
+    vias: List[Via] = []
+    for conn in sorted(routes):
+        paths, conn_vias = routes[conn]
+        net = board.connections[conn][0] + 1
+        r0, c0 = origins[conn]
+        for path in paths:
+            segments += _segments(board, path, net, r0, c0)
+        vias += [Via(board.point(r + r0, c + c0), net) for r, c in dict.fromkeys(conn_vias)]
+    # a net with fewer than two pads has nothing to route: it is neither routed nor failed
+    broken = {board.connections[k][0] for k in failed}
+    routed = sorted(names[n] for n, terms in board.terminals.items() if len(terms) > 1 and n not in broken)
+    return Routing(segments, vias, routed, sorted(names[n] for n in broken), time.perf_counter() - t0)
+
+
+def _segments(board: _Board, path: List[Cell], net: int, r0: int, c0: int) -> List[Segment]:
+    # straight runs of a cell path as segments; a layer change (via) ends a run
+    out: List[Segment] = []
+    start = prev = path[0]
+    heading = None
+    for cell in path[1:]:
+        if cell[0] != prev[0]:
+            if prev != start:
+                out.append(Segment(board.point(start[1] + r0, start[2] + c0), board.point(prev[1] + r0, prev[2] + c0), LAYERS[prev[0]], net))
+            start, heading = cell, None
+        else:
+            step = (cell[1] - prev[1], cell[2] - prev[2])
+            if heading is not None and step != heading:
+                out.append(Segment(board.point(start[1] + r0, start[2] + c0), board.point(prev[1] + r0, prev[2] + c0), LAYERS[prev[0]], net))
+                start = prev
+            heading = step
+        prev = cell
+    if prev != start:
+        out.append(Segment(board.point(start[1] + r0, start[2] + c0), board.point(prev[1] + r0, prev[2] + c0), LAYERS[prev[0]], net))
+    return out
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import io
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pcbgen.design import SchematicDesign, _repeat, element_digest, label_key, stable_uuid, wire_key
+from pcbgen.sch_writer import lib_symbol, write_element
+from pcbgen.sexpr import Node, SexprDocument, open_sexpr
+from pcbgen.trace import timed
+
+_KINDS = ("symbol", "wire", "label")
+
+
+@dataclass
+class SchematicUpdate:
+    path: Path
+    kept: int = 0  # generated elements left as they were (hand edits included)
+    changed: int = 0
+    added: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def touched(self) -> int:
+        return self.changed + self.added + self.removed
+
+
+def _generated(uid: str) -> bool:
+    # pcbgen writes uuid5s (design.stable_uuid), KiCad makes uuid4s; the version is the 15th character
+    return len(uid) == 36 and uid[14] == "5" and uid[8] == "-"
+
+
+def _line_span(data, start: int, end: int) -> Tuple[int, int]:
+    # widen [start, end) to whole lines when the node sits on its own lines, as the writer emits it
+    a = start
+    while a > 0 and data[a - 1 : a] in (b" ", b"\t"):
+        a -= 1
+    if a > 0 and data[a - 1 : a] != b"\n":
+        a = start
+    b = end
+    while data[b : b + 1] in (b" ", b"\t", b"\r"):
+        b += 1
+    if data[b : b + 1] == b"\n":
+        b += 1
+    else:
+        b = end
+    return a, b
+
+
+def _legacy_keys(nodes: List[Tuple[str, Node]]) -> Dict[Tuple[str, str], Node]:
+    # (kind, key) of elements from before uuids were derived from them, read back from their content
+    keys: Dict[Tuple[str, str], Node] = {}
+    seen: Dict[Tuple[str, str], int] = {}
+    for kind, node in nodes:
+        if kind == "symbol":
+            ref = next((p.atoms()[1] for p in node.children("property") if p.atoms()[:1] == ["Reference"]), None)
+            if ref is not None:
+                keys.setdefault(("symbol", ref), node)
+        elif kind == "wire":
+            pts = node.find("pts")
+            xy = [float(v) for p in (pts.children("xy") if pts else ()) for v in p.atoms()[:2]]
+            if len(xy) == 4:
+                keys.setdefault(("wire", _repeat(seen, "wire", wire_key(xy[:2], xy[2:]))), node)
+        else:
+            at = node.find("at")
+            xyr = [float(v) for v in at.atoms()[:3]] if at is not None else []
+            if len(xyr) == 3:
+                key = label_key(node.atoms()[0], (xyr[0], xyr[1]), xyr[2])
+                keys.setdefault(("label", _repeat(seen, "label", key)), node)
+    return keys
+
+
+def _plan(
+    design: SchematicDesign, doc: SexprDocument, previous: Optional[Dict[str, str]], stats: SchematicUpdate
+) -> List[Tuple[int, int, str]]:
+    data, root = doc.data, doc.root
+    if root.head != "kicad_sch":
+        raise ValueError(f"{stats.path}: not a schematic")
+    lib = root.find("lib_symbols")
+    if lib is None:
+        raise ValueError(f"{stats.path}: no lib_symbols section")
+    sheet = root.get("uuid") or design.sheet_uuid
+
+    wanted = {f"{kind}/{key}": (kind, key, el) for kind, key, el in design.elements()}
+    adopted: Dict[str, Node] = {}
+    if previous is not None:
+        # only what the spec changed since last time is looked for in the file; everything
+        # else stays as it is there, hand edits (and hand deletions) included
+        todo = [entry for entry, (kind, _, el) in wanted.items() if previous.get(entry) != element_digest(kind, el)]
+        uids = {entry: stable_uuid(design.name, entry) for entry in todo}
+        gone = [stable_uuid(design.name, entry) for entry in previous if entry not in wanted]
+        nodes = root.keyed_children("uuid", list(uids.values()) + gone)
+        stats.kept = len(wanted) - len(todo)
+    else:
+        # no record of the last generation: compare every element with what the writer
+        # would emit now, and drop generated ones that are no longer wanted
+        todo = list(wanted)
+        uids = {entry: stable_uuid(design.name, entry) for entry in todo}
+        nodes = root.keyed_children("uuid")
+        ours = set(uids.values())
+        gone = []
+        legacy: List[Tuple[str, Node]] = []
+        for uid, node in nodes.items():
+            kind = node.head
+            if kind not in _KINDS or uid in ours:
+                continue
+            if _generated(uid):
+                gone.append(uid)
+            else:
+                legacy.append((kind, node))
+        if legacy:
+            # written before uuids were derived from the spec: match by reference or geometry once
+            keys = _legacy_keys(legacy)
+            for entry, (kind, key, _) in wanted.items():
+                if uids[entry] not in nodes and (kind, key) in keys:
+                    adopted[entry] = keys[(kind, key)]
+
+    edits: List[Tuple[int, int, str]] = []
+    inserts: Dict[str, List[str]] = {kind: [] for kind in _KINDS}
+    for entry in todo:
+        kind, key, el = wanted[entry]
+        buf = io.StringIO()
+        write_element(buf, design, kind, key, el, sheet)
+        text = buf.getvalue()
+        node = nodes.get(uids[entry], adopted.get(entry))
+        if node is None:
+            inserts[kind].append(text)
+            stats.added += 1
+            continue
+        a, b = _line_span(data, node.start, node.end)
+        if entry not in adopted and data[a:b] == text.encode("utf-8"):
+            stats.kept += 1
+        else:
+            edits.append((a, b, text))
+            stats.changed += 1
+    for uid in gone:
+        node = nodes.get(uid)
+        if node is not None:
+            a, b = _line_span(data, node.start, node.end)
+            edits.append((a, b, ""))
+            stats.removed += 1
+
+    # new elements go after the last of their kind (or of the kind before), in design order
+    if any(inserts.values()):
+        anchor = _line_span(data, lib.start, lib.end)[1]
+        for kind in _KINDS:
+            node = root.last(kind)
+            if node is not None:
+                anchor = max(anchor, _line_span(data, node.start, node.end)[1])
+            if inserts[kind]:
+                edits.append((anchor, anchor, "".join(inserts[kind])))
+
+    have = {s.atoms()[0] for s in lib.children("symbol") if s.atoms()}
+    need = [c.lib_id for c in design.components if c.lib_id not in have]
+    if need:
+        close = _line_span(data, lib.end - 1, lib.end)[0]
+        edits.append((close, close, "".join(lib_symbol(lib_id).block for lib_id in dict.fromkeys(need))))
+    return sorted(edits, key=lambda e: (e[0], e[1]))
+
+
+def _spliced(data, edits: List[Tuple[int, int, str]]) -> Iterator[bytes]:
+    at = 0
+    for a, b, text in edits:
+        yield data[at:a]
+        yield text.encode("utf-8")
+        at = b
+    yield data[at:]
+
+
+def patch_schematic(
+    design: SchematicDesign, doc: SexprDocument, previous: Optional[Dict[str, str]] = None
+) -> Tuple[bytes, SchematicUpdate]:
+    """
+    The bytes update_schematic would leave in the file, for a schematic already open
+    (or held in memory). `doc` is only read, so one base can be patched into many
+    designs (pcbgen.sweep).
+    """
+    t0 = time.perf_counter()
+    stats = SchematicUpdate(doc.path or Path(f"{design.name}.kicad_sch"))
+    for lib_id in dict.fromkeys(c.lib_id for c in design.components):
+        lib_symbol(lib_id)
+    edits = _plan(design, doc, previous, stats)
+    with memoryview(doc.data) as data:
+        out = b"".join(_spliced(data, edits))
+    stats.seconds = time.perf_counter() - t0
+    return out, stats
+
+
+@timed("schematic.update")
+def update_schematic(design: SchematicDesign, path: Path, previous: Optional[Dict[str, str]] = None) -> SchematicUpdate:
+    """
+    Bring an existing .kicad_sch in line with `design`, rewriting only the symbols, wires
+    and labels that differ. Elements are matched by their deterministic uuid
+    (design.element_uuid; files from before those existed are matched by reference or
+    geometry once). `previous` is design.digests() from the last generation: then only
+    the elements whose inputs changed are looked up and written, and the rest is left
+    as it is in the file, edits made in KiCad included. Without it, every element is
+    compared with what the writer would emit. Elements added in KiCad (uuid4) are never
+    touched, and the file is not rewritten when nothing changed.
+    """
+    t0 = time.perf_counter()
+    path = Path(path)
+    stats = SchematicUpdate(path)
+    # resolve every symbol first, so a missing library leaves the file as it was
+    for lib_id in dict.fromkeys(c.lib_id for c in design.components):
+        lib_symbol(lib_id)
+    tmp = path.with_name(path.name + ".tmp")
+    with open_sexpr(path) as doc:
+        edits = _plan(design, doc, previous, stats)
+        if edits:
+            with memoryview(doc.data) as data, open(tmp, "wb") as fh:
+                fh.writelines(_spliced(data, edits))
+    if edits:
+        os.replace(tmp, path)
+    stats.seconds = time.perf_counter() - t0
+    return stats
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Dict, Optional, TextIO, Tuple, Union
+
+from pcbgen.design import Component, Label, SchematicDesign, Wire, stable_uuid
+from pcbgen.symbol_index import LibSymbol, lookup_symbol, sexpr_num, sexpr_quote
+from pcbgen.symbols import rotate
+from pcbgen.trace import timed
+
+_WRITE_BUFFER = 1 << 16
+_SHEET_TAIL = '\t(sheet_instances\n\t\t(path "/"\n\t\t\t(page "1")\n\t\t)\n\t)\n\t(embedded_fonts no)\n)\n'
+
+
+def lib_symbol(lib_id: str) -> LibSymbol:
+    """
+    Pre-rendered definition from the persistent symbol index (pcbgen.symbol_index), as of
+    the library's current state: not memoised here, open_index revalidates per lookup.
+    Derived symbols ("extends") are not flattened here; use the ksa backend for those.
+    """
+    sym = lookup_symbol(lib_id)
+    if sym.extends:
+        raise ValueError(f"{lib_id} extends another symbol; the stream backend can't embed it (use --backend ksa)")
+    return sym
+
+
+def _field_at(sym: LibSymbol, name: str, c: Component) -> Tuple[float, float, float]:
+    # the library offset turned with the symbol, the same placement kicad_sch_api uses
+    dx, dy, rot = sym.fields.get(name, (0.0, 0.0, 0.0))
+    dx, dy = rotate(dx, dy, c.rotation)
+    return c.position[0] + dx, c.position[1] + dy, (rot + int(c.rotation) % 360) % 360
+
+
+def _write_property(out: TextIO, name: str, value: str, at: Tuple[float, float, float], hide: bool) -> None:
+    x, y, r = at
+    out.write(
+        f"\t\t(property {sexpr_quote(name)} {sexpr_quote(value)}\n"
+        f"\t\t\t(at {sexpr_num(x)} {sexpr_num(y)} {sexpr_num(r)})\n"
+        "\t\t\t(effects\n\t\t\t\t(font\n\t\t\t\t\t(size 1.27 1.27)\n\t\t\t\t)\n"
+        + ("\t\t\t\t(hide yes)\n" if hide else "\t\t\t\t(justify left)\n")
+        + "\t\t\t)\n\t\t)\n"
+    )
+
+
+def _write_component(out: TextIO, c: Component, sym: LibSymbol, project: str, root: str, uid: str) -> None:
+    x, y = c.position
+    out.write(
+        f"\t(symbol\n\t\t(lib_id {sexpr_quote(c.lib_id)})\n"
+        f"\t\t(at {sexpr_num(x)} {sexpr_num(y)} {sexpr_num(c.rotation)})\n"
+        "\t\t(unit 1)\n\t\t(exclude_from_sim no)\n\t\t(in_bom yes)\n\t\t(on_board yes)\n"
+        "\t\t(dnp no)\n\t\t(fields_autoplaced no)\n"
+        f'\t\t(uuid "{uid}")\n'
+    )
+    _write_property(out, "Reference", c.ref, _field_at(sym, "Reference", c), False)
+    _write_property(out, "Value", c.value, _field_at(sym, "Value", c), False)
+    _write_property(out, "Footprint", c.footprint, _field_at(sym, "Footprint", c), True)
+    for pin in sym.pins:
+        out.write(f'\t\t(pin {sexpr_quote(pin)}\n\t\t\t(uuid "{stable_uuid(project, "symbol", c.ref, "pin", pin)}")\n\t\t)\n')
+    out.write(
+        f"\t\t(instances\n\t\t\t(project {sexpr_quote(project)}\n"
+        f'\t\t\t\t(path "/{root}"\n\t\t\t\t\t(reference {sexpr_quote(c.ref)})\n\t\t\t\t\t(unit 1)\n\t\t\t\t)\n'
+        "\t\t\t)\n\t\t)\n\t)\n"
+    )
+
+
+def _write_wire(out: TextIO, w: Wire, uid: str) -> None:
+    out.write(
+        f"\t(wire\n\t\t(pts\n\t\t\t(xy {sexpr_num(w.start[0])} {sexpr_num(w.start[1])}) (xy {sexpr_num(w.end[0])} {sexpr_num(w.end[1])})\n\t\t)\n"
+        f'\t\t(stroke\n\t\t\t(width 0)\n\t\t\t(type default)\n\t\t)\n\t\t(uuid "{uid}")\n\t)\n'
+    )
+
+
+def _write_label(out: TextIO, lb: Label, uid: str) -> None:
+    justify = "right bottom" if lb.rotation == 180 else "left bottom"
+    out.write(
+        f"\t(label {sexpr_quote(lb.text)}\n\t\t(at {sexpr_num(lb.position[0])} {sexpr_num(lb.position[1])} {sexpr_num(lb.rotation)})\n"
+        f"\t\t(effects\n\t\t\t(font\n\t\t\t\t(size 1.27 1.27)\n\t\t\t)\n\t\t\t(justify {justify})\n\t\t)\n"
+        f'\t\t(uuid "{uid}")\n\t)\n'
+    )
+
+
+def write_element(
+    out: TextIO,
+    design: SchematicDesign,
+    kind: str,
+    key: str,
+    el: Union[Component, Wire, Label],
+    root: str,
+    syms: Optional[Dict[str, LibSymbol]] = None,
+) -> None:
+    """
+    One top-level (symbol/wire/label ...) entry of design.elements(), under the sheet
+    uuid `root`; syms holds library symbols already looked up for this write.
+    """
+    uid = design.element_uuid(kind, key)
+    if kind == "symbol":
+        sym = syms[el.lib_id] if syms is not None and el.lib_id in syms else lib_symbol(el.lib_id)
+        _write_component(out, el, sym, design.name, root, uid)
+    elif kind == "wire":
+        _write_wire(out, el, uid)
+    else:
+        _write_label(out, el, uid)
+
+
+def write_schematic(design: SchematicDesign, out: TextIO, root_uuid: Optional[str] = None) -> None:
+    """Emit the design as a KiCad 9 .kicad_sch straight to `out` (same content as the ksa backend)."""
+    root = root_uuid or design.sheet_uuid
+    syms: Dict[str, LibSymbol] = {}
+    for c in design.components:
+        if c.lib_id not in syms:
+            syms[c.lib_id] = lib_symbol(c.lib_id)
+
+    out.write(
+        '(kicad_sch\n\t(version 20250114)\n\t(generator "eeschema")\n\t(generator_version "9.0")\n'
+        f'\t(uuid "{root}")\n\t(paper "A4")\n'
+        f"\t(title_block\n\t\t(title {sexpr_quote(design.name)})\n\t)\n\t(lib_symbols\n"
+    )
+    for sym in syms.values():
+        out.write(sym.block)
+    out.write("\t)\n")
+
+    for kind, key, el in design.elements():
+        write_element(out, design, kind, key, el, root, syms)
+    out.write(_SHEET_TAIL)
+
+
+@timed("schematic.save")
+def save_streaming(design: SchematicDesign, out_path: Path) -> None:
+    # resolve every symbol before opening the file, so a missing library leaves nothing half-written
+    for lib_id in dict.fromkeys(c.lib_id for c in design.components):
+        lib_symbol(lib_id)
+    with io.open(out_path, "w", encoding="utf-8", newline="\n", buffering=_WRITE_BUFFER) as fh:
+        write_schematic(design, fh)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence
+
+from pcbgen.ai_spec import SPEC_SCHEMA
+
+# Keys a spec must always have; everything else in SPEC_SCHEMA is optional
+# unless validating with strict=True (templates fall back to defaults).
+REQUIRED_KEYS = ("name", "type")
+
+
+@dataclass(frozen=True)
+class SpecError:
+    path: str  # e.g. "stage.in_cap.value" or "decoupling[1]"
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path or '<spec>'}: {self.message}"
+
+
+class SpecValidationError(ValueError):
+    def __init__(self, errors: Sequence[SpecError]):
+        self.errors = list(errors)
+        super().__init__("Invalid spec:\n  " + "\n  ".join(str(e) for e in self.errors))
+
+
+Check = Callable[[Any, str, List[SpecError]], None]
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    # bool is an int subclass, but true is not a pin count
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _type_name(v: Any) -> str:
+    return {dict: "object", list: "array", str: "string", bool: "boolean", type(None): "null"}.get(type(v), type(v).__name__)
+
+
+def compile_schema(schema: Dict[str, Any], strict: bool = True, required: Sequence[str] = ()) -> Check:
+    """
+    Turn a (JSON-Schema subset) dict into a nested check function, once.
+    Supports type, enum, properties, additionalProperties: false, required,
+    items, minItems and maxItems. Keys starting with "_" (run flags) are ignored.
+    With strict=False only `required` is enforced, at the top level.
+    """
+    checks: List[Check] = []
+
+    kind = schema.get("type")
+    if kind is not None:
+        is_kind = _TYPES[kind]
+
+        def check_type(v: Any, path: str, errors: List[SpecError]) -> bool:
+            if is_kind(v):
+                return True
+            errors.append(SpecError(path, f"expected {kind}, got {_type_name(v)}"))
+            return False
+    else:
+        check_type = None
+
+    if "enum" in schema:
+        allowed = tuple(schema["enum"])
+
+        def check_enum(v: Any, path: str, errors: List[SpecError]) -> None:
+            if v not in allowed:
+                errors.append(SpecError(path, f"must be one of {', '.join(map(str, allowed))} (got {v!r})"))
+
+        checks.append(check_enum)
+
+    if kind == "object":
+        props = {k: compile_schema(sub, strict) for k, sub in schema.get("properties", {}).items()}
+        closed = schema.get("additionalProperties", True) is False
+        must_have = tuple(schema.get("required", ())) if strict else tuple(required)
+
+        def check_object(v: Dict[str, Any], path: str, errors: List[SpecError]) -> None:
+            for key in must_have:
+                if key not in v:
+                    errors.append(SpecError(_join(path, key), "required key missing"))
+            for key, item in v.items():
+                sub = props.get(key)
+                if sub is not None:
+                    sub(item, _join(path, str(key)), errors)
+                elif closed and not str(key).startswith("_"):
+                    errors.append(SpecError(_join(path, str(key)), "unknown key"))
+
+        checks.append(check_object)
+
+    if kind == "array":
+        items = compile_schema(schema["items"], strict) if "items" in schema else None
+        lo = schema.get("minItems")
+        hi = schema.get("maxItems")
+
+        def check_array(v: List[Any], path: str, errors: List[SpecError]) -> None:
+            if lo is not None and len(v) < lo:
+                errors.append(SpecError(path, f"needs at least {lo} items (got {len(v)})"))
+            if hi is not None and len(v) > hi:
+                errors.append(SpecError(path, f"allows at most {hi} items (got {len(v)})"))
+            if items is not None:
+                for i, item in enumerate(v):
+                    items(item, f"{path}[{i}]", errors)
+
+        checks.append(check_array)
+
+    def check(v: Any, path: str, errors: List[SpecError]) -> None:
+        # nested checks only make sense once the type is right
+        if check_type is not None and not check_type(v, path, errors):
+            return
+        for c in checks:
+            c(v, path, errors)
+
+    return check
+
+
+@lru_cache(maxsize=None)
+def spec_validator(strict: bool = False) -> Check:
+    return compile_schema(SPEC_SCHEMA, strict=strict, required=REQUIRED_KEYS)
+
+
+def spec_errors(data: Any, strict: bool = False) -> List[SpecError]:
+    errors: List[SpecError] = []
+    spec_validator(strict)(data, "", errors)
+    return errors
+
+
+def check_spec(data: Any, strict: bool = False) -> None:
+    """Raise SpecValidationError (a ValueError) listing every problem with the spec."""
+    errors = spec_errors(data, strict)
+    if errors:
+        raise SpecValidationError(errors)
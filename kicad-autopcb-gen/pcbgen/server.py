@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import io
+import json
+import multiprocessing
+import re
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pcbgen.archive import ProjectArchive
+from pcbgen.batch import BatchOptions
+from pcbgen.cache import DiskCache
+from pcbgen.spec import project_spec_from_dict
+from pcbgen.kicad_project import MANIFEST_NAME, generate_project, project_cache_key, warm_up
+from pcbgen.ai_spec import spec_from_prompt
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.+-]+")
+
+
+class ServerBusy(Exception):
+    pass
+
+
+def _worker_generate(data: Dict[str, Any], out_dir: str, opts: BatchOptions) -> Tuple[str, float]:
+    # Runs inside a warm pool worker; returns (status, seconds).
+    t0 = time.perf_counter()
+    spec = project_spec_from_dict(data, use_ai=opts.use_ai, hint=opts.hint, layout_cache=opts.layout_cache)
+    cache = DiskCache(Path(opts.cache_dir), max_bytes=opts.cache_max_bytes) if opts.cache_dir else None
+    status = generate_project(spec, Path(out_dir), use_cache=opts.use_cache, cache=cache, backend=opts.backend, route=opts.route)
+    return status, time.perf_counter() - t0
+
+
+def _list_files(out_dir: Path) -> List[str]:
+    return sorted(p.name for p in out_dir.iterdir() if p.is_file() and p.name != MANIFEST_NAME)
+
+
+def zip_project(out_dir: Path) -> bytes:
+    buf = io.BytesIO()
+    with ProjectArchive(buf, "zip") as archive:
+        archive.add(out_dir.name, {name: (out_dir / name).read_bytes() for name in _list_files(out_dir)})
+    return buf.getvalue()
+
+
+class GenerationService:
+    """
+    Warm process pool behind the server. Each worker imports the templates and
+    kicad_sch_api once and keeps the symbol cache loaded; at most `workers`
+    projects are generated at a time and at most `max_pending` wait in line.
+
+    Output folders are keyed by the spec hash, so repeating a request hits the
+    output manifest and identical concurrent requests are serialized.
+    """
+
+    def __init__(self, out_root: Path, workers: int = 2, max_pending: Optional[int] = None, opts: Optional[BatchOptions] = None):
+        self.out_root = Path(out_root).expanduser().resolve()
+        self.out_root.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.opts = opts or BatchOptions()
+        # spawn, not fork: the HTTP server is threaded
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up,
+            initargs=(self.opts.backend,),
+        )
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * 4)
+        self._key_locks = [threading.Lock() for _ in range(64)]
+
+    def start(self) -> None:
+        # Bring every worker up (and warm) before the first request arrives.
+        for f in [self._pool.submit(time.sleep, 0.05) for _ in range(self.workers)]:
+            f.result()
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+
+    def generate(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one decoded request; raises ValueError for bad input, ServerBusy when the queue is full."""
+        if isinstance(request.get("spec"), dict):
+            data = dict(request["spec"])
+        elif isinstance(request.get("prompt"), str):
+            data = spec_from_prompt(request["prompt"])
+        else:
+            raise ValueError('Request needs "spec" (object) or "prompt" (string).')
+        opts = replace(
+            self.opts,
+            use_ai=bool(request.get("ai", self.opts.use_ai)),
+            hint=str(request.get("hint", self.opts.hint)),
+            route=bool(request.get("route", self.opts.route)),
+        )
+
+        # validates name/type up front and gives the content key for the output folder
+        key = project_cache_key(
+            project_spec_from_dict(dict(data), use_ai=opts.use_ai, hint=opts.hint, layout_cache=opts.layout_cache),
+            opts.backend,
+            opts.route,
+        )
+        out_dir = self.out_root / key[:16] / _SAFE_NAME.sub("_", str(data["name"]).strip())
+
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusy("Server busy, retry later.")
+        try:
+            t0 = time.perf_counter()
+            with self._key_locks[int(key[:8], 16) % len(self._key_locks)]:
+                status, gen_s = self._pool.submit(_worker_generate, data, str(out_dir), opts).result()
+        finally:
+            self._slots.release()
+
+        return {
+            "ok": True,
+            "status": status,
+            "out_dir": str(out_dir),
+            "files": _list_files(out_dir),
+            "generate_seconds": round(gen_s, 4),
+            "seconds": round(time.perf_counter() - t0, 4),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "pcbgen"
+    # both set on the per-server subclass
+    service: GenerationService
+    quiet = False
+
+    def address_string(self) -> str:
+        # client_address is a plain string on Unix sockets
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send(self, code: int, body: bytes, ctype: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code: int, obj: Dict[str, Any]) -> None:
+        self._send(code, json.dumps(obj).encode("utf-8"), "application/json")
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"ok": True, "workers": self.service.workers})
+        else:
+            self._send_json(404, {"ok": False, "error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/generate":
+            self._send_json(404, {"ok": False, "error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object.")
+            result = self.service.generate(request)
+        except ServerBusy as e:
+            self._send_json(503, {"ok": False, "error": str(e)})
+            return
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            self._send_json(500, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            return
+
+        if request.get("archive"):
+            out = Path(result["out_dir"])
+            self._send(
+                200,
+                zip_project(out),
+                "application/zip",
+                {
+                    "Content-Disposition": f'attachment; filename="{out.name}.zip"',
+                    "X-Pcbgen-Status": result["status"],
+                    "X-Pcbgen-Seconds": str(result["seconds"]),
+                },
+            )
+        else:
+            self._send_json(200, result)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    service: GenerationService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: Optional[str] = None,
+    quiet: bool = False,
+) -> socketserver.BaseServer:
+    handler = type("PcbgenHandler", (_Handler,), {"service": service, "quiet": quiet})
+    if unix_socket:
+        Path(unix_socket).unlink(missing_ok=True)
+        return _UnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    out_root: Path,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: Optional[str] = None,
+    workers: int = 2,
+    max_pending: Optional[int] = None,
+    opts: Optional[BatchOptions] = None,
+    quiet: bool = False,
+) -> None:
+    service = GenerationService(out_root, workers=workers, max_pending=max_pending, opts=opts)
+    service.start()
+    server = make_server(service, host, port, unix_socket, quiet)
+    where = unix_socket or f"http://{host}:{server.server_address[1]}"
+    print(f"pcbgen serving on {where} ({service.workers} workers, output in {service.out_root})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if unix_socket:
+            Path(unix_socket).unlink(missing_ok=True)
+
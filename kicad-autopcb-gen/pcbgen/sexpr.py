@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import mmap
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+_ATOM_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[^\s()"]+')
+_UNESCAPE_RE = re.compile(r"\\(.)")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+_DELIMS = (b" ", b"\t", b"\n", b"\r", b"(", b")")
+
+
+class Quoted(str):
+    """An atom that was a quoted string in the file (compares equal to the plain str)."""
+
+    __slots__ = ()
+
+
+Item = Union["Node", str]
+
+
+def _atom(raw: bytes) -> str:
+    if raw[:1] != b'"':
+        return raw.decode("utf-8")
+    text = raw[1:-1].decode("utf-8")
+    if "\\" in text:
+        text = _UNESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), text)
+    return Quoted(text)
+
+
+_CHUNK = 1 << 20  # bytes scanned per NumPy pass, so the temporaries stay small
+_FEW_KEYS = 64  # keyed_children: up to this many values are found with one regex
+
+
+def _paren_index(buf: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Positions of every ( and ) outside quoted strings, each one's depth, and the index
+    of its partner, all from NumPy passes over the buffer: quotes are found first (one
+    preceded by an odd run of backslashes is escaped), a paren is inside a string when
+    an odd number of quotes precede it, and sorting the parens by depth (stably) leaves
+    every ( right before its ).
+    """
+    idx = np.int32 if len(buf) < 2**31 else np.int64
+    quotes, parens = [], []
+    for off in range(0, len(buf), _CHUNK):
+        part = buf[off : off + _CHUNK]
+        quotes.append(np.flatnonzero(part == 0x22).astype(idx) + off)
+        parens.append(np.flatnonzero((part == 0x28) | (part == 0x29)).astype(idx) + off)
+    quote = np.concatenate(quotes) if quotes else np.zeros(0, dtype=idx)
+    pos = np.concatenate(parens) if parens else np.zeros(0, dtype=idx)
+    escaped = quote[(quote > 0) & (buf[np.maximum(quote - 1, 0)] == 0x5C)]
+    if len(escaped):
+        drop = []
+        for q in escaped.tolist():
+            run = 1
+            while q - run - 1 >= 0 and buf[q - run - 1] == 0x5C:
+                run += 1
+            if run % 2:
+                drop.append(q)
+        quote = np.setdiff1d(quote, np.array(drop, dtype=quote.dtype), assume_unique=True)
+    pos = pos[np.searchsorted(quote, pos) % 2 == 0]
+    del quote
+    step = np.where(buf[pos] == 0x28, 1, -1).astype(idx)
+    depth = np.cumsum(step, dtype=idx)
+    if len(pos) and (depth[-1] != 0 or depth.min() < 0):
+        raise ValueError("Unbalanced S-expression")
+    level = np.where(step > 0, depth, depth + 1).astype(idx)
+    del step, depth
+    order = np.argsort(level, kind="stable").astype(idx)
+    partner = np.empty(len(pos), dtype=idx)
+    partner[order[0::2]] = order[1::2]
+    partner[order[1::2]] = order[0::2]
+    return pos, level, partner
+
+
+class SexprDocument:
+    """
+    A KiCad S-expression file (.kicad_sch, .kicad_pcb, .kicad_sym, .kicad_mod; a
+    .kicad_pro is JSON) read in place. Opening maps the file and builds a bracket
+    index with NumPy; nothing is tokenised until a node is looked at, and each node
+    only tokenises its own atoms, skipping child subtrees through the index. Atoms
+    are str (Quoted for quoted strings), subtrees are Node.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, mmap.mmap], path: Optional[Path] = None) -> None:
+        self.path = path
+        self.data = data
+        self._buf = np.frombuffer(data, dtype=np.uint8)
+        error = None
+        try:
+            self._pos, self._level, self._partner = _paren_index(self._buf)
+            if not len(self._pos):
+                error = "not an S-expression"
+        except ValueError as e:
+            error = str(e)
+        if error:
+            # drop the view (and the traceback holding it) so the caller can close an mmap
+            self._buf = None  # type: ignore[assignment]
+            raise ValueError(f"{path or 'data'}: {error}")
+        self._mmap = data if isinstance(data, mmap.mmap) else None
+
+    @property
+    def root(self) -> "Node":
+        return Node(self, 0)
+
+    def close(self) -> None:
+        # the NumPy view has to go before the map can be closed
+        self._buf = self._pos = self._level = self._partner = None  # type: ignore[assignment]
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "SexprDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_sexpr(path: Path) -> SexprDocument:
+    """Map a KiCad file read-only; close the document (or use it as a context manager) when done."""
+    path = Path(path)
+    with path.open("rb") as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"{path}: empty file") from None
+    try:
+        return SexprDocument(mm, path)
+    except Exception:
+        mm.close()
+        raise
+
+
+class Node:
+    """One (...) of a SexprDocument. Its items (head first) are worked out on first use."""
+
+    __slots__ = ("doc", "index", "_items")
+
+    def __init__(self, doc: SexprDocument, index: int) -> None:
+        self.doc = doc
+        self.index = index  # paren number of the opening (
+        self._items: Optional[List[Item]] = None
+
+    @property
+    def start(self) -> int:
+        return int(self.doc._pos[self.index])
+
+    @property
+    def end(self) -> int:
+        # just past the closing )
+        return int(self.doc._pos[self.doc._partner[self.index]]) + 1
+
+    @property
+    def depth(self) -> int:
+        return int(self.doc._level[self.index])
+
+    def _child_opens(self) -> Iterator[int]:
+        partner = self.doc._partner
+        close = int(partner[self.index])
+        i = self.index + 1
+        while i < close:
+            yield i
+            i = int(partner[i]) + 1
+
+    def _spans(self) -> Iterator[Tuple[int, int, Optional[int]]]:
+        # (from, to, child): atoms in data[from:to], then the child opening at paren `child`
+        pos = self.doc._pos
+        at = self.start + 1
+        for i in self._child_opens():
+            yield at, int(pos[i]), i
+            at = int(pos[self.doc._partner[i]]) + 1
+        yield at, self.end - 1, None
+
+    @property
+    def items(self) -> List[Item]:
+        if self._items is None:
+            items: List[Item] = []
+            data = self.doc.data
+            for a, b, child in self._spans():
+                items += [_atom(m.group()) for m in _ATOM_RE.finditer(data, a, b)]
+                if child is not None:
+                    items.append(Node(self.doc, child))
+            self._items = items
+        return self._items
+
+    @property
+    def head(self) -> str:
+        """The first atom, e.g. "symbol" for (symbol ...); read without expanding the node."""
+        if self._items is not None:
+            first = self._items[0] if self._items else ""
+            return first if isinstance(first, str) else ""
+        nxt = self.index + 1
+        stop = int(self.doc._pos[nxt]) if nxt < len(self.doc._pos) else self.end - 1
+        m = _ATOM_RE.search(self.doc.data, self.start + 1, stop)
+        return _atom(m.group()) if m else ""
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, i: int) -> Item:
+        return self.items[i]
+
+    def __iter__(self) -> Iterator[Item]:
+        return iter(self.items)
+
+    def __repr__(self) -> str:
+        return f"<Node ({self.head} ...) at {self.start}>"
+
+    def children(self, head: Optional[str] = None) -> Iterator["Node"]:
+        """Child subtrees (with that head), without tokenising this node's atoms."""
+        if head is None:
+            for i in self._child_opens():
+                yield Node(self.doc, i)
+            return
+        # compare the bytes after "(" instead of tokenising every child's head
+        want = head.encode("utf-8")
+        data, pos, n = self.doc.data, self.doc._pos, len(want)
+        for i in self._child_opens():
+            at = int(pos[i]) + 1
+            if data[at : at + n] == want and data[at + n : at + n + 1] in _DELIMS:
+                yield Node(self.doc, i)
+
+    def _opens_at(self, level: int, head: Optional[str] = None) -> np.ndarray:
+        # paren numbers of the ( at `level` inside this node (whose head is `head`), via the index
+        doc = self.doc
+        lo, hi = self.index + 1, int(doc._partner[self.index])
+        pos = doc._pos[lo:hi]
+        found = np.flatnonzero((doc._level[lo:hi] == level) & (doc._buf[pos] == 0x28)) + lo
+        if head is None:
+            return found
+        want = np.frombuffer(head.encode("utf-8"), dtype=np.uint8)
+        window = doc._buf[np.minimum(doc._pos[found][:, None] + np.arange(1, len(want) + 2), len(doc._buf) - 1)]
+        hit = (window[:, :-1] == want).all(axis=1) & np.isin(window[:, -1], (0x20, 0x09, 0x0A, 0x0D, 0x28, 0x29))
+        return found[hit]
+
+    def last(self, head: str) -> Optional["Node"]:
+        """The last child with that head, found through the index rather than by walking the children."""
+        found = self._opens_at(self.depth + 1, head)
+        return Node(self.doc, int(found[-1])) if len(found) else None
+
+    def keyed_children(self, key: str = "uuid", values: Optional[Iterable[str]] = None) -> Dict[str, "Node"]:
+        """
+        Direct children by the value of their own (key "value") entry, e.g. every element
+        of a schematic by uuid. The grandchildren whose head is `key` are picked out of the
+        bracket index with NumPy, so only those entries are ever tokenised. With `values`,
+        only those are looked up, with one regex pass over the bytes, which beats
+        tokenising every entry while there are a few dozen of them.
+        """
+        doc, data = self.doc, self.doc.data
+        found: Dict[str, Node] = {}
+        if values is not None:
+            values = list(values)
+            if not values:
+                return found
+            if len(values) <= _FEW_KEYS:
+                # one regex pass for all of them; the index confirms each hit is a (key ...) of a child
+                pattern = re.compile(
+                    rb"\(" + re.escape(key.encode("utf-8")) + rb'\s+"?('
+                    + b"|".join(re.escape(v.encode("utf-8")) for v in values)
+                    + rb')"?\s*\)'
+                )
+                pos, level = doc._pos, doc._level
+                for m in pattern.finditer(data, self.start, self.end):
+                    i = int(np.searchsorted(pos, m.start()))
+                    value = m.group(1).decode("utf-8")
+                    if i >= len(pos) or pos[i] != m.start() or level[i] != self.depth + 2 or value in found:
+                        continue
+                    # everything between the child's ( and this entry is deeper, so walk back to it
+                    j = i - 1
+                    while level[j] != self.depth + 1:
+                        j -= 1
+                    found[value] = Node(doc, j)
+                return found
+        opens = self._opens_at(self.depth + 1)
+        entries = self._opens_at(self.depth + 2, key)
+        wanted = set(values) if values is not None else None
+        owners = opens[np.searchsorted(opens, entries, side="right") - 1].tolist()
+        starts = (doc._pos[entries] + len(key) + 1).tolist()
+        for i, at, end in zip(owners, starts, doc._pos[doc._partner[entries]].tolist()):
+            m = _ATOM_RE.search(data, at, end)
+            if m:
+                value = _atom(m.group())
+                if (wanted is None or value in wanted) and value not in found:
+                    found[value] = Node(doc, i)
+        return found
+
+    def find(self, head: str) -> Optional["Node"]:
+        return next(self.children(head), None)
+
+    def atoms(self) -> List[str]:
+        """The atoms after the head, e.g. ["R1"] for (property "Reference" "R1" ...) minus the name."""
+        return [x for x in self.items[1:] if isinstance(x, str)]
+
+    def get(self, head: str, default: Optional[str] = None) -> Optional[str]:
+        """First atom of the first (head ...) child: node.get("uuid") -> the uuid string."""
+        child = self.find(head)
+        values = child.atoms() if child is not None else []
+        return values[0] if values else default
+
+    def raw(self) -> memoryview:
+        """The node's bytes in the file, without copying."""
+        return memoryview(self.doc.data)[self.start : self.end]
+
+    def text(self) -> str:
+        return bytes(self.raw()).decode("utf-8")
+
+    def to_list(self) -> list:
+        """The whole subtree as nested lists of str (what a full parse gives)."""
+        return [x.to_list() if isinstance(x, Node) else x for x in self.items]
+
+
+def _diff_key(node: Node, seen: Dict[Tuple[str, str], int]) -> Tuple[str, str]:
+    # pair siblings by uuid where they have one, else by head and position among that head
+    uid = node.get("uuid")
+    if uid is not None:
+        return node.head, uid
+    ordinal = seen.get((node.head, ""), 0)
+    seen[(node.head, "")] = ordinal + 1
+    return node.head, f"#{ordinal}"
+
+
+def diff(a: Node, b: Node, path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], Optional[Node], Optional[Node]]]:
+    """
+    (path, old, new) for every subtree that differs between two documents: old is None
+    when added, new is None when removed. Identical subtrees are skipped by comparing
+    their bytes, so only the parts that changed are ever tokenised.
+    """
+    if a.raw() == b.raw():
+        return
+    path = path + (a.head,)
+    if a.atoms() != b.atoms():
+        yield path, a, b
+        return
+    seen_a: Dict[Tuple[str, str], int] = {}
+    seen_b: Dict[Tuple[str, str], int] = {}
+    old = {_diff_key(c, seen_a): c for c in a.children()}
+    new = {_diff_key(c, seen_b): c for c in b.children()}
+    for key, child in old.items():
+        if key not in new:
+            yield path + (child.head,), child, None
+        else:
+            yield from diff(child, new[key], path)
+    for key, child in new.items():
+        if key not in old:
+            yield path + (child.head,), None, child
@@ -1,17 +1,204 @@
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from __future__ import annotations
 
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
-@dataclass
+from pcbgen.schema import check_spec
+from pcbgen.trace import timed
+from pcbgen.units import Quantity, quantity
+
+# Every default the templates rely on lives here.
+DEFAULT_CAP_FOOTPRINT = "Capacitor_SMD:C_0603_1608Metric"
+DEFAULT_POWER_CAP_FOOTPRINT = "Capacitor_SMD:C_1210_3225Metric"
+DEFAULT_RES_FOOTPRINT = "Resistor_SMD:R_0603_1608Metric"
+DEFAULT_I2C_HEADER_FOOTPRINT = "Connector_PinHeader_2.54mm:PinHeader_1x04_P2.54mm_Vertical"
+DEFAULT_DEV_HEADER_FOOTPRINT = "Connector_PinHeader_2.54mm:PinHeader_1x15_P2.54mm_Vertical"
+DEFAULT_I2C_HEADER_PINS = ("VCC", "GND", "SDA", "SCL")
+
+_intern = sys.intern
+
+
+@dataclass(frozen=True, slots=True)
+class Part:
+    value: Quantity
+    footprint: str
+
+
+@dataclass(frozen=True, slots=True)
+class Power:
+    vcc: str = "+3V3"
+    vin: str = "VIN"
+    vout: str = "+5V"
+    gnd: str = "GND"
+
+
+@dataclass(frozen=True, slots=True)
+class I2CSection:
+    header_pins: Tuple[str, ...] = DEFAULT_I2C_HEADER_PINS
+    pullup: Quantity = quantity("4700")
+    add_pullups: bool = True
+    header_footprint: str = DEFAULT_I2C_HEADER_FOOTPRINT
+
+
+@dataclass(frozen=True, slots=True)
+class Header:
+    pins: int = 15
+    footprint: str = DEFAULT_DEV_HEADER_FOOTPRINT
+
+
+@dataclass(frozen=True, slots=True)
+class Stage:
+    in_cap: Part = Part(quantity("22u"), DEFAULT_POWER_CAP_FOOTPRINT)
+    out_cap: Part = Part(quantity("47u"), DEFAULT_POWER_CAP_FOOTPRINT)
+    rtop: Part = Part(quantity("100k"), DEFAULT_RES_FOOTPRINT)
+    rbot: Part = Part(quantity("20k"), DEFAULT_RES_FOOTPRINT)
+
+
+@dataclass(frozen=True, slots=True)
 class ProjectSpec:
+    """
+    A validated spec with every default applied, built once by project_spec_from_dict.
+    Values are pre-parsed Quantities, names are interned. `raw` is the dict it came
+    from (with the _use_ai / _hint / _layout_cache run flags), kept for the AI prompt.
+    """
+
     name: str
     type: str
-    raw: Dict[str, Any]
+    raw: Dict[str, Any] = field(compare=False, hash=False, repr=False)
+    power: Power = Power()
+    decoupling: Tuple[Part, ...] = ()
+    i2c: I2CSection = I2CSection()
+    left_header: Header = Header()
+    right_header: Header = Header()
+    stage: Stage = Stage()
+    use_ai: bool = False
+    hint: str = ""
+    layout_cache: bool = True
+    _key: str = field(default="", init=False, repr=False, compare=False, hash=False)
 
     @property
-    def power(self) -> Dict[str, Any]:
-        return self.raw.get("power", {})
+    def key(self) -> str:
+        """Stable content hash of the model (defaults applied), computed once, for caches."""
+        if not self._key:
+            from pcbgen.cache import canonical_digest
 
-    @property
-    def decoupling(self) -> List[Dict[str, Any]]:
-        return self.raw.get("decoupling", [])
+            plain = _plain(self)
+            # run flags: layout_cache only decides where an AI plan may come from, and
+            # without AI the hint is never read; neither changes what gets built
+            del plain["layout_cache"]
+            if not self.use_ai:
+                del plain["use_ai"], plain["hint"]
+            object.__setattr__(self, "_key", canonical_digest(plain))
+        return self._key
+
+
+def _plain(obj: Any) -> Any:
+    # model -> JSON-able structure for hashing (raw is left out: the model is what gets built)
+    if isinstance(obj, Quantity):
+        return obj.text
+    if hasattr(obj, "__slots__") and hasattr(obj, "__dataclass_fields__"):
+        return {k: _plain(getattr(obj, k)) for k in obj.__dataclass_fields__ if k not in ("raw", "_key")}
+    if isinstance(obj, tuple):
+        return [_plain(x) for x in obj]
+    return obj
+
+
+_DEFAULT_POWER = Power()
+_DEFAULT_STAGE = Stage()
+_DEFAULT_CAP = Part(quantity("100n"), DEFAULT_CAP_FOOTPRINT)
+
+
+@timed("spec.load")
+def load_spec_file(path: Path) -> Dict[str, Any]:
+    import yaml
+
+    # libyaml's loader when PyYAML was built with it; same result, much faster
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    data = yaml.load(Path(path).read_text(encoding="utf-8"), Loader=loader)
+    if not isinstance(data, dict):
+        raise ValueError("Spec YAML must be a mapping at the top level.")
+    return data
+
+
+def _part(d: Optional[Dict[str, Any]], default: Part) -> Part:
+    if not d:
+        return default
+    value = d.get("value")
+    fp = d.get("footprint")
+    return Part(
+        quantity(str(value)) if value is not None else default.value,
+        _intern(fp) if fp is not None else default.footprint,
+    )
+
+
+def _header(d: Optional[Dict[str, Any]]) -> Header:
+    d = d or {}
+    return Header(int(d.get("pins", 15)), _intern(d.get("footprint", DEFAULT_DEV_HEADER_FOOTPRINT)))
+
+
+@timed("spec.model")
+def project_spec_from_dict(
+    data: Dict[str, Any],
+    use_ai: bool = False,
+    hint: str = "",
+    layout_cache: bool = True,
+) -> ProjectSpec:
+    # Check against SPEC_SCHEMA before anything expensive runs
+    # (raises SpecValidationError, a ValueError, with every problem listed).
+    check_spec(data)
+
+    # stash flags in spec so templates can use them
+    data["_use_ai"] = bool(use_ai)
+    data["_hint"] = str(hint)
+    if not layout_cache:
+        data["_layout_cache"] = False
+
+    name = str(data.get("name", "")).strip()
+    board_type = str(data.get("type", "")).strip()
+    if not name or not board_type:
+        raise ValueError("Spec must include: name, type")
+
+    p = data.get("power") or {}
+    power = Power(
+        _intern(p.get("vcc_net", _DEFAULT_POWER.vcc)),
+        _intern(p.get("vin_net", _DEFAULT_POWER.vin)),
+        _intern(p.get("vout_net", _DEFAULT_POWER.vout)),
+        _intern(p.get("gnd_net", _DEFAULT_POWER.gnd)),
+    )
+
+    decoupling = tuple(_part(c, _DEFAULT_CAP) for c in data.get("decoupling") or ())
+
+    i2c = data.get("i2c") or {}
+    connectors = data.get("connectors") or {}
+    i2c_section = I2CSection(
+        tuple(_intern(str(x)) for x in i2c.get("header_pins", DEFAULT_I2C_HEADER_PINS)),
+        quantity(str(int(i2c.get("pullups_ohms", 4700)))),
+        bool(i2c.get("add_pullups", True)),
+        _intern(connectors.get("header_footprint", DEFAULT_I2C_HEADER_FOOTPRINT)),
+    )
+
+    headers = data.get("headers") or {}
+    stage = data.get("stage") or {}
+    defaults = _DEFAULT_STAGE
+
+    return ProjectSpec(
+        name=name,
+        type=board_type,
+        raw=data,
+        power=power,
+        decoupling=decoupling,
+        i2c=i2c_section,
+        left_header=_header(headers.get("left")),
+        right_header=_header(headers.get("right")),
+        stage=Stage(
+            _part(stage.get("in_cap"), defaults.in_cap),
+            _part(stage.get("out_cap"), defaults.out_cap),
+            _part(stage.get("feedback_rtop"), defaults.rtop),
+            _part(stage.get("feedback_rbot"), defaults.rbot),
+        ),
+        use_ai=bool(use_ai),
+        hint=str(hint),
+        layout_cache=bool(layout_cache),
+    )
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from pcbgen.design import DEFAULT_BACKEND, SchematicDesign, schematic_text
+from pcbgen.spec import ProjectSpec, project_spec_from_dict
+from pcbgen.kicad_project import project_cache_key, template_design, write_project_files
+
+if TYPE_CHECKING:
+    from pcbgen.netlist import Netlist
+    from pcbgen.router import Routing
+
+SWEEP_KEY = "sweep"
+SWEEP_INDEX = "sweep.json"
+# below this many schematic elements, writing a variant's schematic whole is cheaper than
+# patching the base (indexing it costs more than the few symbols there are to write)
+PATCH_MIN_ELEMENTS = 64
+
+# "power.vcc_net", "headers.left.pins", "decoupling[1].value": the paths spec errors use
+_STEP_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]")
+
+
+@dataclass
+class Variant:
+    index: int
+    folder: str
+    params: Dict[str, Any]
+    spec: ProjectSpec
+
+
+@dataclass
+class VariantResult:
+    folder: str
+    params: Dict[str, Any]
+    ok: bool
+    seconds: float
+    board: str = ""  # "placed", or "shared" when another variant's placement was reused
+    schematic: str = ""  # "patched" from the base schematic, or "written" in full
+    touched: int = 0  # schematic elements the patch rewrote, added or removed
+    error: str = ""
+
+
+def split_sweep(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Any]]]:
+    """The spec without its `sweep:` section, and the axes declared there (spec path -> values)."""
+    base = {k: v for k, v in data.items() if k != SWEEP_KEY}
+    axes = data.get(SWEEP_KEY)
+    if not isinstance(axes, dict) or not axes:
+        raise ValueError(f"A sweep spec needs a '{SWEEP_KEY}:' mapping of spec paths to lists of values.")
+    for path, values in axes.items():
+        _steps(str(path))
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"{SWEEP_KEY}.{path}: expected a non-empty list of values")
+    return base, {str(k): v for k, v in axes.items()}
+
+
+def _steps(path: str) -> List[Any]:
+    steps: List[Any] = []
+    pos = 0
+    while pos < len(path):
+        m = _STEP_RE.match(path, pos)
+        if m is None:
+            raise ValueError(f"{SWEEP_KEY}.{path}: not a spec path (e.g. power.vcc_net or decoupling[0].value)")
+        steps.append(m.group(1) if m.group(1) else int(m.group(2)))
+        pos = m.end()
+        if pos < len(path) and path[pos] == ".":
+            pos += 1
+    return steps
+
+
+def _with_value(node: Any, steps: List[Any], value: Any) -> Any:
+    # copy on write: only the containers along the path are copied, the rest is shared
+    if not steps:
+        return value
+    step, rest = steps[0], steps[1:]
+    if isinstance(step, int):
+        items = list(node) if isinstance(node, list) else []
+        if step >= len(items):
+            raise ValueError(f"index [{step}] is past the end of a {len(items)}-item list")
+        items[step] = _with_value(items[step], rest, value)
+        return items
+    out = dict(node) if isinstance(node, dict) else {}
+    out[step] = _with_value(out.get(step), rest, value)
+    return out
+
+
+def expand_sweep(base: Dict[str, Any], axes: Dict[str, List[Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(params, spec dict) for every combination of the axes, the last axis varying fastest."""
+    paths = list(axes)
+    steps = [_steps(p) for p in paths]
+    out = []
+    for combo in itertools.product(*(axes[p] for p in paths)):
+        data = base
+        for path, st, value in zip(paths, steps, combo):
+            try:
+                data = _with_value(data, st, value)
+            except ValueError as e:
+                raise ValueError(f"{SWEEP_KEY}.{path}: {e}") from None
+        out.append((dict(zip(paths, combo)), data))
+    return out
+
+
+def sweep_variants(data: Dict[str, Any], use_ai: bool = False, hint: str = "") -> Tuple[ProjectSpec, List[Variant]]:
+    """
+    The base spec and every variant of a sweep spec, each one validated, so a bad value
+    anywhere stops the sweep before anything is generated (ValueError naming the variant).
+    """
+    base_data, axes = split_sweep(data)
+    base = project_spec_from_dict(dict(base_data), use_ai=use_ai, hint=hint)
+    expanded = expand_sweep(base_data, axes)
+    width = len(str(len(expanded) - 1))
+    variants: List[Variant] = []
+    for i, (params, vdata) in enumerate(expanded):
+        try:
+            spec = project_spec_from_dict(dict(vdata), use_ai=use_ai, hint=hint)
+        except ValueError as e:
+            raise ValueError(f"variant {i} ({_describe(params)}): {e}") from None
+        variants.append(Variant(i, f"{base.name}-{i:0{width}d}", params, spec))
+    return base, variants
+
+
+def _describe(params: Dict[str, Any]) -> str:
+    return ", ".join(f"{k}={v}" for k, v in params.items())
+
+
+def _renamed(routing: Optional["Routing"], old: List[str], new: List[str]) -> Optional["Routing"]:
+    # tracks and vias carry net numbers, which a shared placement keeps; only names move
+    if routing is None:
+        return None
+    from pcbgen.router import Routing
+
+    index = {name: i for i, name in enumerate(old)}
+    return Routing(
+        routing.segments,
+        routing.vias,
+        sorted(new[index[n]] for n in routing.routed),
+        sorted(new[index[n]] for n in routing.failed),
+        0.0,
+    )
+
+
+def _run_chunk(
+    base_name: str,
+    base_sch: bytes,
+    base_digests: Optional[Dict[str, str]],
+    chunk: List[Tuple[Variant, SchematicDesign, "Netlist"]],
+    out_root: str,
+    backend: str,
+    route: bool,
+) -> List[VariantResult]:
+    # one worker's share: the base schematic is indexed once and every variant is a patch
+    # of it; consecutive variants with the same placement inputs share one placement
+    from pcbgen.pcb_placer import place_footprints, placement_inputs, reuse_layout
+    from pcbgen.pcb_writer import layout_text
+    from pcbgen.sch_update import patch_schematic
+    from pcbgen.sexpr import SexprDocument
+
+    doc = SexprDocument(base_sch) if base_digests is not None else None
+    placed = None  # (inputs, layout, routing) of the last placement
+    results: List[VariantResult] = []
+    for v, design, netlist in chunk:
+        t0 = time.perf_counter()
+        res = VariantResult(v.folder, v.params, False, 0.0)
+        try:
+            inputs = placement_inputs(design, netlist)
+            if placed is not None and placed[0] == inputs:
+                layout = reuse_layout(placed[1], design, netlist)
+                routing = _renamed(placed[2], placed[1].netlist.names, netlist.names)
+                res.board = "shared"
+            else:
+                layout = place_footprints(design, netlist=netlist)
+                routing = None
+                if route:
+                    from pcbgen.router import route_board
+
+                    routing = route_board(layout)
+                placed = (inputs, layout, routing)
+                res.board = "placed"
+            if doc is not None and design.name == base_name:
+                # uuids come from the project name, so only then does the base line up
+                sch, stats = patch_schematic(design, doc, base_digests)
+                res.schematic, res.touched = "patched", stats.touched
+            else:
+                sch = schematic_text(design, backend).encode("utf-8")
+                res.schematic = "written"
+            name = v.spec.name
+            files = {f"{name}.kicad_sch": sch, f"{name}.kicad_pcb": layout_text(layout, routing).encode("utf-8")}
+            # no manifest for a board with stub footprints: it isn't this spec's final output
+            key = project_cache_key(v.spec, backend, route) if all(fp.info is not None for fp in layout.footprints if fp.fpid) else None
+            write_project_files(Path(out_root) / v.folder, v.spec, files, key, design.digests())
+            res.ok = True
+        except Exception as e:
+            # one bad variant must not take the rest of the sweep down
+            res.error = f"{type(e).__name__}: {e}"
+        res.seconds = time.perf_counter() - t0
+        results.append(res)
+    return results
+
+
+def _chunks(variants: List[Variant], designs: List[SchematicDesign], workers: int) -> List[List[Tuple[Variant, SchematicDesign, "Netlist"]]]:
+    # variants with the same placement inputs go together (one placement each), split
+    # further only as far as it takes to keep every worker busy
+    from pcbgen.netlist import build_netlist
+    from pcbgen.pcb_placer import placement_inputs
+
+    groups: Dict[Tuple, List[Tuple[Variant, SchematicDesign, "Netlist"]]] = {}
+    for v, design in zip(variants, designs):
+        netlist = build_netlist(design)
+        groups.setdefault(placement_inputs(design, netlist), []).append((v, design, netlist))
+    size = max(1, -(-len(variants) // workers))
+    return [g[i : i + size] for g in groups.values() for i in range(0, len(g), size)]
+
+
+def run_sweep(
+    data: Dict[str, Any],
+    out_root: Path,
+    workers: Optional[int] = None,
+    backend: str = DEFAULT_BACKEND,
+    route: bool = False,
+    use_ai: bool = False,
+    hint: str = "",
+    on_result: Optional[Callable[[VariantResult], None]] = None,
+    patch_min_elements: int = PATCH_MIN_ELEMENTS,
+) -> List[VariantResult]:
+    """
+    Generate every variant of a sweep spec into its own project folder under out_root,
+    plus an index (SWEEP_INDEX) of folders, parameters and results. The base schematic
+    is built once and each variant's is a patch of it (pcbgen.sch_update) touching only
+    the elements its values changed; variants whose footprints and connectivity match
+    share one board placement (and routing). Chunks of variants run on `workers`
+    processes. Schematics under `patch_min_elements` elements are written whole instead.
+    Results are returned in variant order.
+    """
+    t0 = time.perf_counter()
+    base, variants = sweep_variants(data, use_ai=use_ai, hint=hint)
+    base_design = template_design(base)
+    digests: Optional[Dict[str, str]] = base_design.digests()
+    base_sch = b""
+    if len(digests) >= patch_min_elements:
+        base_sch = schematic_text(base_design, backend).encode("utf-8")
+    else:
+        digests = None
+    designs = [template_design(v.spec) for v in variants]
+
+    out_root = Path(out_root).expanduser().resolve()
+    out_root.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+    chunks = _chunks(variants, designs, workers)
+    args = (base.name, base_sch, digests)
+    opts = (str(out_root), backend, route)
+
+    results: Dict[str, VariantResult] = {}
+
+    def _done(batch: List[VariantResult]) -> None:
+        for res in batch:
+            results[res.folder] = res
+            if on_result:
+                on_result(res)
+
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            _done(_run_chunk(*args, chunk, *opts))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = {pool.submit(_run_chunk, *args, chunk, *opts): chunk for chunk in chunks}
+            for fut in as_completed(futures):
+                try:
+                    batch = fut.result()
+                except Exception as e:  # worker died (e.g. BrokenProcessPool)
+                    batch = [VariantResult(v.folder, v.params, False, 0.0, error=f"{type(e).__name__}: {e}") for v, _, _ in futures[fut]]
+                _done(batch)
+
+    ordered = [results[v.folder] for v in variants]
+    index = {
+        "name": base.name,
+        "type": base.type,
+        "axes": split_sweep(data)[1],
+        "total": len(ordered),
+        "ok": sum(1 for r in ordered if r.ok),
+        "failed": sum(1 for r in ordered if not r.ok),
+        "placements": sum(1 for r in ordered if r.board == "placed"),
+        "wall_seconds": round(time.perf_counter() - t0, 4),
+        "variants": [asdict(r) for r in ordered],
+    }
+    (out_root / SWEEP_INDEX).write_text(json.dumps(index, indent=2), encoding="utf-8")
+    return ordered
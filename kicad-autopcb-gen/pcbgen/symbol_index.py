@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pcbgen.cache import default_cache_dir, write_atomic
+
+# Same search order as kicad_sch_api, so both backends embed the same symbols.
+SYMBOL_DIR_ENV = ("KICAD_SYMBOL_DIR", "KICAD9_SYMBOL_DIR", "KICAD8_SYMBOL_DIR", "KICAD7_SYMBOL_DIR")
+DEFAULT_SYMBOL_DIRS = (
+    "/usr/share/kicad/symbols",
+    "/usr/local/share/kicad/symbols",
+    "~/.local/share/kicad/symbols",
+    "~/Documents/KiCad/symbols",
+    "~/Documents/kicad/symbols",
+    "~/kicad/symbols",
+)
+
+# Index file layout (little endian):
+#   header  magic, version, source size, source mtime_ns, source sha256, slot count
+#   slots   open-addressing table of (name hash, record offset, record length); hash 0 = empty
+#   records per symbol: meta length (u32), meta JSON (fields, pins, extends), block as UTF-8
+INDEX_VERSION = 2
+_MAGIC = b"PCBGSYM\0"
+_HEADER = struct.Struct("<8sIQQ32sI")
+_SLOT = struct.Struct("<QII")
+_META_LEN = struct.Struct("<I")
+
+# strings and parens: all it takes to find where an S-expression ends (sexpr_end)
+TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[()]')
+_SYMBOL_HEAD_RE = re.compile(r'\(symbol\s+"((?:[^"\\]|\\.)*)"\s')
+_FIELD_RE = re.compile(
+    r'\(property\s+"(Reference|Value|Footprint)"\s+"(?:[^"\\]|\\.)*"\s*\(at\s+(\S+)\s+(\S+)(?:\s+([^\s)]+))?\s*\)'
+)
+_PIN_NUMBER_RE = re.compile(r'\(number\s+"((?:[^"\\]|\\.)*)"')
+_EXTENDS_RE = re.compile(r"\(extends\s")
+
+
+@dataclass(frozen=True)
+class LibSymbol:
+    """A library symbol pre-rendered for a schematic's lib_symbols section."""
+
+    lib_id: str
+    block: str  # "\t\t(symbol "Lib:Name" ...)\n", ready to copy into the file
+    fields: Dict[str, Tuple[float, float, float]]  # Reference/Value/Footprint -> (x, y, rotation)
+    pins: Tuple[str, ...]  # pin numbers in library order
+    extends: bool = False  # derived symbol; needs its parent merged in, which we don't do
+
+
+def symbol_dirs() -> List[Path]:
+    dirs: List[Path] = []
+    for var in SYMBOL_DIR_ENV:
+        for part in (os.getenv(var) or "").split(os.pathsep):
+            if part.strip():
+                dirs.append(Path(part.strip()).expanduser())
+    dirs.extend(Path(d).expanduser() for d in DEFAULT_SYMBOL_DIRS)
+    return [d for d in dirs if d.is_dir()]
+
+
+def find_library(lib: str, name: str) -> Path:
+    # Lib.kicad_sym, or KiCad 9's Lib.kicad_symdir/Name.kicad_sym
+    for d in symbol_dirs():
+        single = d / f"{lib}.kicad_symdir" / f"{name}.kicad_sym"
+        if single.is_file():
+            return single
+        lib_file = d / f"{lib}.kicad_sym"
+        if lib_file.is_file():
+            return lib_file
+    raise ValueError(f"Symbol library {lib!r} not found; set KICAD_SYMBOL_DIR to your KiCad symbols folder.")
+
+
+def _library_name(path: Path) -> str:
+    return path.parent.stem if path.parent.suffix == ".kicad_symdir" else path.stem
+
+
+def sexpr_end(text: str, start: int) -> int:
+    """Index just past the ")" closing the "(" at text[start]; quoted strings are skipped."""
+    depth = 0
+    for m in TOKEN_RE.finditer(text, start):
+        tok = m.group()
+        if tok == "(":
+            depth += 1
+        elif tok == ")":
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError("Unbalanced S-expression")
+
+
+def sexpr_num(v: float) -> str:
+    """A coordinate the way KiCad writes it: at most 4 decimals, no trailing zeros, never "-0"."""
+    s = f"{round(v, 4):.4f}".rstrip("0").rstrip(".")
+    return "0" if s == "-0" else s
+
+
+def sexpr_quote(s: str) -> str:
+    """A quoted S-expression string."""
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def top_level_symbols(text: str) -> Iterator[Tuple[str, int, int]]:
+    """(name, start, end) of every top-level (symbol ...) in a .kicad_sym file, in one pass."""
+    depth = 0
+    start = -1
+    for m in TOKEN_RE.finditer(text):
+        tok = m.group()
+        if tok == "(":
+            depth += 1
+            if depth == 2:
+                start = m.start()
+        elif tok == ")":
+            if depth == 2 and start >= 0:
+                head = _SYMBOL_HEAD_RE.match(text, start)
+                if head:
+                    yield head.group(1), start, m.end()
+                start = -1
+            depth -= 1
+
+
+def render_symbol(lib: str, name: str, body: str) -> LibSymbol:
+    lib_id = f"{lib}:{name}"
+    head = _SYMBOL_HEAD_RE.match(body)
+    body = f'(symbol "{lib_id}"' + body[head.end() - 1 :]
+    # library files sit one tab deep; lib_symbols entries sit two deep
+    block = "\t\t" + body.replace("\n", "\n\t") + "\n"
+
+    fields: Dict[str, Tuple[float, float, float]] = {}
+    for fm in _FIELD_RE.finditer(body):
+        fields.setdefault(fm.group(1), (float(fm.group(2)), float(fm.group(3)), float(fm.group(4) or 0)))
+    pins = tuple(dict.fromkeys(_PIN_NUMBER_RE.findall(body)))
+    return LibSymbol(lib_id, block, fields, pins, bool(_EXTENDS_RE.search(body)))
+
+
+def _name_hash(name: str) -> int:
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def _encode(sym: LibSymbol) -> bytes:
+    # the block stays raw text so a lookup only decodes the small meta part as JSON
+    meta = json.dumps([sym.fields, sym.pins, sym.extends], separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return _META_LEN.pack(len(meta)) + meta + sym.block.encode("utf-8")
+
+
+def _build(source: Path, st: os.stat_result, text: bytes) -> bytes:
+    lib = _library_name(source)
+    decoded = text.decode("utf-8")
+    records: List[Tuple[int, bytes]] = []
+    seen = set()
+    for name, start, end in top_level_symbols(decoded):
+        if name not in seen:
+            seen.add(name)
+            records.append((_name_hash(name), _encode(render_symbol(lib, name, decoded[start:end]))))
+
+    nslots = 8
+    while nslots < 2 * len(records):
+        nslots *= 2
+    slots = [(0, 0, 0)] * nslots
+    offset = _HEADER.size + nslots * _SLOT.size
+    blob = bytearray()
+    for h, rec in records:
+        i = h & (nslots - 1)
+        while slots[i][0]:
+            i = (i + 1) & (nslots - 1)
+        slots[i] = (h, offset + len(blob), len(rec))
+        blob += rec
+
+    header = _HEADER.pack(_MAGIC, INDEX_VERSION, st.st_size, st.st_mtime_ns, hashlib.sha256(text).digest(), nslots)
+    return header + b"".join(_SLOT.pack(*s) for s in slots) + bytes(blob)
+
+
+class SymbolIndex:
+    """
+    Read-only view of one library's index file; lookups hash the name and probe the
+    mmap'd table. Decoded symbols are kept for the life of the view, which open_index
+    replaces once the library changes.
+    """
+
+    def __init__(self, source: Path, path: Path) -> None:
+        self.source = source
+        self.path = path
+        self.lib = _library_name(source)
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._nslots = _HEADER.unpack_from(self._mm, 0)[5]
+        self._memo: Dict[str, Optional[LibSymbol]] = {}
+
+    def get(self, name: str) -> Optional[LibSymbol]:
+        if name not in self._memo:
+            self._memo[name] = self._probe(name)
+        return self._memo[name]
+
+    def _probe(self, name: str) -> Optional[LibSymbol]:
+        h = _name_hash(name)
+        mask = self._nslots - 1
+        i = h & mask
+        while True:
+            slot_h, off, length = _SLOT.unpack_from(self._mm, _HEADER.size + i * _SLOT.size)
+            if slot_h == 0:
+                return None
+            if slot_h == h:
+                (meta_len,) = _META_LEN.unpack_from(self._mm, off)
+                block = self._mm[off + 4 + meta_len : off + length].decode("utf-8")
+                lib_id = f"{self.lib}:{name}"
+                # a hash collision would hand back another symbol's block
+                if block.startswith(f'\t\t(symbol "{lib_id}"'):
+                    fields, pins, extends = json.loads(self._mm[off + 4 : off + 4 + meta_len])
+                    return LibSymbol(lib_id, block, {k: tuple(v) for k, v in fields.items()}, tuple(pins), extends)
+            i = (i + 1) & mask
+
+    def __len__(self) -> int:
+        return sum(1 for i in range(self._nslots) if _SLOT.unpack_from(self._mm, _HEADER.size + i * _SLOT.size)[0])
+
+
+def symbol_index_dir() -> Path:
+    env = os.getenv("PCBGEN_SYMBOL_INDEX_DIR")
+    return Path(env).expanduser() if env else default_cache_dir() / "symbols"
+
+
+def _index_path(source: Path) -> Path:
+    digest = hashlib.sha256(str(source.resolve()).encode("utf-8")).hexdigest()[:24]
+    return symbol_index_dir() / f"{source.stem}-{digest}.idx"
+
+
+def _header_state(path: Path) -> Optional[Tuple[int, int, bytes]]:
+    try:
+        with open(path, "rb") as fh:
+            raw = fh.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(raw) < _HEADER.size:
+        return None
+    magic, version, size, mtime_ns, sha, _ = _HEADER.unpack(raw)
+    if magic != _MAGIC or version != INDEX_VERSION:
+        return None
+    return size, mtime_ns, sha
+
+
+def ensure_index(source: Path) -> Path:
+    """
+    Index file for `source`, (re)built when missing or stale. A changed size or mtime
+    triggers a sha256 check of the library; only changed content is re-parsed
+    (a touched but identical file just gets its recorded mtime refreshed).
+    """
+    source = Path(source)
+    dest = _index_path(source)
+    st = source.stat()
+    state = _header_state(dest)
+    if state is not None and state[:2] == (st.st_size, st.st_mtime_ns):
+        return dest
+
+    text = source.read_bytes()
+    if state is not None and state[2] == hashlib.sha256(text).digest():
+        data = bytearray(dest.read_bytes())
+        _HEADER.pack_into(data, 0, _MAGIC, INDEX_VERSION, st.st_size, st.st_mtime_ns, state[2], _HEADER.unpack_from(data, 0)[5])
+        write_atomic(dest, bytes(data))
+    else:
+        write_atomic(dest, _build(source, st, text))
+    return dest
+
+
+_OPEN: Dict[str, Tuple[Tuple[int, int], SymbolIndex]] = {}
+_OPEN_MAX = 256
+
+
+def open_index(source: str) -> SymbolIndex:
+    """
+    The open index of one library, kept per process. Each call stats the library, and
+    a changed size or mtime goes back through ensure_index, so a long-lived process
+    (pcbgen watch) sees library edits without reopening every index on each lookup.
+    """
+    st = os.stat(source)
+    stamp = (st.st_size, st.st_mtime_ns)
+    hit = _OPEN.get(source)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    path = Path(source)
+    index = SymbolIndex(path, ensure_index(path))
+    if hit is None and len(_OPEN) >= _OPEN_MAX:
+        del _OPEN[next(iter(_OPEN))]
+    _OPEN[source] = (stamp, index)
+    return index
+
+
+# (lib, name, symbol dir variables) -> library file; searching the dirs costs far more than the lookup
+_SOURCES: Dict[Tuple[str, str, Tuple[Optional[str], ...]], str] = {}
+
+
+def lookup_symbol(lib_id: str) -> LibSymbol:
+    """The symbol as the library has it now; an edited library is re-indexed on the next call."""
+    lib, _, name = lib_id.partition(":")
+    if not name:
+        raise ValueError(f"Bad lib_id {lib_id!r} (expected Library:Symbol)")
+    where = (lib, name, tuple(os.getenv(var) for var in SYMBOL_DIR_ENV))
+    source = _SOURCES.get(where)
+    index = None
+    if source is not None:
+        try:
+            index = open_index(source)
+        except OSError:
+            pass  # moved or deleted: search again
+    if index is None:
+        source = _SOURCES[where] = str(find_library(lib, name))
+        index = open_index(source)
+    sym = index.get(name)
+    if sym is None:
+        raise ValueError(f"Symbol {name!r} not found in {source}")
+    return sym
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+# Schematic grid (50 mil). Symbol origins placed on it keep every pin end on it too.
+GRID = 1.27
+
+BBox = Tuple[float, float, float, float]  # x1, y1, x2, y2
+
+
+def rotate(dx: float, dy: float, rotation: float) -> Tuple[float, float]:
+    """An offset from a symbol origin turned with the symbol (multiples of 90 degrees)."""
+    r = int(rotation) % 360
+    if r == 90:
+        return -dy, dx
+    if r == 180:
+        return -dx, -dy
+    if r == 270:
+        return dy, -dx
+    return dx, dy
+
+
+def snap(v: float, grid: float = GRID) -> float:
+    return round(round(v / grid) * grid, 4)
+
+
+@dataclass(frozen=True)
+class SymbolGeometry:
+    """
+    Geometry of a library symbol as placed in a schematic at rotation 0:
+    millimetres relative to the symbol origin, y pointing down (library files
+    use y up, so pin y values are negated here).
+    """
+
+    lib_id: str
+    body: BBox
+    pins: Dict[str, Tuple[float, float]]  # pin number -> connection point
+    pin_sides: Dict[str, str]  # pin number -> "left" / "right" / "top" / "bottom"
+
+    @property
+    def bbox(self) -> BBox:
+        xs = [self.body[0], self.body[2]] + [p[0] for p in self.pins.values()]
+        ys = [self.body[1], self.body[3]] + [p[1] for p in self.pins.values()]
+        return (min(xs), min(ys), max(xs), max(ys))
+
+
+def conn_lib_id(pins: int) -> str:
+    return f"Connector_Generic:Conn_01x{int(pins):02d}"
+
+
+_CONN_RE = re.compile(r"^Connector_Generic:Conn_01x(\d+)$")
+
+
+def _conn_1xn(lib_id: str, n: int) -> SymbolGeometry:
+    # KiCad's generated 1xN connectors: pins on the left at x=-5.08, 2.54 pitch,
+    # pin 1 at lib y = 2.54 * floor((n - 1) / 2).
+    top = 2.54 * ((n - 1) // 2)
+    pins = {str(i + 1): (-5.08, round(-(top - 2.54 * i), 4)) for i in range(n)}
+    body = (-1.27, round(-(top + 1.27), 4), 1.27, round(-(top - 2.54 * (n - 1) - 1.27), 4))
+    return SymbolGeometry(lib_id, body, pins, {p: "left" for p in pins})
+
+
+_FIXED: Dict[str, SymbolGeometry] = {
+    "Device:C": SymbolGeometry(
+        "Device:C",
+        (-2.032, -0.762, 2.032, 0.762),
+        {"1": (0.0, -3.81), "2": (0.0, 3.81)},
+        {"1": "top", "2": "bottom"},
+    ),
+    "Device:R": SymbolGeometry(
+        "Device:R",
+        (-1.016, -2.54, 1.016, 2.54),
+        {"1": (0.0, -3.81), "2": (0.0, 3.81)},
+        {"1": "top", "2": "bottom"},
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def symbol_geometry(lib_id: str) -> SymbolGeometry:
+    if lib_id in _FIXED:
+        return _FIXED[lib_id]
+    m = _CONN_RE.match(lib_id)
+    if m and int(m.group(1)) >= 1:
+        return _conn_1xn(lib_id, int(m.group(1)))
+    raise KeyError(f"No geometry for symbol {lib_id!r}")
@@ -1,46 +1,43 @@
 from __future__ import annotations
 
 from pcbgen.spec import ProjectSpec
-import kicad_sch_api as ksa
+from pcbgen.design import DEFAULT_BACKEND, SchematicDesign, save_design
+from pcbgen.placer import Cell, Group, place
+from pcbgen.trace import timed
 
 
-def build_buck_schematic(spec: ProjectSpec, out_path) -> None:
-    p = spec.power
-    vin = p.get("vin_net", "VIN")
-    vout = p.get("vout_net", "+5V")
-    gnd = p.get("gnd_net", "GND")
-
-    stage = spec.raw.get("stage", {})
-    sch = ksa.create_schematic(spec.name)
+@timed("schematic.design")
+def buck_design(spec: ProjectSpec) -> SchematicDesign:
+    vin = spec.power.vin
+    vout = spec.power.vout
+    gnd = spec.power.gnd
+    stage = spec.stage
 
     # Generic “controller” block as connector so it works with stock libs
-    u1 = sch.components.add(
-        "Connector_Generic:Conn_01x05",
+    # (pins: 1 VIN, 2 GND, 3 SW (unused here), 4 FB, 5 VOUT)
+    u1 = Cell(
         "U1",
+        "Connector_Generic:Conn_01x05",
         "BUCK_CTRL",
-        position=(60, 60),
-        footprint="Connector_PinHeader_2.54mm:PinHeader_1x05_P2.54mm_Vertical",
+        "Connector_PinHeader_2.54mm:PinHeader_1x05_P2.54mm_Vertical",
+        {"1": vin, "2": gnd, "4": "FB", "5": vout},
+        stub=5.08,
     )
 
-    # Power stage passives (template)
-    cin = stage.get("in_cap", {"value": "22u"})
-    cout = stage.get("out_cap", {"value": "47u"})
-    rtop = stage.get("feedback_rtop", {"value": "100k"})
-    rbot = stage.get("feedback_rbot", {"value": "20k"})
-
-    sch.components.add("Device:C", "CIN", cin.get("value", "22u"), position=(100, 55),
-                       footprint=cin.get("footprint", "Capacitor_SMD:C_1210_3225Metric"))
-    sch.components.add("Device:C", "COUT", cout.get("value", "47u"), position=(100, 75),
-                       footprint=cout.get("footprint", "Capacitor_SMD:C_1210_3225Metric"))
+    # Power stage passives (defaults filled in by the spec model)
+    caps = [
+        Cell("CIN", "Device:C", str(stage.in_cap.value), stage.in_cap.footprint, {"1": vin, "2": gnd}),
+        Cell("COUT", "Device:C", str(stage.out_cap.value), stage.out_cap.footprint, {"1": vout, "2": gnd}),
+    ]
+    divider = [
+        Cell("RFB1", "Device:R", str(stage.rtop.value), stage.rtop.footprint, {"1": vout, "2": "FB"}),
+        Cell("RFB2", "Device:R", str(stage.rbot.value), stage.rbot.footprint, {"1": "FB", "2": gnd}),
+    ]
 
-    sch.components.add("Device:R", "RFB1", rtop.get("value", "100k"), position=(130, 65),
-                       footprint=rtop.get("footprint", "Resistor_SMD:R_0603_1608Metric"))
-    sch.components.add("Device:R", "RFB2", rbot.get("value", "20k"), position=(130, 75),
-                       footprint=rbot.get("footprint", "Resistor_SMD:R_0603_1608Metric"))
+    return place(spec.name, [Group("controller", [u1]), Group("stage", caps), Group("feedback", divider)])
 
-    # Nets
-    sch.labels.add(vin, position=(40, 55))
-    sch.labels.add(vout, position=(160, 75))
-    sch.labels.add(gnd, position=(40, 80))
 
-    sch.save(str(out_path))
+def build_buck_schematic(spec: ProjectSpec, out_path, backend: str = DEFAULT_BACKEND) -> SchematicDesign:
+    design = buck_design(spec)
+    save_design(design, out_path, backend)
+    return design
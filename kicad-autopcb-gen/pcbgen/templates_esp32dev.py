@@ -1,53 +1,40 @@
 from __future__ import annotations
 
 from pcbgen.spec import ProjectSpec
-import kicad_sch_api as ksa
+from pcbgen.design import DEFAULT_BACKEND, SchematicDesign, save_design
+from pcbgen.placer import Cell, Group, place
+from pcbgen.trace import timed
+from pcbgen.symbols import conn_lib_id
 
 
-def build_esp32dev_schematic(spec: ProjectSpec, out_path) -> None:
-    vcc = spec.power.get("vcc_net", "+3V3")
-
-    headers = spec.raw.get("headers", {})
-    left = headers.get("left", {})
-    right = headers.get("right", {})
-
-    left_pins = int(left.get("pins", 15))
-    right_pins = int(right.get("pins", 15))
-    left_fp = left.get("footprint", "Connector_PinHeader_2.54mm:PinHeader_1x15_P2.54mm_Vertical")
-    right_fp = right.get("footprint", "Connector_PinHeader_2.54mm:PinHeader_1x15_P2.54mm_Vertical")
-
-    sch = ksa.create_schematic(spec.name)
+@timed("schematic.design")
+def esp32dev_design(spec: ProjectSpec) -> SchematicDesign:
+    vcc = spec.power.vcc
+    gnd = spec.power.gnd
+    left = spec.left_header
+    right = spec.right_header
 
     # “Devboard” is modeled as two headers + a 3V3 rail w/ decoupling.
-    jl = sch.components.add(
-        f"Connector_Generic:Conn_01x{left_pins}",
-        "J1",
-        "LEFT_HDR",
-        position=(60, 60),
-        footprint=left_fp,
-    )
-    jr = sch.components.add(
-        f"Connector_Generic:Conn_01x{right_pins}",
-        "J2",
-        "RIGHT_HDR",
-        position=(140, 60),
-        footprint=right_fp,
-    )
-
-    # Power labels
-    sch.labels.add(vcc, position=(90, 45))
-    sch.labels.add("GND", position=(90, 50))
-
-    # Decoupling near the “module”
-    for idx, cap in enumerate(spec.decoupling, start=1):
-        sch.components.add(
-            "Device:C",
+    # Pin 1 of the left header carries the rail, pin 1 of the right one ground.
+    jl = Cell("J1", conn_lib_id(left.pins), "LEFT_HDR", left.footprint, {"1": vcc}, stub=5.08)
+    jr = Cell("J2", conn_lib_id(right.pins), "RIGHT_HDR", right.footprint, {"1": gnd}, stub=5.08)
+
+    # Decoupling between the two headers
+    caps = [
+        Cell(
             f"C{idx}",
-            cap.get("value", "100n"),
-            position=(90, 60 + 7 * (idx - 1)),
-            footprint=cap.get("footprint", "Capacitor_SMD:C_0603_1608Metric"),
+            "Device:C",
+            str(cap.value),
+            cap.footprint,
+            {"1": vcc, "2": gnd},
         )
-        sch.labels.add(vcc, position=(80, 60 + 7 * (idx - 1)))
-        sch.labels.add("GND", position=(100, 60 + 7 * (idx - 1)))
+        for idx, cap in enumerate(spec.decoupling, start=1)
+    ]
+
+    return place(spec.name, [Group("left_header", [jl]), Group("decoupling", caps), Group("right_header", [jr])])
+
 
-    sch.save(str(out_path))
+def build_esp32dev_schematic(spec: ProjectSpec, out_path, backend: str = DEFAULT_BACKEND) -> SchematicDesign:
+    design = esp32dev_design(spec)
+    save_design(design, out_path, backend)
+    return design
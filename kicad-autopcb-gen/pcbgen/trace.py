@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+# Stage timing for generation runs. Library code marks its stages with `stage(name)` or
+# `@timed(name)`; while no Recorder is active and no hook is registered a stage is one
+# global check, so the marks stay in the hot paths.
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class StageEvent:
+    name: str  # e.g. "spec.load", "layout.plan", "schematic.save"
+    start: float  # time.perf_counter(), the same clock in every process on the machine
+    seconds: float
+    depth: int  # nesting level within the run
+    pid: int
+    tid: int
+    peak_bytes: Optional[int] = None  # Python allocations above the start of the stage, when recording memory
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class Recorder:
+    """Collects the StageEvents of everything run while it is active (see recording())."""
+
+    def __init__(self, memory: bool = False) -> None:
+        self.memory = memory
+        self.events: List[StageEvent] = []
+
+
+_recorders: List[Recorder] = []
+_hooks: List[Callable[[StageEvent], None]] = []
+_enabled = False
+_local = threading.local()  # per-thread stack of open stages
+_NOOP = nullcontext()
+
+
+def _refresh() -> None:
+    global _enabled
+    _enabled = bool(_recorders or _hooks)
+
+
+def add_hook(hook: Callable[[StageEvent], None]) -> None:
+    """Call `hook` with every finished stage, recorded or not (metrics, logging)."""
+    _hooks.append(hook)
+    _refresh()
+
+
+def remove_hook(hook: Callable[[StageEvent], None]) -> None:
+    _hooks.remove(hook)
+    _refresh()
+
+
+@contextmanager
+def recording(memory: bool = False) -> Iterator[Recorder]:
+    """
+    Record every stage run inside the block (in this process). memory=True also tracks
+    each stage's peak Python memory with tracemalloc, which slows the run down a lot.
+    """
+    rec = Recorder(memory)
+    started = False
+    if memory:
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started = True
+    _recorders.append(rec)
+    _refresh()
+    try:
+        yield rec
+    finally:
+        _recorders.remove(rec)
+        _refresh()
+        if started:
+            tracemalloc.stop()
+
+
+class _Stage:
+    __slots__ = ("name", "args", "start", "base", "peak")
+
+    def __init__(self, name: str, args: Dict[str, Any]) -> None:
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Stage":
+        stack = _local.__dict__.setdefault("stack", [])
+        self.base = self.peak = None
+        if _recorders and _recorders[-1].memory:
+            import tracemalloc
+
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1].peak is not None:
+                # tracemalloc has one peak: fold it into the parent's before taking it over
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.base = self.peak = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        peak_bytes = None
+        if self.base is not None:
+            import tracemalloc
+
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = self.peak - self.base
+            if stack and stack[-1].peak is not None:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            tracemalloc.reset_peak()
+        event = StageEvent(self.name, self.start, seconds, len(stack), os.getpid(), threading.get_native_id(), peak_bytes, self.args)
+        if _recorders:
+            _recorders[-1].events.append(event)
+        for hook in list(_hooks):
+            hook(event)
+
+
+def stage(name: str, **args: Any):
+    """Context manager timing one stage; `args` end up in the trace (e.g. source=...)."""
+    if not _enabled:
+        return _NOOP
+    return _Stage(name, args)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of stage() for a function that is a stage as a whole."""
+
+    def wrap(fn: F) -> F:
+        @functools.wraps(fn)
+        def inner(*a: Any, **kw: Any) -> Any:
+            if not _enabled:
+                return fn(*a, **kw)
+            with _Stage(name, {}):
+                return fn(*a, **kw)
+
+        return inner  # type: ignore[return-value]
+
+    return wrap
+
+
+def _self_seconds(events: List[StageEvent]) -> List[float]:
+    # each stage's time minus its direct children's, per process and thread
+    own = [e.seconds for e in events]
+    open_: Dict[tuple, List[int]] = {}
+    for i in sorted(range(len(events)), key=lambda i: (events[i].start, events[i].depth)):
+        e = events[i]
+        stack = open_.setdefault((e.pid, e.tid), [])
+        while stack and events[stack[-1]].start + events[stack[-1]].seconds <= e.start:
+            stack.pop()
+        if stack and events[stack[-1]].depth < e.depth:
+            own[stack[-1]] -= e.seconds
+        stack.append(i)
+    return own
+
+
+def summarize(events: Iterable[StageEvent]) -> List[Dict[str, Any]]:
+    """
+    Per stage name: calls, total/self/mean/max seconds (self leaves out nested stages)
+    and the largest peak, by total time.
+    """
+    events = list(events)
+    rows: Dict[str, Dict[str, Any]] = {}
+    for e, own in zip(events, _self_seconds(events)):
+        r = rows.setdefault(e.name, {"stage": e.name, "calls": 0, "total_s": 0.0, "self_s": 0.0, "max_s": 0.0, "peak_bytes": None})
+        r["calls"] += 1
+        r["total_s"] += e.seconds
+        r["self_s"] += own
+        r["max_s"] = max(r["max_s"], e.seconds)
+        if e.peak_bytes is not None:
+            r["peak_bytes"] = max(r["peak_bytes"] or 0, e.peak_bytes)
+    for r in rows.values():
+        r["mean_s"] = r["total_s"] / r["calls"]
+    return sorted(rows.values(), key=lambda r: -r["total_s"])
+
+
+def format_summary(events: Iterable[StageEvent]) -> str:
+    rows = summarize(events)
+    memory = any(r["peak_bytes"] is not None for r in rows)
+    lines = [f"{'stage':<24} {'calls':>6} {'total ms':>10} {'self ms':>9} {'mean ms':>9} {'max ms':>9}" + (f" {'peak MB':>8}" if memory else "")]
+    for r in rows:
+        line = (
+            f"{r['stage']:<24} {r['calls']:>6} {r['total_s'] * 1000:10.1f} {r['self_s'] * 1000:9.1f} "
+            f"{r['mean_s'] * 1000:9.2f} {r['max_s'] * 1000:9.2f}"
+        )
+        if memory:
+            line += f" {r['peak_bytes'] / 1e6:8.2f}" if r["peak_bytes"] is not None else f" {'':>8}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def slowest(events: Iterable[StageEvent], name: str, count: int = 5) -> List[StageEvent]:
+    """The `count` longest stages called `name` (e.g. the straggler jobs of a batch)."""
+    return sorted((e for e in events if e.name == name), key=lambda e: -e.seconds)[:count]
+
+
+def chrome_trace(events: Iterable[StageEvent]) -> Dict[str, Any]:
+    """
+    Trace-event JSON (chrome://tracing, ui.perfetto.dev): one complete ("X") event per
+    stage, a row per process and thread, so the jobs of a batch run side by side on
+    one timeline starting at 0.
+    """
+    events = list(events)
+    t0 = min((e.start for e in events), default=0.0)
+    out: List[Dict[str, Any]] = []
+    for e in sorted(events, key=lambda e: (e.start, e.depth)):
+        args = dict(e.args)
+        if e.peak_bytes is not None:
+            args["peak_bytes"] = e.peak_bytes
+        out.append(
+            {
+                "name": e.name,
+                "cat": e.name.split(".")[0],
+                "ph": "X",
+                "ts": round((e.start - t0) * 1e6, 3),
+                "dur": round(e.seconds * 1e6, 3),
+                "pid": e.pid,
+                "tid": e.tid,
+                "args": args,
+            }
+        )
+    for pid in sorted({e.pid for e in events}):
+        out.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"pcbgen {pid}"}})
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(events: Iterable[StageEvent], path: Path) -> None:
+    Path(path).write_text(json.dumps(chrome_trace(events)), encoding="utf-8")
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+_PREFIX = {
+    "p": 1e-12,
+    "n": 1e-9,
+    "u": 1e-6,
+    "µ": 1e-6,
+    "μ": 1e-6,
+    "m": 1e-3,
+    "": 1.0,
+    "r": 1.0,
+    "R": 1.0,
+    "k": 1e3,
+    "K": 1e3,
+    "M": 1e6,
+    "G": 1e9,
+}
+
+# "4.7k", "100n", "22uF", "10 kohm", "4700", and RKM style "4k7" / "2u2" / "4R7"
+_PLAIN = re.compile(r"^\s*(\d+(?:\.\d+)?|\.\d+)\s*([pnuµμmrRkKMG]?)\s*(?:F|f|Ω|ohms?|Ohms?|R)?\s*$")
+_RKM = re.compile(r"^\s*(\d+)([pnuµμmrRkKMG])(\d+)\s*(?:F|f|Ω|ohms?|Ohms?)?\s*$")
+
+
+@dataclass(frozen=True, slots=True)
+class Quantity:
+    """An engineering value as written in the spec, plus its SI magnitude (None if unparseable)."""
+
+    text: str
+    si: Optional[float]
+
+    def __str__(self) -> str:
+        return self.text
+
+
+@lru_cache(maxsize=4096)
+def parse_si(text: str) -> Optional[float]:
+    """'4.7k' -> 4700.0, '100n' -> 1e-07, '4k7' -> 4700.0; None when it isn't a plain value."""
+    m = _PLAIN.match(text)
+    if m:
+        return float(m.group(1)) * _PREFIX[m.group(2)]
+    m = _RKM.match(text)
+    if m:
+        return float(f"{m.group(1)}.{m.group(3)}") * _PREFIX[m.group(2)]
+    return None
+
+
+@lru_cache(maxsize=4096)
+def quantity(text: str) -> Quantity:
+    # cached: the same few values ("100n", "4.7k") repeat across every spec in a batch
+    return Quantity(text, parse_si(text))
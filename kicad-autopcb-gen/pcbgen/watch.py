@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from pcbgen.cache import DiskCache
+from pcbgen.design import DEFAULT_BACKEND
+from pcbgen.kicad_project import generate_project, project_cache_key, warm_up
+from pcbgen.spec import load_spec_file, project_spec_from_dict
+
+# Polling, not inotify: a stat per spec every interval is nothing next to a regeneration,
+# works the same on every OS and sees editors that save by writing a new file and renaming.
+POLL_INTERVAL = 0.05
+DEBOUNCE = 0.15
+
+
+@dataclass
+class WatchEvent:
+    path: Path
+    status: str  # generate_project's status, "same" when the spec didn't change in substance, or "error"
+    out_dir: Optional[Path] = None
+    seconds: float = 0.0  # reading the spec and regenerating
+    latency: float = 0.0  # from the first change seen to done, debounce included
+    error: str = ""
+
+
+class _Watched:
+    __slots__ = ("path", "stamp", "first_change", "last_change", "digest", "key")
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.stamp = _stamp(path)
+        self.first_change: Optional[float] = None
+        self.last_change = 0.0
+        self.digest = b""  # of the file's bytes when last read
+        self.key = ""  # project_cache_key of the last spec generated
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None  # e.g. between an editor's unlink and rename
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class SpecWatcher:
+    """
+    Regenerates projects as their spec files change, in this process: the templates,
+    writers and symbol data stay loaded (kicad_project.warm_up) between runs. A burst of
+    writes regenerates once, `debounce` seconds after the last of them, and a save that
+    leaves the spec the same model (comments, formatting, spelled-out defaults) does not
+    regenerate at all. With several specs each gets out_root/<name>, with one it is
+    out_root itself, as with `pcbgen --spec`.
+    """
+
+    def __init__(
+        self,
+        paths: List[Path],
+        out_root: Path,
+        backend: str = DEFAULT_BACKEND,
+        route: bool = False,
+        update: bool = False,
+        use_cache: bool = True,
+        cache: Optional[DiskCache] = None,
+        use_ai: bool = False,
+        hint: str = "",
+        debounce: float = DEBOUNCE,
+    ) -> None:
+        if not paths:
+            raise ValueError("Nothing to watch: give at least one spec file.")
+        self.watched = [_Watched(Path(p).expanduser().resolve()) for p in paths]
+        for w in self.watched:
+            if w.stamp is None:
+                raise ValueError(f"Spec file not found: {w.path}")
+        self.out_root = Path(out_root).expanduser().resolve()
+        self.backend = backend
+        self.route = route
+        self.update = update
+        self.use_cache = use_cache
+        self.cache = cache
+        self.use_ai = use_ai
+        self.hint = hint
+        self.debounce = debounce
+
+    def _out_dir(self, name: str) -> Path:
+        return self.out_root / name if len(self.watched) > 1 else self.out_root
+
+    def regenerate(self, w: _Watched, since: Optional[float] = None) -> WatchEvent:
+        """Read w's spec and regenerate its project unless the spec is the same model as last time."""
+        t0 = time.perf_counter()
+        ev = WatchEvent(w.path, "error")
+        try:
+            digest = hashlib.sha1(w.path.read_bytes()).digest()
+            if digest == w.digest and w.key:
+                ev.status = "same"
+            else:
+                spec = project_spec_from_dict(load_spec_file(w.path), use_ai=self.use_ai, hint=self.hint)
+                key = project_cache_key(spec, self.backend, self.route)
+                ev.out_dir = self._out_dir(spec.name)
+                if key == w.key:
+                    ev.status = "same"
+                else:
+                    ev.status = generate_project(
+                        spec,
+                        ev.out_dir,
+                        use_cache=self.use_cache,
+                        cache=self.cache,
+                        backend=self.backend,
+                        route=self.route,
+                        update=self.update,
+                    )
+                    w.key = key
+            w.digest = digest
+        except Exception as e:
+            # a half-typed spec is the normal case here: report it and keep watching
+            ev.error = f"{type(e).__name__}: {e}" if not isinstance(e, (OSError, ValueError)) else str(e)
+        done = time.perf_counter()
+        ev.seconds = done - t0
+        ev.latency = done - (since if since is not None else t0)
+        return ev
+
+    def poll(self, now: Optional[float] = None) -> List[WatchEvent]:
+        """Check every spec once; regenerate the ones that changed and have been quiet for `debounce`."""
+        now = time.perf_counter() if now is None else now
+        events: List[WatchEvent] = []
+        for w in self.watched:
+            stamp = _stamp(w.path)
+            if stamp is not None and stamp != w.stamp:
+                w.stamp = stamp
+                w.last_change = now
+                if w.first_change is None:
+                    w.first_change = now
+            if w.first_change is not None and now - w.last_change >= self.debounce:
+                since, w.first_change = w.first_change, None
+                events.append(self.regenerate(w, since))
+        return events
+
+    def run(
+        self,
+        on_event: Optional[Callable[[WatchEvent], None]] = None,
+        interval: float = POLL_INTERVAL,
+        stop: Optional[threading.Event] = None,
+        warm: bool = True,
+    ) -> None:
+        """Generate every spec once, then regenerate on changes until `stop` is set (or forever)."""
+        if warm:
+            warm_up(self.backend)
+        for w in self.watched:
+            ev = self.regenerate(w)
+            if on_event:
+                on_event(ev)
+        stop = stop or threading.Event()
+        while not stop.wait(interval):
+            for ev in self.poll():
+                if on_event:
+                    on_event(ev)
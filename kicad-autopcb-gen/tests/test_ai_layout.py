@@ -0,0 +1,41 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from pcbgen.ai_layout import plan_layout, plan_layout_result
+
+ANSWER = {
+    "header_xy": [10, 20],
+    "caps_origin_xy": [100, 20],
+    "pullups_origin_xy": [100, 60],
+    "labels_left_x": 0,
+    "labels_right_x": 150,
+    "row0_y": 20,
+    "row_dy": 10,
+}
+
+
+class StubClient:
+    """Stands in for AsyncOpenAI: client.responses.create answers with a fixed plan."""
+
+    def __init__(self):
+        self.calls = 0
+        self.responses = SimpleNamespace(create=self._create)
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(output_text=json.dumps(ANSWER))
+
+
+def test_plan_layout_uses_the_client():
+    client = StubClient()
+    res = plan_layout_result("i2c_breakout", {"name": "x"}, use_cache=False, client=client)
+    assert (res.source, res.plan.header_xy, client.calls) == ("model", (10, 20), 1)
+
+
+def test_plan_layout_inside_a_running_loop():
+    # e.g. a notebook cell or an async server calling the blocking API
+    async def host():
+        return plan_layout("i2c_breakout", {"name": "x"}, use_cache=False, client=StubClient())
+
+    assert asyncio.run(host()).row_dy == 10
@@ -0,0 +1,15 @@
+from pcbgen.batch import collect_jobs
+
+
+def test_output_names_never_collide(tmp_path):
+    manifest = tmp_path / "jobs.yaml"
+    manifest.write_text(
+        "- {prompt: 'i2c breakout', out: x}\n"
+        "- {prompt: 'i2c breakout', out: x}\n"
+        "- {prompt: 'i2c breakout', out: x_2}\n"
+        "- {prompt: 'i2c breakout', out: x}\n",
+        encoding="utf-8",
+    )
+    names = [job.out_name for job in collect_jobs(manifests=[str(manifest)])]
+    # the explicit x_2 keeps its name; the duplicate x's skip over it
+    assert names == ["x", "x_3", "x_2", "x_4"]
@@ -0,0 +1,17 @@
+from pcbgen.cache import LOCK_DIR, DiskCache
+
+
+def test_keys_lock_independently(tmp_path):
+    cache = DiskCache(tmp_path)
+    held = cache.try_lock("ab" + "0" * 62)
+    assert held is not None
+    # same first byte, different key: must not wait on the first one
+    other = cache.try_lock("ab" + "1" * 62)
+    assert other is not None
+    cache.unlock(other)
+    assert cache.try_lock("ab" + "0" * 62) is None
+
+    # eviction drops idle lock files and leaves held ones alone
+    cache.evict()
+    assert sorted(p.name for p in (tmp_path / LOCK_DIR).iterdir()) == ["ab" + "0" * 62]
+    cache.unlock(held)
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+from pcbgen.drc import check_board
+from pcbgen.footprint_index import footprint_dirs
+
+FIXTURES = Path(__file__).parent / "drc"
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+def test_clean_fixture_passes():
+    result = check_board(FIXTURES / "clean.kicad_pcb")
+    assert (result.footprints, result.pads, result.tracks) == (2, 4, 2)
+    assert result.violations == []
+
+
+@pytest.mark.parametrize(
+    "name, items",
+    [
+        ("clearance", ["track (A)", "track (B)"]),
+        ("courtyard", ["R1", "H1"]),
+        ("off_board", ["H1"]),
+        ("unconnected", ["R1 pad 2", "R2 pad 2"]),
+    ],
+)
+def test_fixture_has_one_violation(name, items):
+    # each fixture is clean.kicad_pcb with one thing broken
+    result = check_board(FIXTURES / f"{name}.kicad_pcb")
+    assert [(v.kind, v.items) for v in result.violations] == [(name, items)]
+    assert not result.ok()
+
+
+def test_clearance_reports_the_gap():
+    (v,) = check_board(FIXTURES / "clearance.kicad_pcb").violations
+    assert v.distance == pytest.approx(0.05)
+    assert not check_board(FIXTURES / "clearance.kicad_pcb", clearance=0.04).violations
+
+
+@pytest.mark.skipif(not footprint_dirs(), reason="KiCad footprint libraries not installed (set KICAD_FOOTPRINT_DIR)")
+def test_generated_routed_board_is_clean(tmp_path):
+    from pcbgen.kicad_project import template_design
+    from pcbgen.pcb_writer import board_text
+    from pcbgen.spec import load_spec_file, project_spec_from_dict
+
+    design = template_design(project_spec_from_dict(load_spec_file(EXAMPLES / "i2c_breakout.yaml")))
+    path = tmp_path / "board.kicad_pcb"
+    path.write_text(board_text(design, route=True), encoding="utf-8")
+    result = check_board(path)
+    assert result.pads > 0 and result.tracks > 0
+    assert result.violations == []
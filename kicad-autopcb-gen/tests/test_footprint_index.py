@@ -0,0 +1,36 @@
+import os
+
+from pcbgen.footprint_index import footprint_info
+from pcbgen.pcb_writer import footprint_template
+
+FOOTPRINT = """(footprint "{name}"
+  (layer "F.Cu")
+{pads})
+"""
+PAD = '  (pad "{n}" smd rect (at {x} 0) (size 1 1) (layers "F.Cu"))\n'
+
+
+def _write(pretty, name, pads, bump_s=0):
+    path = pretty / f"{name}.kicad_mod"
+    path.write_text(FOOTPRINT.format(name=name, pads="".join(PAD.format(n=n, x=n) for n in range(1, pads + 1))), encoding="utf-8")
+    if bump_s:
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump_s * 1_000_000_000))
+
+
+def test_lookups_see_footprint_edits(tmp_path, monkeypatch):
+    monkeypatch.setenv("KICAD_FOOTPRINT_DIR", str(tmp_path / "footprints"))
+    monkeypatch.setenv("PCBGEN_FOOTPRINT_INDEX_DIR", str(tmp_path / "idx"))
+    pretty = tmp_path / "footprints" / "Test.pretty"
+    pretty.mkdir(parents=True)
+    _write(pretty, "A", 2)
+    assert footprint_info("Test:A").pad_count == 2
+    assert footprint_info("Test:B") is None
+
+    # same process, as under `pcbgen watch`: an in-place edit and a new footprint
+    _write(pretty, "A", 3, bump_s=1)
+    _write(pretty, "B", 1)
+    assert footprint_info("Test:A").pad_count == 3
+    assert footprint_info("Test:B").pad_count == 1
+    nets = [part[1] for part in footprint_template("Test:A") if isinstance(part, tuple) and part[0] == "net"]
+    assert nets == ["1", "2", "3"]
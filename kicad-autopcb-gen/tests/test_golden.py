@@ -0,0 +1,10 @@
+import pytest
+
+from pcbgen.bench import golden_mismatches
+from pcbgen.symbol_index import symbol_dirs
+
+
+@pytest.mark.skipif(not symbol_dirs(), reason="KiCad symbol libraries not installed (set KICAD_SYMBOL_DIR)")
+def test_examples_match_golden_schematics():
+    # after a deliberate output change: python -m pcbgen.bench writer --update-golden
+    assert golden_mismatches() == []
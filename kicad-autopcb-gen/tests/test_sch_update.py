@@ -0,0 +1,120 @@
+import re
+import uuid
+
+import pytest
+
+from pcbgen.design import Component, Label, SchematicDesign, Wire
+from pcbgen.sch_update import _generated, update_schematic
+from pcbgen.sch_writer import save_streaming
+
+LIBRARY = """(kicad_symbol_lib (version 20231120) (generator test)
+  (symbol "R" (in_bom yes) (on_board yes)
+    (property "Reference" "R" (at 0 0 0))
+    (property "Value" "R" (at 0 0 0))
+  )
+)
+"""
+FOOTPRINT = "Resistor_SMD:R_0603_1608Metric"
+UUID_RE = re.compile(r'\(uuid "([0-9a-f-]{36})"\)')
+
+
+@pytest.fixture(autouse=True)
+def library(tmp_path, monkeypatch):
+    (tmp_path / "symbols").mkdir()
+    (tmp_path / "symbols" / "Test.kicad_sym").write_text(LIBRARY, encoding="utf-8")
+    monkeypatch.setenv("KICAD_SYMBOL_DIR", str(tmp_path / "symbols"))
+    monkeypatch.setenv("PCBGEN_SYMBOL_INDEX_DIR", str(tmp_path / "idx"))
+
+
+def _design(r1="1k", wire=True, label=False):
+    return SchematicDesign(
+        "board",
+        components=[
+            Component("R1", "Test:R", r1, FOOTPRINT, (50.8, 50.8)),
+            Component("R2", "Test:R", "10k", FOOTPRINT, (76.2, 50.8)),
+        ],
+        wires=[Wire((50.8, 45.72), (76.2, 45.72))] if wire else [],
+        labels=[Label("SDA", (50.8, 60.96))] + ([Label("SCL", (76.2, 60.96))] if label else []),
+    )
+
+
+def _block(text, uid):
+    # the top-level element holding this uuid
+    at = text.index(f'(uuid "{uid}")')
+    start = text.rindex("\n\t(", 0, at) + 1
+    return start, text.index("\n\t)\n", at) + 4
+
+
+def _add_by_hand(text, element):
+    # what KiCad does: a new element with a random (version 4) uuid
+    at = text.index("\t(sheet_instances")
+    return text[:at] + element + text[at:]
+
+
+HAND_WIRE = '\t(wire\n\t\t(pts\n\t\t\t(xy 10 10) (xy 20 10)\n\t\t)\n\t\t(uuid "{}")\n\t)\n'
+
+
+def test_generated_tells_uuid5_from_uuid4():
+    design = _design()
+    assert _generated(design.element_uuid("symbol", "R1"))
+    assert not _generated(str(uuid.uuid4()))
+
+
+def test_update_changes_keeps_adds_and_deletes(tmp_path):
+    path = tmp_path / "board.kicad_sch"
+    old = _design()
+    save_streaming(old, path)
+    text = path.read_text(encoding="utf-8")
+    # hand edits: R2 marked do-not-populate, plus a wire drawn in KiCad
+    a, b = _block(text, old.element_uuid("symbol", "R2"))
+    text = text[:a] + text[a:b].replace("(dnp no)", "(dnp yes)") + text[b:]
+    hand = str(uuid.uuid4())
+    path.write_text(_add_by_hand(text, HAND_WIRE.format(hand)), encoding="utf-8")
+
+    new = _design(r1="2k2", wire=False, label=True)
+    stats = update_schematic(new, path, old.digests())
+    assert (stats.changed, stats.added, stats.removed) == (1, 1, 1)
+
+    text = path.read_text(encoding="utf-8")
+    uids = UUID_RE.findall(text)
+    assert '"2k2"' in text
+    assert "(dnp yes)" in text  # R2's inputs didn't change, so its hand edit stays
+    assert hand in uids
+    assert new.element_uuid("label", next(k for kind, k, _ in new.elements() if kind == "label" and k.startswith("SCL"))) in uids
+    assert not any(old.element_uuid(kind, key) in uids for kind, key, _ in old.elements() if kind == "wire")
+
+    # nothing left to do: the file is not rewritten
+    before = path.read_bytes()
+    assert update_schematic(new, path, new.digests()).touched == 0
+    assert path.read_bytes() == before
+
+
+def test_update_without_manifest_compares_everything(tmp_path):
+    path = tmp_path / "board.kicad_sch"
+    old = _design()
+    save_streaming(old, path)
+    hand = str(uuid.uuid4())
+    path.write_text(_add_by_hand(path.read_text(encoding="utf-8"), HAND_WIRE.format(hand)), encoding="utf-8")
+
+    stats = update_schematic(_design(wire=False), path)
+    # the generated wire is dropped by its uuid5; the uuid4 one is KiCad's and stays
+    assert (stats.changed, stats.added, stats.removed) == (0, 0, 1)
+    assert hand in UUID_RE.findall(path.read_text(encoding="utf-8"))
+
+
+def test_update_adopts_legacy_elements_once(tmp_path):
+    # a file from before uuids were derived from the spec: every element has a random uuid
+    path = tmp_path / "board.kicad_sch"
+    design = _design()
+    save_streaming(design, path)
+    text = path.read_text(encoding="utf-8")
+    ours = {design.element_uuid(kind, key) for kind, key, _ in design.elements()}
+    for uid in ours:
+        text = text.replace(uid, str(uuid.uuid4()))
+    path.write_text(text, encoding="utf-8")
+
+    stats = update_schematic(design, path)
+    # matched by reference (symbols) and geometry (wires, labels) and rewritten in place
+    assert (stats.changed, stats.added, stats.removed) == (len(ours), 0, 0)
+    assert ours <= set(UUID_RE.findall(path.read_text(encoding="utf-8")))
+    assert update_schematic(design, path).touched == 0
@@ -0,0 +1,15 @@
+from pcbgen.kicad_project import project_cache_key
+from pcbgen.spec import project_spec_from_dict
+
+
+def _key(**flags):
+    return project_cache_key(project_spec_from_dict({"name": "b", "type": "i2c_breakout"}, **flags))
+
+
+def test_run_flags_stay_out_of_the_key():
+    base = _key()
+    assert _key(layout_cache=False) == base
+    assert _key(hint="caps left") == base
+    # with AI on, the hint shapes the layout
+    assert _key(use_ai=True, hint="caps left") != _key(use_ai=True)
+    assert _key(use_ai=True, layout_cache=False) == _key(use_ai=True)
@@ -0,0 +1,6 @@
+from pcbgen.bench import heavy_modules_loaded
+
+
+def test_cli_import_skips_heavy_modules():
+    # the wall-clock budget is `python -m pcbgen.bench startup`; this keeps the imports honest in CI
+    assert heavy_modules_loaded() == []
@@ -0,0 +1,33 @@
+import os
+
+from pcbgen.sch_writer import lib_symbol
+from pcbgen.symbol_index import lookup_symbol
+
+LIBRARY = """(kicad_symbol_lib (version 20231120) (generator test)
+  (symbol "R" (in_bom yes) (on_board yes)
+    (property "Reference" "R" (at 0 0 0))
+    (property "Value" "{value}" (at 0 0 0))
+  )
+)
+"""
+
+
+def _write(lib, value, bump_s=0):
+    lib.write_text(LIBRARY.format(value=value), encoding="utf-8")
+    if bump_s:
+        st = lib.stat()
+        os.utime(lib, ns=(st.st_atime_ns, st.st_mtime_ns + bump_s * 1_000_000_000))
+
+
+def test_lookups_see_library_edits(tmp_path, monkeypatch):
+    monkeypatch.setenv("KICAD_SYMBOL_DIR", str(tmp_path / "symbols"))
+    monkeypatch.setenv("PCBGEN_SYMBOL_INDEX_DIR", str(tmp_path / "idx"))
+    (tmp_path / "symbols").mkdir()
+    lib = tmp_path / "symbols" / "Test.kicad_sym"
+    _write(lib, "old")
+    assert '"old"' in lib_symbol("Test:R").block
+
+    # same process, as under `pcbgen watch`: the edit has to show up on the next lookup
+    _write(lib, "new", bump_s=1)
+    assert '"new"' in lookup_symbol("Test:R").block
+    assert '"new"' in lib_symbol("Test:R").block